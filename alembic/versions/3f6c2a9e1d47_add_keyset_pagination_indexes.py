@@ -0,0 +1,41 @@
+"""Add composite indexes for keyset pagination
+
+Revision ID: 3f6c2a9e1d47
+Revises: b2d0a19d3a89
+Create Date: 2026-10-18 10:12:05.417220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6c2a9e1d47'
+down_revision: Union[str, Sequence[str], None] = 'b2d0a19d3a89'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индексы (ключ сортировки, id) для каждого sort_by в GET /artworks/.
+    # Условие курсора (ключ, id) > (:k, :id) и ORDER BY ключ, id
+    # обслуживаются одним проходом по индексу (для desc - обратным).
+    op.create_index('ix_artworks_title_id', 'artworks', ['title', 'id'])
+    op.create_index('ix_artworks_created_at_id', 'artworks', ['created_at', 'id'])
+
+    # year_created может быть NULL - индексируем то же выражение,
+    # что использует app/pagination.py (YEAR_NULL_SENTINEL)
+    op.execute(
+        'CREATE INDEX ix_artworks_year_id ON artworks '
+        '(COALESCE(year_created, 2147483647), id)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_artworks_year_id', table_name='artworks')
+    op.drop_index('ix_artworks_created_at_id', table_name='artworks')
+    op.drop_index('ix_artworks_title_id', table_name='artworks')
@@ -0,0 +1,52 @@
+"""Add table version sequences and notify triggers
+
+Revision ID: 4a8e1c6d9b35
+Revises: e5b3d8a17f62
+Create Date: 2026-10-18 14:05:41.218377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a8e1c6d9b35'
+down_revision: Union[str, Sequence[str], None] = 'e5b3d8a17f62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = ('artists', 'genres', 'museums', 'artworks')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Версия таблицы - последовательность: nextval не берёт блокировок,
+    # поэтому параллельные записи в одну таблицу не выстраиваются в очередь
+    # (в отличие от UPDATE строки-счётчика). Пропуски после отката безвредны -
+    # лишний раз сбросится ETag.
+    op.execute("""
+        CREATE FUNCTION table_version_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            -- уведомление уходит при COMMIT; при откате не уходит
+            PERFORM pg_notify('table_versions', TG_TABLE_NAME || ':' || nextval(TG_ARGV[0]::regclass));
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table in VERSIONED_TABLES:
+        op.execute(f'CREATE SEQUENCE {table}_version_seq')
+        op.execute(f"""
+            CREATE TRIGGER {table}_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump('{table}_version_seq')
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in VERSIONED_TABLES:
+        op.execute(f'DROP TRIGGER {table}_version ON {table}')
+        op.execute(f'DROP SEQUENCE {table}_version_seq')
+    op.execute('DROP FUNCTION table_version_bump()')
@@ -0,0 +1,85 @@
+"""Create base tables
+
+Revision ID: 5e1b7c9d2a40
+Revises:
+Create Date: 2025-12-31 15:10:02.418725
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1b7c9d2a40'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Схема, которую раньше создавал Base.metadata.create_all при старте:
+# базы, созданные так, уже содержат эти таблицы, и alembic считает ревизию
+# выполненной (она предок их текущей). created_at, JSONB, секции и индексы
+# добавляют следующие миграции.
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'artists',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('country', sa.String(), nullable=True),
+        sa.Column('birth_year', sa.Integer(), nullable=True),
+        sa.Column('death_year', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_artists_id', 'artists', ['id'])
+
+    op.create_table(
+        'genres',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_genres_id', 'genres', ['id'])
+
+    op.create_table(
+        'museums',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('city', sa.String(), nullable=True),
+        sa.Column('country', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_museums_id', 'museums', ['id'])
+
+    op.create_table(
+        'artworks',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('year_created', sa.Integer(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('metadata_json', sa.JSON(), nullable=True),
+        sa.Column('artist_id', sa.Integer(), nullable=True),
+        sa.Column('genre_id', sa.Integer(), nullable=True),
+        sa.Column('museum_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['artist_id'], ['artists.id']),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id']),
+        sa.ForeignKeyConstraint(['museum_id'], ['museums.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_artworks_id', 'artworks', ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_artworks_id', table_name='artworks')
+    op.drop_table('artworks')
+    op.drop_index('ix_museums_id', table_name='museums')
+    op.drop_table('museums')
+    op.drop_index('ix_genres_id', table_name='genres')
+    op.drop_table('genres')
+    op.drop_index('ix_artists_id', table_name='artists')
+    op.drop_table('artists')
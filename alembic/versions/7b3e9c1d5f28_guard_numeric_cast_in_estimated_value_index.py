@@ -0,0 +1,112 @@
+"""Guard the numeric cast in the estimated_value_usd index
+
+Revision ID: 7b3e9c1d5f28
+Revises: b6e4d2f8a391
+Create Date: 2026-10-20 10:14:52.630914
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3e9c1d5f28'
+down_revision: Union[str, Sequence[str], None] = 'b6e4d2f8a391'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+log = logging.getLogger('alembic.runtime.migration')
+
+LOCK_TIMEOUT = '5s'
+
+# Условия "jsonb_typeof(...) = 'number' AND (...)::numeric > x" PostgreSQL
+# вправе вычислять в любом порядке: перепроверка строк страницы lossy-битмапа
+# (Recheck Cond) начинается с приведения, и строка "on request" роняет запрос.
+# Индексируется CASE - приведение только у чисел, в любом порядке условий;
+# crud строит то же выражение (_metadata_number, DISCOUNT_SQL)
+GUARD = "jsonb_typeof(metadata_json->'estimated_value_usd') = 'number'"
+NEW = (
+    'ix_artworks_estimated_value_guarded',
+    f"((CASE WHEN {GUARD} THEN (metadata_json->>'estimated_value_usd')::numeric END)) WHERE {GUARD}"
+)
+OLD = (
+    'ix_artworks_estimated_value',
+    f"(((metadata_json->>'estimated_value_usd')::numeric)) WHERE {GUARD}"
+)
+
+
+def _is_partitioned(bind, table: str) -> bool:
+    return bind.execute(sa.text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = CAST(:table AS regclass)"
+    ), {'table': table}).scalar()
+
+
+def _partitions(bind, table: str):
+    return bind.execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname
+    """), {'table': table}).scalars().all()
+
+
+def _indexed_partitions(bind, index: str):
+    """Секции, индексы которых уже присоединены к секционированному индексу"""
+    return set(bind.execute(sa.text("""
+        SELECT t.relname FROM pg_inherits i
+        JOIN pg_index x ON x.indexrelid = i.inhrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        WHERE i.inhparent = CAST(:index AS regclass)
+    """), {'index': index}).scalars().all())
+
+
+def _drop_invalid(bind, index: str):
+    invalid = bind.execute(sa.text(
+        'SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:index)'
+    ), {'index': index}).scalar()
+    if invalid:
+        op.execute(f'DROP INDEX CONCURRENTLY {index}')
+
+
+def _create_index(bind, name: str, definition: str):
+    """Как в f2c8e4a6b719: без блокировки записи, повторный запуск достраивает"""
+    if not _is_partitioned(bind, 'artworks'):
+        _drop_invalid(bind, name)
+        op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON artworks {definition}')
+        return
+    op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON ONLY artworks {definition}')
+    indexed = _indexed_partitions(bind, name)
+    for partition in _partitions(bind, 'artworks'):
+        if partition in indexed:
+            continue
+        child = f'{partition}_{name}'
+        _drop_invalid(bind, child)
+        op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} {definition}')
+        op.execute(f'ALTER INDEX {name} ATTACH PARTITION {child}')
+        log.info('%s: индекс %s', partition, name)
+
+
+def _drop_index(bind, name: str):
+    if not _is_partitioned(bind, 'artworks'):
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+        return
+    op.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+    op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute('SET lock_timeout TO DEFAULT')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        _create_index(bind, *NEW)
+        _drop_index(bind, OLD[0])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        _create_index(bind, *OLD)
+        _drop_index(bind, NEW[0])
@@ -0,0 +1,52 @@
+"""Migrate metadata_json to JSONB, index estimated_value_usd
+
+Revision ID: 8d41e7b2c5a0
+Revises: 3f6c2a9e1d47
+Create Date: 2026-10-18 11:03:47.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41e7b2c5a0'
+down_revision: Union[str, Sequence[str], None] = '3f6c2a9e1d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # JSON -> JSONB: бинарное хранение, операторы ->>/@>/jsonb_set на сервере.
+    # Индекс ix_artworks_metadata_json_gin по metadata_json::text
+    # PostgreSQL перестроит сам.
+    op.alter_column(
+        'artworks', 'metadata_json',
+        type_=postgresql.JSONB(),
+        existing_type=sa.JSON(),
+        postgresql_using='metadata_json::jsonb'
+    )
+
+    # Индекс для условия скидки (metadata_json->>'estimated_value_usd')::numeric > порог.
+    # Частичный: приведение к numeric вычисляется только для числовых значений,
+    # поэтому строка вроде "unknown" в estimated_value_usd не ломает вставку.
+    op.execute(
+        "CREATE INDEX ix_artworks_estimated_value ON artworks "
+        "(((metadata_json->>'estimated_value_usd')::numeric)) "
+        "WHERE jsonb_typeof(metadata_json->'estimated_value_usd') = 'number'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_artworks_estimated_value', table_name='artworks')
+    op.alter_column(
+        'artworks', 'metadata_json',
+        type_=sa.JSON(),
+        existing_type=postgresql.JSONB(),
+        postgresql_using='metadata_json::json'
+    )
@@ -0,0 +1,201 @@
+"""Add artwork_stats summary table maintained by triggers
+
+Revision ID: 9c2f5e8a3d14
+Revises: 4a8e1c6d9b35
+Create Date: 2026-10-18 15:22:07.604193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2f5e8a3d14'
+down_revision: Union[str, Sequence[str], None] = '4a8e1c6d9b35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Разбиение строк (sign, artist_id, genre_id, museum_id, year_created) по измерениям.
+# key - jsonb: 'null' - группа NULL (страна музея или год не указаны),
+# SQL NULL - строка в измерение не попадает (как при INNER JOIN в живом GROUP BY).
+# ORDER BY - чтобы параллельные транзакции блокировали строки artwork_stats
+# в одном порядке и не ловили взаимоблокировку.
+STATS_DELTA_SQL = """
+    INSERT INTO artwork_stats AS s (dimension, key, artwork_count, year_sum, year_count)
+    SELECT d.dimension, d.key,
+           sum(r.sign),
+           sum(r.sign * coalesce(r.year_created, 0)),
+           sum(r.sign * (r.year_created IS NOT NULL)::int)
+    FROM ({source}) AS r
+    LEFT JOIN museums m ON m.id = r.museum_id
+    CROSS JOIN LATERAL (VALUES
+        ('country', CASE WHEN m.id IS NOT NULL THEN coalesce(to_jsonb(m.country), 'null') END),
+        ('genre', to_jsonb(r.genre_id)),
+        ('artist', to_jsonb(r.artist_id)),
+        ('decade', coalesce(to_jsonb(artwork_decade(r.year_created)), 'null'))
+    ) AS d (dimension, key)
+    WHERE d.key IS NOT NULL
+    GROUP BY d.dimension, d.key
+    ORDER BY d.dimension, d.key
+    ON CONFLICT (dimension, key) DO UPDATE SET
+        artwork_count = s.artwork_count + EXCLUDED.artwork_count,
+        year_sum = s.year_sum + EXCLUDED.year_sum,
+        year_count = s.year_count + EXCLUDED.year_count
+"""
+
+STATS_COLUMNS = "artist_id, genre_id, museum_id, year_created"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'artwork_stats',
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', postgresql.JSONB(), nullable=False),
+        sa.Column('artwork_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('year_sum', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('year_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('dimension', 'key')
+    )
+
+    # floor, а не целочисленное деление: -5 год -> -10, а не 0
+    op.execute("""
+        CREATE FUNCTION artwork_decade(year integer) RETURNS integer
+        LANGUAGE sql IMMUTABLE AS $$ SELECT (floor(year / 10.0) * 10)::integer $$
+    """)
+
+    # Триггер уровня оператора с transition tables: одна агрегирующая вставка
+    # на INSERT/UPDATE/DELETE, сколько бы строк он ни затронул.
+    # Горячие ключи (одна страна) сериализуют параллельных писателей на
+    # блокировке строки artwork_stats до COMMIT - цена точных агрегатов.
+    insert_source = f"SELECT 1 AS sign, {STATS_COLUMNS} FROM new_rows"
+    delete_source = f"SELECT -1 AS sign, {STATS_COLUMNS} FROM old_rows"
+    # UPDATE: только строки, где поменялась хоть одна колонка статистики
+    # (скидка по metadata_json и пересчёт search_vector сюда не попадают)
+    changed = (
+        "FROM old_rows o JOIN new_rows n USING (id) "
+        "WHERE (o.artist_id, o.genre_id, o.museum_id, o.year_created) "
+        "IS DISTINCT FROM (n.artist_id, n.genre_id, n.museum_id, n.year_created)"
+    )
+    update_source = (
+        f"SELECT -1 AS sign, o.artist_id, o.genre_id, o.museum_id, o.year_created {changed} "
+        f"UNION ALL SELECT 1, n.artist_id, n.genre_id, n.museum_id, n.year_created {changed}"
+    )
+    op.execute(f"""
+        CREATE FUNCTION artworks_stats_update() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            source text;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                source := $s${insert_source}$s$;
+            ELSIF TG_OP = 'DELETE' THEN
+                source := $s${delete_source}$s$;
+            ELSE
+                source := $s${update_source}$s$;
+            END IF;
+            -- FOR SHARE на музеях: смена страны музея (museums_stats_update)
+            -- дождётся этой транзакции и перенесёт в том числе её строки
+            EXECUTE format(
+                'SELECT 1 FROM museums WHERE id IN (SELECT museum_id FROM (%s) AS r) ORDER BY id FOR SHARE',
+                source
+            );
+            EXECUTE format($q${STATS_DELTA_SQL.replace('{source}', '%s')}$q$, source);
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER artworks_stats_insert AFTER INSERT ON artworks
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION artworks_stats_update()
+    """)
+    op.execute("""
+        CREATE TRIGGER artworks_stats_update AFTER UPDATE ON artworks
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION artworks_stats_update()
+    """)
+    op.execute("""
+        CREATE TRIGGER artworks_stats_delete AFTER DELETE ON artworks
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION artworks_stats_update()
+    """)
+
+    op.execute("""
+        CREATE FUNCTION artworks_stats_truncate() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            DELETE FROM artwork_stats;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER artworks_stats_truncate AFTER TRUNCATE ON artworks
+        FOR EACH STATEMENT EXECUTE FUNCTION artworks_stats_truncate()
+    """)
+
+    # Смена страны музея переносит его произведения между группами 'country'
+    op.execute("""
+        CREATE FUNCTION museums_stats_update() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO artwork_stats AS s (dimension, key, artwork_count, year_sum, year_count)
+            SELECT 'country', r.key,
+                   sum(r.sign),
+                   sum(r.sign * coalesce(a.year_created, 0)),
+                   sum(r.sign * (a.year_created IS NOT NULL)::int)
+            FROM (
+                SELECT o.id, -1 AS sign, coalesce(to_jsonb(o.country), 'null') AS key
+                FROM old_rows o JOIN new_rows n USING (id)
+                WHERE o.country IS DISTINCT FROM n.country
+                UNION ALL
+                SELECT n.id, 1, coalesce(to_jsonb(n.country), 'null')
+                FROM old_rows o JOIN new_rows n USING (id)
+                WHERE o.country IS DISTINCT FROM n.country
+            ) AS r
+            JOIN artworks a ON a.museum_id = r.id
+            GROUP BY r.key
+            ORDER BY r.key
+            ON CONFLICT (dimension, key) DO UPDATE SET
+                artwork_count = s.artwork_count + EXCLUDED.artwork_count,
+                year_sum = s.year_sum + EXCLUDED.year_sum,
+                year_count = s.year_count + EXCLUDED.year_count;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER museums_stats_update AFTER UPDATE ON museums
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION museums_stats_update()
+    """)
+
+    # Полный пересчёт: заполнение при миграции и сверка, если агрегаты разошлись
+    # (например, после ручных правок с отключёнными триггерами).
+    # SHARE-блокировка не даёт писать в таблицы, пока идёт пересчёт.
+    op.execute(f"""
+        CREATE FUNCTION artwork_stats_rebuild() RETURNS void LANGUAGE plpgsql AS $$
+        BEGIN
+            LOCK TABLE artworks, museums IN SHARE MODE;
+            DELETE FROM artwork_stats;
+            {STATS_DELTA_SQL.format(source=f'SELECT 1 AS sign, {STATS_COLUMNS} FROM artworks')};
+        END
+        $$
+    """)
+    op.execute('SELECT artwork_stats_rebuild()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP FUNCTION artwork_stats_rebuild()')
+    op.execute('DROP TRIGGER museums_stats_update ON museums')
+    op.execute('DROP FUNCTION museums_stats_update()')
+    op.execute('DROP TRIGGER artworks_stats_truncate ON artworks')
+    op.execute('DROP FUNCTION artworks_stats_truncate()')
+    op.execute('DROP TRIGGER artworks_stats_delete ON artworks')
+    op.execute('DROP TRIGGER artworks_stats_update ON artworks')
+    op.execute('DROP TRIGGER artworks_stats_insert ON artworks')
+    op.execute('DROP FUNCTION artworks_stats_update()')
+    op.execute('DROP FUNCTION artwork_decade(integer)')
+    op.drop_table('artwork_stats')
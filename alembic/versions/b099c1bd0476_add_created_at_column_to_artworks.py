@@ -1,7 +1,7 @@
 """Add created_at column to artworks
 
 Revision ID: b099c1bd0476
-Revises: 
+Revises: 5e1b7c9d2a40
 Create Date: 2025-12-31 15:16:20.177333
 
 """
@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = 'b099c1bd0476'
-down_revision: Union[str, Sequence[str], None] = None
+down_revision: Union[str, Sequence[str], None] = '5e1b7c9d2a40'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
@@ -0,0 +1,56 @@
+"""Add jobs table for background bulk operations
+
+Revision ID: b6e4d2f8a391
+Revises: f2c8e4a6b719
+Create Date: 2026-10-19 11:42:17.508331
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e4d2f8a391'
+down_revision: Union[str, Sequence[str], None] = 'f2c8e4a6b719'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('params', postgresql.JSONB(), nullable=False, server_default='{}'),
+        # queued -> running -> done | failed; running без heartbeat - упавший воркер
+        sa.Column('status', sa.String(), nullable=False, server_default='queued'),
+        sa.Column('checkpoint', postgresql.JSONB(), nullable=True),
+        sa.Column('progress', postgresql.JSONB(), nullable=True),
+        sa.Column('result', postgresql.JSONB(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('worker', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text("(now() AT TIME ZONE 'utc')")),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Выборка задания воркером смотрит только на незавершённые - индекс
+    # остаётся маленьким, сколько бы выполненных заданий ни накопилось
+    op.create_index(
+        'ix_jobs_pending', 'jobs', ['id'],
+        postgresql_where=sa.text("status IN ('queued', 'running')")
+    )
+    op.create_index('ix_jobs_created_at', 'jobs', ['created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_created_at', table_name='jobs')
+    op.drop_index('ix_jobs_pending', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,34 @@
+"""Add jsonb_path_ops GIN index for metadata_json
+
+Revision ID: c7a92f3e6b18
+Revises: 8d41e7b2c5a0
+Create Date: 2026-10-18 11:48:31.260557
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a92f3e6b18'
+down_revision: Union[str, Sequence[str], None] = '8d41e7b2c5a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # GIN с jsonb_path_ops обслуживает только containment (@>), но он
+    # в разы компактнее jsonb_ops. Регулярный поиск продолжает
+    # использовать триграммный ix_artworks_metadata_json_gin.
+    op.execute(
+        'CREATE INDEX ix_artworks_metadata_json_path_ops ON artworks '
+        'USING gin (metadata_json jsonb_path_ops)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_artworks_metadata_json_path_ops', table_name='artworks')
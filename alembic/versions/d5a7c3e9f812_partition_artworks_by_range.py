@@ -0,0 +1,358 @@
+"""Partition artworks by range on created_at or year_created
+
+Revision ID: d5a7c3e9f812
+Revises: 9c2f5e8a3d14
+Create Date: 2026-10-18 21:40:12.318560
+
+"""
+import logging
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import config
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a7c3e9f812'
+down_revision: Union[str, Sequence[str], None] = '9c2f5e8a3d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+log = logging.getLogger('alembic.runtime.migration')
+
+PARTITION_KEYS = ('created_at', 'year_created')
+CREATED_AT_STEPS = ('month', 'quarter', 'year')
+
+# Строк artworks на один INSERT ... SELECT при копировании (по диапазону id)
+COPY_BATCH = 100_000
+# Догоняющие проходы по журналу изменений, пока он не станет меньше CATCH_UP_ROWS
+CATCH_UP_PASSES = 10
+CATCH_UP_ROWS = 1000
+# Переключение: ACCESS EXCLUSIVE ждём по LOCK_TIMEOUT, LOCK_ATTEMPTS раз
+LOCK_TIMEOUT = '5s'
+LOCK_ATTEMPTS = 20
+
+_INDEX_RE = re.compile(r'^(CREATE (?:UNIQUE )?INDEX )(\S+) ON (?:ONLY )?(\S+\.)?artworks (USING .*)$')
+
+PARTITION_FUNCTIONS = [
+    """
+    CREATE FUNCTION artworks_partition_interval(step text) RETURNS interval
+    LANGUAGE sql IMMUTABLE AS $$
+        SELECT CASE step WHEN 'month' THEN interval '1 month'
+                         WHEN 'quarter' THEN interval '3 months'
+                         ELSE interval '1 year' END
+    $$
+    """,
+    # Секция, в которую попадает value. Строки её диапазона, успевшие лечь
+    # в artworks_default, сначала переезжают в неё (мимо триггеров родителя -
+    # для artwork_stats и версий таблиц это не изменение), иначе ATTACH упал бы.
+    # На родителе ATTACH берёт SHARE UPDATE EXCLUSIVE, но artworks_default
+    # он блокирует ACCESS EXCLUSIVE и целиком сканирует, проверяя, что строк
+    # нового диапазона в ней нет. До COMMIT вызывающей транзакции ждут запись
+    # в artworks_default и чтение artworks без отсечения секций; время - по
+    # размеру artworks_default, поэтому секции создаются заранее (app/partitions.py),
+    # пока она пуста. Уже существующая секция возвращается без блокировок.
+    """
+    CREATE FUNCTION artworks_create_partition(value text, parent text DEFAULT 'artworks') RETURNS text
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        cfg artworks_partitioning%ROWTYPE;
+        low text;
+        high text;
+        name text;
+        low_ts timestamp;
+        low_year integer;
+    BEGIN
+        SELECT * INTO STRICT cfg FROM artworks_partitioning;
+        IF cfg.key = 'created_at' THEN
+            low_ts := date_trunc(cfg.step, value::timestamp);
+            low := low_ts::text;
+            high := (low_ts + artworks_partition_interval(cfg.step))::text;
+            name := 'artworks_p' || to_char(low_ts, CASE cfg.step WHEN 'month' THEN 'YYYY_MM'
+                                                                   WHEN 'quarter' THEN 'YYYY_"q"Q'
+                                                                   ELSE 'YYYY' END);
+        ELSE
+            low_year := floor(value::integer / cfg.step::numeric)::integer * cfg.step::integer;
+            low := low_year::text;
+            high := (low_year + cfg.step::integer)::text;
+            name := 'artworks_y' || CASE WHEN low_year < 0 THEN 'm' || -low_year ELSE low_year::text END;
+        END IF;
+
+        -- параллельные воркеры создают одни и те же секции
+        PERFORM pg_advisory_xact_lock(hashtext('artworks_create_partition'));
+        IF to_regclass(name) IS NOT NULL THEN
+            RETURN name;
+        END IF;
+        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', name, parent);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM artworks_default WHERE %I >= %L AND %I < %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved',
+            cfg.key, low, cfg.key, high, name
+        );
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', parent, name, low, high);
+        RETURN name;
+    END
+    $$
+    """,
+    # Секции, покрывающие [low, high]; возвращает число шагов
+    """
+    CREATE FUNCTION artworks_create_partitions(low text, high text, parent text DEFAULT 'artworks') RETURNS integer
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        cfg artworks_partitioning%ROWTYPE;
+        value text;
+        values text[];
+        created integer := 0;
+    BEGIN
+        SELECT * INTO STRICT cfg FROM artworks_partitioning;
+        IF cfg.key = 'created_at' THEN
+            values := ARRAY(SELECT g::text FROM generate_series(
+                date_trunc(cfg.step, low::timestamp), high::timestamp, artworks_partition_interval(cfg.step)
+            ) AS g);
+        ELSE
+            values := ARRAY(SELECT g::text FROM generate_series(
+                floor(low::integer / cfg.step::numeric)::integer * cfg.step::integer, high::integer, cfg.step::integer
+            ) AS g);
+        END IF;
+        FOREACH value IN ARRAY values LOOP
+            PERFORM artworks_create_partition(value, parent);
+            created := created + 1;
+        END LOOP;
+        RETURN created;
+    END
+    $$
+    """,
+    # Текущая секция и ahead следующих - вызывается периодически (app/partitions.py)
+    """
+    CREATE FUNCTION artworks_create_future_partitions(ahead integer, parent text DEFAULT 'artworks') RETURNS integer
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        cfg artworks_partitioning%ROWTYPE;
+        today timestamp := now() AT TIME ZONE 'UTC';
+        this_year integer := extract(year FROM now() AT TIME ZONE 'UTC');
+    BEGIN
+        SELECT * INTO STRICT cfg FROM artworks_partitioning;
+        IF cfg.key = 'created_at' THEN
+            RETURN artworks_create_partitions(
+                today::text, (today + ahead * artworks_partition_interval(cfg.step))::text, parent
+            );
+        END IF;
+        RETURN artworks_create_partitions(this_year::text, (this_year + ahead * cfg.step::integer)::text, parent);
+    END
+    $$
+    """,
+]
+
+# Журнал изменений старой таблицы на время копирования: id каждой
+# вставленной, изменённой или удалённой строки. Перед переключением эти
+# строки перекопируются из artworks - так данные, изменённые во время
+# копирования (в том числе в уже скопированных диапазонах), не теряются.
+LOG_FUNCTION = """
+    CREATE FUNCTION artworks_partition_log() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            TRUNCATE artworks_partitioned, artworks_partition_log;
+            RETURN NULL;
+        END IF;
+        IF TG_OP <> 'INSERT' THEN
+            INSERT INTO artworks_partition_log VALUES (OLD.id);
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            INSERT INTO artworks_partition_log VALUES (NEW.id);
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+# Строки из журнала: удалить копии и скопировать заново (удалённые - просто удалить).
+# Отдельными командами: в одном WITH порядок DELETE и INSERT не определён
+CATCH_UP_SQL = """
+    DO $$
+    BEGIN
+        CREATE TEMP TABLE artworks_partition_ids (id integer);
+        WITH drained AS (DELETE FROM artworks_partition_log RETURNING id)
+        INSERT INTO artworks_partition_ids SELECT DISTINCT id FROM drained;
+        DELETE FROM {target} WHERE id IN (SELECT id FROM artworks_partition_ids);
+        INSERT INTO {target} SELECT * FROM artworks WHERE id IN (SELECT id FROM artworks_partition_ids);
+        DROP TABLE artworks_partition_ids;
+    END
+    $$
+"""
+
+
+def _check_config():
+    key, step = config.ARTWORKS_PARTITION_KEY, config.ARTWORKS_PARTITION_STEP
+    if key not in PARTITION_KEYS:
+        raise ValueError(f'ARTWORKS_PARTITION_KEY: {key!r}, допустимо {", ".join(PARTITION_KEYS)}')
+    if key == 'created_at' and step not in CREATED_AT_STEPS:
+        raise ValueError(f'ARTWORKS_PARTITION_STEP для created_at: {", ".join(CREATED_AT_STEPS)}')
+    if key == 'year_created' and not (step.isdigit() and int(step) > 0):
+        raise ValueError('ARTWORKS_PARTITION_STEP для year_created - целое число лет')
+    return key, step
+
+
+def _index_definitions(bind, table: str, target: str):
+    """CREATE INDEX индексов table (кроме индексов ограничений) для target, с именами <имя>__new"""
+    rows = bind.execute(sa.text("""
+        SELECT i.indexname, i.indexdef
+        FROM pg_indexes i
+        WHERE i.schemaname = current_schema() AND i.tablename = :table
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint c
+              WHERE c.conindid = (quote_ident(i.schemaname) || '.' || quote_ident(i.indexname))::regclass
+          )
+    """), {'table': table}).all()
+    return [
+        (name, _INDEX_RE.sub(lambda m: f'{m[1]}{m[2]}__new ON {m[3] or ""}{target} {m[4]}', definition))
+        for name, definition in rows
+    ]
+
+
+def _foreign_keys(bind, table: str):
+    return bind.execute(sa.text("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'
+    """), {'table': table}).all()
+
+
+def _triggers(bind, table: str):
+    """Определения пользовательских триггеров - они пересоздаются на новой таблице"""
+    return bind.execute(sa.text("""
+        SELECT pg_get_triggerdef(oid) FROM pg_trigger
+        WHERE tgrelid = CAST(:table AS regclass) AND NOT tgisinternal
+          AND tgname NOT LIKE 'artworks_partition_%'
+    """), {'table': table}).scalars().all()
+
+
+def _build_indexes(bind, table: str, target: str):
+    """Индексы и внешние ключи table на target; возвращает имена индексов для переименования"""
+    indexes = _index_definitions(bind, table, target)
+    for name, definition in indexes:
+        log.info('artworks: индекс %s', name)
+        op.execute(definition)
+    for name, definition in _foreign_keys(bind, table):
+        op.execute(f'ALTER TABLE {target} ADD CONSTRAINT {name} {definition}')
+    return [name for name, _ in indexes]
+
+
+def _lock_artworks(bind):
+    """ACCESS EXCLUSIVE с коротким lock_timeout и повторами - не выстраивать очередь за долгим запросом"""
+    for attempt in range(1, LOCK_ATTEMPTS + 1):
+        try:
+            with bind.begin_nested():
+                op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                op.execute('LOCK TABLE artworks IN ACCESS EXCLUSIVE MODE')
+            op.execute('SET LOCAL lock_timeout TO DEFAULT')
+            return
+        except sa.exc.OperationalError:
+            log.info('artworks: блокировка не получена (попытка %s из %s)', attempt, LOCK_ATTEMPTS)
+    raise RuntimeError('Не удалось заблокировать artworks для переключения')
+
+
+def _swap(bind, target: str, indexes, primary_key: str):
+    """Под ACCESS EXCLUSIVE: target становится artworks, старая таблица удаляется"""
+    triggers = _triggers(bind, 'artworks')
+    op.execute('ALTER SEQUENCE artworks_id_seq OWNED BY {}.id'.format(target))
+    op.execute('DROP TABLE artworks')
+    op.execute(f'ALTER TABLE {target} RENAME TO artworks')
+    for name in indexes:
+        op.execute(f'ALTER INDEX {name}__new RENAME TO {name}')
+    op.execute(f'ALTER INDEX {target}_{primary_key} RENAME TO artworks_{primary_key}')
+    for definition in triggers:
+        op.execute(definition)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    key, step = _check_config()
+    bind = op.get_bind()
+
+    # 1. Новая таблица с секциями и журнал изменений старой (короткая транзакция)
+    op.execute("""
+        CREATE TABLE artworks_partitioning (
+            key text NOT NULL,
+            step text NOT NULL
+        )
+    """)
+    op.execute(sa.text('INSERT INTO artworks_partitioning VALUES (:key, :step)').bindparams(key=key, step=step))
+    for function in PARTITION_FUNCTIONS:
+        op.execute(function)
+
+    op.execute(f'CREATE TABLE artworks_partitioned (LIKE artworks INCLUDING DEFAULTS) PARTITION BY RANGE ({key})')
+    op.execute('CREATE TABLE artworks_default PARTITION OF artworks_partitioned DEFAULT')
+    low, high = bind.execute(sa.text(f'SELECT min({key})::text, max({key})::text FROM artworks')).one()
+    if low is not None:
+        op.execute(sa.text("SELECT artworks_create_partitions(:low, :high, 'artworks_partitioned')")
+                   .bindparams(low=low, high=high))
+    op.execute(sa.text("SELECT artworks_create_future_partitions(:ahead, 'artworks_partitioned')")
+               .bindparams(ahead=config.ARTWORKS_PARTITIONS_AHEAD))
+
+    op.execute('CREATE TABLE artworks_partition_log (id integer NOT NULL)')
+    op.execute(LOG_FUNCTION)
+    op.execute("""
+        CREATE TRIGGER artworks_partition_log AFTER INSERT OR UPDATE OR DELETE ON artworks
+        FOR EACH ROW EXECUTE FUNCTION artworks_partition_log()
+    """)
+    op.execute("""
+        CREATE TRIGGER artworks_partition_truncate AFTER TRUNCATE ON artworks
+        FOR EACH STATEMENT EXECUTE FUNCTION artworks_partition_log()
+    """)
+
+    # 2. Копирование и индексы - без общей транзакции, artworks читается и пишется
+    with op.get_context().autocommit_block():
+        min_id, max_id = bind.execute(sa.text('SELECT min(id), max(id) FROM artworks')).one()
+        if min_id is not None:
+            for id_from in range(min_id, max_id + 1, COPY_BATCH):
+                op.execute(
+                    'INSERT INTO artworks_partitioned SELECT * FROM artworks '
+                    f'WHERE id >= {id_from} AND id < {id_from + COPY_BATCH}'
+                )
+                log.info('artworks: скопировано до id %s из %s', min(id_from + COPY_BATCH - 1, max_id), max_id)
+
+        # id уникален по последовательности; ограничение секционированной
+        # таблицы обязано включать ключ секционирования
+        if key == 'created_at':
+            op.execute('ALTER TABLE artworks_partitioned ADD CONSTRAINT artworks_partitioned_pkey PRIMARY KEY (id, created_at)')
+        else:
+            op.execute('ALTER TABLE artworks_partitioned ADD CONSTRAINT artworks_partitioned_id_year_created_key UNIQUE (id, year_created)')
+        indexes = _build_indexes(bind, 'artworks', 'artworks_partitioned')
+        op.execute('ANALYZE artworks_partitioned')
+
+        for _ in range(CATCH_UP_PASSES):
+            moved = bind.execute(sa.text('SELECT count(*) FROM artworks_partition_log')).scalar()
+            if moved < CATCH_UP_ROWS:
+                break
+            op.execute(CATCH_UP_SQL.format(target='artworks_partitioned'))
+            log.info('artworks: догнали %s изменений', moved)
+
+    # 3. Переключение: остаток журнала, замена таблицы, триггеры
+    _lock_artworks(bind)
+    op.execute(CATCH_UP_SQL.format(target='artworks_partitioned'))
+    _swap(bind, 'artworks_partitioned', indexes, 'pkey' if key == 'created_at' else 'id_year_created_key')
+    op.execute('DROP TABLE artworks_partition_log')
+    op.execute('DROP FUNCTION artworks_partition_log()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Обратно в одну таблицу - целиком в транзакции, запись в artworks на это время блокируется
+    bind = op.get_bind()
+    op.execute('LOCK TABLE artworks IN SHARE MODE')
+    op.execute('CREATE TABLE artworks_unpartitioned (LIKE artworks INCLUDING DEFAULTS)')
+    op.execute('INSERT INTO artworks_unpartitioned SELECT * FROM artworks')
+    op.execute('ALTER TABLE artworks_unpartitioned ADD CONSTRAINT artworks_unpartitioned_pkey PRIMARY KEY (id)')
+    indexes = _build_indexes(bind, 'artworks', 'artworks_unpartitioned')
+    _lock_artworks(bind)
+    _swap(bind, 'artworks_unpartitioned', indexes, 'pkey')
+    for function in (
+        'artworks_create_future_partitions(integer, text)',
+        'artworks_create_partitions(text, text, text)',
+        'artworks_create_partition(text, text)',
+        'artworks_partition_interval(text)',
+    ):
+        op.execute(f'DROP FUNCTION {function}')
+    op.execute('DROP TABLE artworks_partitioning')
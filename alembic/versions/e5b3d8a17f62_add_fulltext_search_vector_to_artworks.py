@@ -0,0 +1,100 @@
+"""Add full-text search_vector to artworks
+
+Revision ID: e5b3d8a17f62
+Revises: c7a92f3e6b18
+Create Date: 2026-10-18 12:37:09.331840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b3d8a17f62'
+down_revision: Union[str, Sequence[str], None] = 'c7a92f3e6b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Генерируемая колонка не может ссылаться на artists.name,
+    # поэтому search_vector поддерживают триггеры.
+    op.add_column('artworks', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Документ: название (A), имя художника (B), описание (C).
+    # Конфигурация russian разбирает кириллицу русским стеммером, а латиницу
+    # английским; simple добавляет словоформы как есть - для lang=simple.
+    op.execute("""
+        CREATE FUNCTION artworks_search_document(title text, description text, artist_name text)
+        RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+            SELECT setweight(to_tsvector('russian', coalesce(title, ''))
+                             || to_tsvector('simple', coalesce(title, '')), 'A')
+                || setweight(to_tsvector('russian', coalesce(artist_name, ''))
+                             || to_tsvector('simple', coalesce(artist_name, '')), 'B')
+                || setweight(to_tsvector('russian', coalesce(description, ''))
+                             || to_tsvector('simple', coalesce(description, '')), 'C')
+        $$
+    """)
+
+    op.execute("""
+        CREATE FUNCTION artworks_search_vector_update() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.search_vector := artworks_search_document(
+                NEW.title, NEW.description,
+                (SELECT name FROM artists WHERE id = NEW.artist_id)
+            );
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER artworks_search_vector
+        BEFORE INSERT OR UPDATE OF title, description, artist_id ON artworks
+        FOR EACH ROW EXECUTE FUNCTION artworks_search_vector_update()
+    """)
+
+    # Переименование художника пересобирает документы его произведений
+    op.execute("""
+        CREATE FUNCTION artists_search_vector_update() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE artworks
+            SET search_vector = artworks_search_document(title, description, NEW.name)
+            WHERE artist_id = NEW.id;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER artists_search_vector
+        AFTER UPDATE OF name ON artists
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION artists_search_vector_update()
+    """)
+
+    # Заполняем существующие строки
+    op.execute("""
+        UPDATE artworks
+        SET search_vector = artworks_search_document(
+            title, description,
+            (SELECT name FROM artists WHERE id = artworks.artist_id)
+        )
+    """)
+
+    op.execute('CREATE INDEX ix_artworks_search_vector ON artworks USING gin (search_vector)')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_artworks_search_vector', table_name='artworks')
+    op.execute('DROP TRIGGER artists_search_vector ON artists')
+    op.execute('DROP FUNCTION artists_search_vector_update()')
+    op.execute('DROP TRIGGER artworks_search_vector ON artworks')
+    op.execute('DROP FUNCTION artworks_search_vector_update()')
+    op.execute('DROP FUNCTION artworks_search_document(text, text, text)')
+    op.drop_column('artworks', 'search_vector')
@@ -0,0 +1,135 @@
+"""Add filter and covering indexes for artworks, drop duplicate id indexes
+
+Revision ID: f2c8e4a6b719
+Revises: d5a7c3e9f812
+Create Date: 2026-10-19 09:05:41.226093
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8e4a6b719'
+down_revision: Union[str, Sequence[str], None] = 'd5a7c3e9f812'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+log = logging.getLogger('alembic.runtime.migration')
+
+# DROP INDEX секционированного индекса (CONCURRENTLY он не принимает) ждёт
+# ACCESS EXCLUSIVE не дольше LOCK_TIMEOUT - не выстраиваем очередь за долгим запросом
+LOCK_TIMEOUT = '5s'
+
+# (имя, таблица, колонки) - по формам запросов API:
+INDEXES = [
+    # /artworks/filter/ и /artworks/export/: artist_id|museum_id|genre_id = ?
+    # ORDER BY id LIMIT - проход по индексу уже в порядке id, без сортировки.
+    # INCLUDE year_created: fresh-статистика (count(id), avg(year_created)
+    # GROUP BY внешнему ключу) обходится index-only scan без чтения таблицы
+    ('ix_artworks_artist_id_id', 'artworks', '(artist_id, id) INCLUDE (year_created)'),
+    ('ix_artworks_museum_id_id', 'artworks', '(museum_id, id) INCLUDE (year_created)'),
+    ('ix_artworks_genre_id_id', 'artworks', '(genre_id, id) INCLUDE (year_created)'),
+    # min_year/max_year сравнивают саму колонку - ix_artworks_year_id построен
+    # по COALESCE для сортировки и для диапазона не подходит
+    ('ix_artworks_year_created_id', 'artworks', '(year_created, id)'),
+]
+
+# index=True у первичных ключей в моделях: копии *_pkey, которые каждая
+# запись обновляла впустую
+DUPLICATES = [
+    ('ix_artworks_id', 'artworks', '(id)'),
+    ('ix_artists_id', 'artists', '(id)'),
+    ('ix_genres_id', 'genres', '(id)'),
+    ('ix_museums_id', 'museums', '(id)'),
+]
+
+
+def _is_partitioned(bind, table: str) -> bool:
+    return bind.execute(sa.text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = CAST(:table AS regclass)"
+    ), {'table': table}).scalar()
+
+
+def _partitions(bind, table: str):
+    return bind.execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname
+    """), {'table': table}).scalars().all()
+
+
+def _indexed_partitions(bind, index: str):
+    """Секции, индексы которых уже присоединены к секционированному индексу"""
+    return set(bind.execute(sa.text("""
+        SELECT t.relname FROM pg_inherits i
+        JOIN pg_index x ON x.indexrelid = i.inhrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        WHERE i.inhparent = CAST(:index AS regclass)
+    """), {'index': index}).scalars().all())
+
+
+def _drop_invalid(bind, index: str):
+    """Прерванный CREATE INDEX CONCURRENTLY оставляет INVALID индекс - перед повтором удаляем"""
+    invalid = bind.execute(sa.text(
+        'SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:index)'
+    ), {'index': index}).scalar()
+    if invalid:
+        op.execute(f'DROP INDEX CONCURRENTLY {index}')
+
+
+def _create_index(bind, name: str, table: str, columns: str):
+    """CREATE INDEX без блокировки записи; повторный запуск достраивает недостающее"""
+    if not _is_partitioned(bind, table):
+        _drop_invalid(bind, name)
+        op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {columns}')
+        return
+    # Секционированной таблице CONCURRENTLY недоступен: пустой невалидный
+    # индекс только на родителе (ON ONLY), затем индекс каждой секции
+    # CONCURRENTLY и ATTACH - после последней секции родительский становится
+    # валидным. Секции, созданные тем временем, получают индекс при ATTACH сами
+    op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} {columns}')
+    indexed = _indexed_partitions(bind, name)
+    for partition in _partitions(bind, table):
+        if partition in indexed:
+            continue
+        child = f'{partition}_{name}'
+        _drop_invalid(bind, child)
+        op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} {columns}')
+        op.execute(f'ALTER INDEX {name} ATTACH PARTITION {child}')
+        log.info('%s: индекс %s', partition, name)
+
+
+def _drop_index(bind, name: str, table: str):
+    if not _is_partitioned(bind, table):
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+        return
+    op.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+    op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute('SET lock_timeout TO DEFAULT')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # CONCURRENTLY не работает в транзакции; каждый шаг идемпотентен -
+    # после сбоя upgrade можно просто запустить снова
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            _create_index(bind, name, table, columns)
+            log.info('%s: индекс %s', table, name)
+        for name, table, _ in DUPLICATES:
+            _drop_index(bind, name, table)
+            log.info('%s: удалён дубль первичного ключа %s', table, name)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        for name, table, columns in DUPLICATES:
+            _create_index(bind, name, table, columns)
+        for name, table, _ in reversed(INDEXES):
+            _drop_index(bind, name, table)
@@ -1,98 +1,329 @@
+import json
+import logging
+import re
+from datetime import datetime
+
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, text
-from app import models, schemas
+from sqlalchemy import Integer, Numeric, Text, and_, case, cast, func, insert, inspect, literal_column, select, text
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.exc import DBAPIError
+from app import facets as facet_counts, models, schemas, pagination, versions
+
+logger = logging.getLogger(__name__)
+
+
+def table_columns(model):
+    """Колонки таблицы без служебных (search_vector поддерживает триггер)"""
+    return [c for c in model.__table__.c if c.name != "search_vector"]
+
+# Колонки artworks в порядке полей schemas.Artwork. Списки читают их
+# кортежами, без ORM-объектов и валидации pydantic, и кодируют строки
+# в JSON как есть (app/fastjson.py)
+ARTWORK_FIELDS = tuple(schemas.Artwork.model_fields)
+
+def artwork_fields(fields: str = None, expand=()):
+    """
+    fields=id,title,year_created -> кортеж полей ответа в порядке ARTWORK_FIELDS.
+    Пусто - все поля. Внешние ключи связей из expand добавляются всегда:
+    по ним объект находится в included. ValueError на неизвестном поле.
+    """
+    if fields is None or not fields.strip():
+        return ARTWORK_FIELDS
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(ARTWORK_FIELDS)
+    if unknown:
+        raise ValueError(
+            f"Неизвестные поля: {', '.join(sorted(unknown))}. Допустимые: {', '.join(ARTWORK_FIELDS)}"
+        )
+    requested.update(expand_key(relation) for relation in expand)
+    return tuple(name for name in ARTWORK_FIELDS if name in requested)
+
+def artwork_rows(db: Session, fields=ARTWORK_FIELDS, sort_by: str = "id"):
+    """
+    db.query по колонкам fields - строки Row вместо models.Artwork.
+    id и колонка сортировки нужны для курсора: если их не просили,
+    они выбираются после fields и в ответ не попадают.
+    """
+    names = list(fields)
+    for name in ("id", pagination.SORT_COLUMNS.get(sort_by, "id")):
+        if name not in names:
+            names.append(name)
+    return db.query(*[models.Artwork.__table__.c[name] for name in names])
+
+#  EXPAND ----------------
+# expand=artist,genre,museum: связанные объекты по relationship из models.Artwork.
+# Как selectinload - один запрос WHERE id IN (...) на связь для всей страницы,
+# каждый объект один раз, сколько бы строк на него ни ссылалось.
+# Строки страницы - колонки, а не ORM-объекты, поэтому IN-запрос строится
+# по описанию relationship вручную.
+EXPAND_SCHEMAS = {
+    "artist": schemas.Artist,
+    "genre": schemas.Genre,
+    "museum": schemas.Museum,
+}
+
+def expand_key(relation: str) -> str:
+    """Внешний ключ artworks для связи: artist -> artist_id"""
+    return next(iter(inspect(models.Artwork).relationships[relation].local_columns)).name
+
+def expand_target(relation: str):
+    """Модель на другом конце связи: artist -> models.Artist"""
+    return inspect(models.Artwork).relationships[relation].mapper.class_
+
+def artwork_expand(expand: str = None):
+    """expand=artist,museum -> кортеж связей; ValueError на неизвестной связи"""
+    if expand is None or not expand.strip():
+        return ()
+    requested = {name.strip() for name in expand.split(",") if name.strip()}
+    unknown = requested.difference(EXPAND_SCHEMAS)
+    if unknown:
+        raise ValueError(
+            f"Неизвестные связи: {', '.join(sorted(unknown))}. Допустимые: {', '.join(EXPAND_SCHEMAS)}"
+        )
+    return tuple(name for name in EXPAND_SCHEMAS if name in requested)
+
+def load_related(db: Session, rows, relations):
+    """
+    {связь: {id: объект}} для строк страницы (Row или dict с внешними ключами).
+    NULL во внешнем ключе пропускается - строка остаётся без объекта.
+    """
+    related = {}
+    for relation in relations:
+        key = expand_key(relation)
+        ids = {getattr(row, "_mapping", row)[key] for row in rows}
+        ids.discard(None)
+        target = expand_target(relation)
+        names = tuple(EXPAND_SCHEMAS[relation].model_fields)
+        objects = db.query(*[target.__table__.c[name] for name in names]).filter(
+            target.id.in_(ids)
+        ).order_by(target.id).all() if ids else []
+        related[relation] = {obj.id: dict(zip(names, obj)) for obj in objects}
+    return related
 
+#  BULK ----------------
+def _insert_returning(db: Session, model, rows):
+    """Многострочный INSERT ... RETURNING, возвращает строки в порядке rows"""
+    stmt = insert(model.__table__).returning(*table_columns(model), sort_by_parameter_order=True)
+    return db.execute(stmt, rows).all()
+
+def insert_rows(db: Session, model, rows, isolated: bool = True):
+    """
+    rows одним INSERT ... RETURNING в SAVEPOINT; если он упал - по одной
+    строке, каждая в своём SAVEPOINT, чтобы найти виноватые. Список той же
+    длины, что rows: Row вставленной строки или DBAPIError. Без COMMIT.
+    isolated=False - без SAVEPOINT, ошибка поднимается (в транзакции
+    больше ничего нет - изолировать не от чего)
+    """
+    if not isolated:
+        return _insert_returning(db, model, rows)
+    if len(rows) > 1:
+        try:
+            with db.begin_nested():
+                return _insert_returning(db, model, rows)
+        except DBAPIError:
+            pass
+
+    results = []
+    for row in rows:
+        try:
+            with db.begin_nested():
+                results.extend(_insert_returning(db, model, [row]))
+        except DBAPIError as e:
+            results.append(e)
+    return results
+
+def _bulk_create(db: Session, model, items, chunk_size: int = 500, atomic: bool = True):
+    """
+    Вставка списка схем *Create пачками по chunk_size (insert_rows).
+    atomic=True - при любой ошибке откатываем всё, иначе сохраняем успешные.
+    """
+    rows = [item.dict() for item in items]
+    created = []
+    errors = []
+
+    for start in range(0, len(rows), chunk_size):
+        for offset, result in enumerate(insert_rows(db, model, rows[start:start + chunk_size])):
+            if isinstance(result, DBAPIError):
+                errors.append({"index": start + offset, "error": str(result.orig).splitlines()[0]})
+            else:
+                created.append(result)
+
+    if atomic and errors:
+        db.rollback()
+        created = []
+    else:
+        if created:
+            versions.table_versions.touch(model.__tablename__)
+        db.commit()
+
+    return {"created": len(created), "errors": errors, "data": created}
+
+def _create_one(db: Session, model, item):
+    """
+    Одна строка: INSERT ... RETURNING и COMMIT - id, created_at и прочие
+    значения по умолчанию приходят с самой вставкой, без SELECT, которым
+    db.refresh перечитывал объект. Групповой коммит - app/group_commit.py
+    """
+    row = _insert_returning(db, model, [item.dict()])[0]
+    versions.table_versions.touch(model.__tablename__)
+    db.commit()
+    return row
 
 #  ARTIST ----------------
 def create_artist(db: Session, artist: schemas.ArtistCreate):
-    db_artist = models.Artist(**artist.dict())
-    db.add(db_artist)
-    db.commit()
-    db.refresh(db_artist)
-    return db_artist
+    return _create_one(db, models.Artist, artist)
+
+def create_artists_bulk(db: Session, artists, chunk_size: int = 500, atomic: bool = True):
+    return _bulk_create(db, models.Artist, artists, chunk_size=chunk_size, atomic=atomic)
 
 def get_artists(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Artist).offset(skip).limit(limit).all()
 
 #  GENRE ----------------
 def create_genre(db: Session, genre: schemas.GenreCreate):
-    db_genre = models.Genre(**genre.dict())
-    db.add(db_genre)
-    db.commit()
-    db.refresh(db_genre)
-    return db_genre
+    return _create_one(db, models.Genre, genre)
+
+def create_genres_bulk(db: Session, genres, chunk_size: int = 500, atomic: bool = True):
+    return _bulk_create(db, models.Genre, genres, chunk_size=chunk_size, atomic=atomic)
 
 def get_genres(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Genre).offset(skip).limit(limit).all()
 
 #  MUSEUM ----------------
 def create_museum(db: Session, museum: schemas.MuseumCreate):
-    db_museum = models.Museum(**museum.dict())
-    db.add(db_museum)
-    db.commit()
-    db.refresh(db_museum)
-    return db_museum
+    return _create_one(db, models.Museum, museum)
+
+def create_museums_bulk(db: Session, museums, chunk_size: int = 500, atomic: bool = True):
+    return _bulk_create(db, models.Museum, museums, chunk_size=chunk_size, atomic=atomic)
 
 def get_museums(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Museum).offset(skip).limit(limit).all()
 
 #  ARTWORK ----------------
 def create_artwork(db: Session, artwork: schemas.ArtworkCreate):
-    db_artwork = models.Artwork(**artwork.dict())
-    db.add(db_artwork)
-    db.commit()
-    db.refresh(db_artwork)
-    return db_artwork
+    row = _create_one(db, models.Artwork, artwork)
+    pagination.invalidate_counts()
+    return row
+
+def create_artworks_bulk(db: Session, artworks, chunk_size: int = 500, atomic: bool = True):
+    result = _bulk_create(db, models.Artwork, artworks, chunk_size=chunk_size, atomic=atomic)
+    if result["created"]:
+        pagination.invalidate_counts()
+    return result
 
 def get_artworks(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Artwork).offset(skip).limit(limit).all()
 
 #  СЛОЖНЫЕ ЗАПРОСЫ 
-def get_artworks_filtered(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
+def artwork_filters(
     min_year: int = None,
     max_year: int = None,
     artist_id: int = None,
     museum_id: int = None,
-    genre_id: int = None
+    genre_id: int = None,
+    created_from: datetime = None,
+    created_to: datetime = None
 ):
-    """SELECT ... WHERE с несколькими условиями"""
-    query = db.query(models.Artwork)
-    
+    """
+    Условия WHERE для фильтров по году, художнику, музею, жанру и дате
+    добавления. Год и created_at сравниваются с самой колонкой - по ним
+    PostgreSQL отсекает секции artworks.
+    """
     filters = []
     if min_year:
         filters.append(models.Artwork.year_created >= min_year)
     if max_year:
         filters.append(models.Artwork.year_created <= max_year)
+    if created_from:
+        filters.append(models.Artwork.created_at >= created_from)
+    if created_to:
+        filters.append(models.Artwork.created_at < created_to)
     if artist_id:
         filters.append(models.Artwork.artist_id == artist_id)
     if museum_id:
         filters.append(models.Artwork.museum_id == museum_id)
     if genre_id:
         filters.append(models.Artwork.genre_id == genre_id)
+    return filters
+
+def get_artworks_filtered(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    min_year: int = None,
+    max_year: int = None,
+    artist_id: int = None,
+    museum_id: int = None,
+    genre_id: int = None,
+    created_from: datetime = None,
+    created_to: datetime = None,
+    fields=ARTWORK_FIELDS,
+    facets=None
+):
+    """
+    SELECT ... WHERE с несколькими условиями.
+    С facets (facets.FacetRequest) - {"data": строки, "facets": счётчики
+    по всему отфильтрованному набору}, посчитанные той же выборкой
+    """
+    query = artwork_rows(db, fields)
     
+    filters = artwork_filters(
+        min_year=min_year, max_year=max_year,
+        artist_id=artist_id, museum_id=museum_id, genre_id=genre_id,
+        created_from=created_from, created_to=created_to
+    )
     if filters:
         query = query.filter(and_(*filters))
     
-    return query.offset(skip).limit(limit).all()
+    page_query = query.order_by(models.Artwork.id).offset(skip).limit(limit)
+    if facets is None:
+        return page_query.all()
+    rows, counts = facet_counts.fetch(db, query, page_query, facets, first_page=skip == 0)
+    return {"data": rows, "facets": counts}
+
+def get_artworks_export_select(with_details: bool = False, **filters):
+    """
+    SELECT для выгрузки: только колонки, без ORM-объектов.
+    with_details - добавить имена художника, жанра и музея (LEFT JOIN,
+    чтобы произведения без связей не пропадали).
+    """
+    stmt = select(*table_columns(models.Artwork))
+    if with_details:
+        stmt = stmt.add_columns(
+            models.Artist.name.label("artist_name"),
+            models.Genre.name.label("genre_name"),
+            models.Museum.name.label("museum_name"),
+            models.Museum.country.label("museum_country")
+        ).outerjoin(
+            models.Artist, models.Artwork.artist_id == models.Artist.id
+        ).outerjoin(
+            models.Genre, models.Artwork.genre_id == models.Genre.id
+        ).outerjoin(
+            models.Museum, models.Artwork.museum_id == models.Museum.id
+        )
+    conditions = artwork_filters(**filters)
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+    return stmt.order_by(models.Artwork.id)
 
 def get_artworks_with_details(db: Session, skip: int = 0, limit: int = 100):
-    """JOIN: Получить artworks с информацией о художнике, жанре и музее"""
+    """
+    JOIN: Получить artworks с информацией о художнике, жанре и музее.
+    LEFT JOIN - произведения без художника, жанра или музея не пропадают
+    """
     results = db.query(
         models.Artwork,
         models.Artist.name.label("artist_name"),
         models.Genre.name.label("genre_name"),
         models.Museum.name.label("museum_name"),
         models.Museum.country.label("museum_country")
-    ).join(
+    ).outerjoin(
         models.Artist, models.Artwork.artist_id == models.Artist.id
-    ).join(
+    ).outerjoin(
         models.Genre, models.Artwork.genre_id == models.Genre.id
-    ).join(
+    ).outerjoin(
         models.Museum, models.Artwork.museum_id == models.Museum.id
-    ).offset(skip).limit(limit).all()
+    ).order_by(models.Artwork.id).offset(skip).limit(limit).all()
     
     artworks = []
     for artwork, artist_name, genre_name, museum_name, museum_country in results:
@@ -110,39 +341,166 @@ def get_artworks_with_details(db: Session, skip: int = 0, limit: int = 100):
     
     return artworks
 
-def update_expensive_artworks_discount(db: Session, discount_percent: float = 10.0):
-    """UPDATE с нетривиальным условием: скидка на дорогие произведения"""
-    artworks = db.query(models.Artwork).all()
+# Цена как numeric только у чисел: порядок AND-условий PostgreSQL не
+# гарантирует, и без CASE строка "on request" в пачке роняет всё задание.
+# То же выражение - в индексе ix_artworks_estimated_value_guarded
+_ESTIMATED_VALUE = """CASE WHEN jsonb_typeof(metadata_json->'estimated_value_usd') = 'number'
+                THEN (metadata_json->>'estimated_value_usd')::numeric END"""
+
+DISCOUNT_SQL = text(f"""
+    UPDATE artworks
+    SET metadata_json = jsonb_set(
+            metadata_json,
+            '{{estimated_value_usd}}',
+            -- без round масштаб numeric-деления (20 знаков) копится с каждой скидкой
+            to_jsonb(round({_ESTIMATED_VALUE} * (1 - CAST(:discount AS numeric) / 100), 2))
+        ) || jsonb_build_object(
+            'has_discount', true,
+            'discount_percent', CAST(:discount AS numeric)
+        )
+    WHERE id >= :id_from AND id < :id_to
+      AND jsonb_typeof(metadata_json->'estimated_value_usd') = 'number'
+      AND {_ESTIMATED_VALUE} > :threshold
+""")
+
+def update_expensive_artworks_discount(
+    db: Session,
+    discount_percent: float = 10.0,
+    threshold: float = 1000000,
+    chunk_size: int = 10000,
+    progress=None,
+    start_id: int = None,
+    max_id: int = None
+):
+    """
+    UPDATE с нетривиальным условием: скидка на дорогие произведения.
+    Один серверный UPDATE с jsonb_set на каждый диапазон id длиной chunk_size,
+    коммит после каждого диапазона - без загрузки строк в Python и без
+    одной гигантской транзакции.
+    progress(last_id, max_id, updated) вызывается после UPDATE диапазона, до
+    его COMMIT: то, что progress запишет в той же сессии (чекпойнт задания,
+    app/jobs.py), фиксируется вместе с диапазоном.
+    start_id, max_id - продолжить прерванный проход (скидка не идемпотентна,
+    диапазоны до start_id повторно не трогаются).
+    """
+    if start_id is None or max_id is None:
+        min_id, last_id = db.query(func.min(models.Artwork.id), func.max(models.Artwork.id)).one()
+        db.commit()
+        if min_id is None:
+            return 0
+        start_id = min_id if start_id is None else start_id
+        max_id = last_id if max_id is None else max_id
+
     updated = 0
-    
-    for artwork in artworks:
-        if (artwork.metadata_json and 
-            'estimated_value_usd' in artwork.metadata_json):
-            value = artwork.metadata_json['estimated_value_usd']
-            if isinstance(value, (int, float)) and value > 1000000:
-                new_value = value * (1 - discount_percent/100)
-                artwork.metadata_json['estimated_value_usd'] = new_value
-                artwork.metadata_json['has_discount'] = True
-                artwork.metadata_json['discount_percent'] = discount_percent
-                updated += 1
-    
-    if updated > 0:
+    for id_from in range(start_id, max_id + 1, chunk_size):
+        id_to = id_from + chunk_size
+        result = db.execute(DISCOUNT_SQL, {
+            "discount": discount_percent,
+            "threshold": threshold,
+            "id_from": id_from,
+            "id_to": id_to
+        })
+        updated += result.rowcount
+        if progress is not None:
+            progress(min(id_to - 1, max_id), max_id, updated)
+        if result.rowcount:
+            versions.table_versions.touch("artworks")
         db.commit()
+        logger.info("apply-discount: id < %s из %s, обновлено %s", id_to, max_id, updated)
+
     return updated
 
-def get_stats_by_country(db: Session):
+#  СТАТИСТИКА ----------------
+# По умолчанию читается artwork_stats (строк столько, сколько групп, а не
+# произведений); fresh=True - живой GROUP BY по artworks для сверки.
+
+def _stats_key():
+    """Ключ artwork_stats как текст (NULL для группы 'null')"""
+    return models.ArtworkStat.key.op("#>>")(literal_column("'{}'"))
+
+def _stats_avg_year():
+    stat = models.ArtworkStat
+    return (cast(stat.year_sum, Numeric) / func.nullif(stat.year_count, 0)).label("avg_year")
+
+def _stats_query(db: Session, dimension: str, *columns):
+    stat = models.ArtworkStat
+    return db.query(*columns, stat.artwork_count, _stats_avg_year()).select_from(stat).filter(
+        stat.dimension == dimension,
+        stat.artwork_count > 0
+    )
+
+def _avg(value):
+    return float(value) if value is not None else None
+
+def get_stats_by_country(db: Session, fresh: bool = False):
     """GROUP BY: Статистика произведений по странам музеев"""
-    stats = db.query(
-        models.Museum.country,
-        func.count(models.Artwork.id).label("artwork_count"),
-        func.avg(models.Artwork.year_created).label("avg_year")
-    ).join(
-        models.Artwork, models.Museum.id == models.Artwork.museum_id
-    ).group_by(
-        models.Museum.country
-    ).all()
-    
-    return [{"country": s[0], "artwork_count": s[1], "avg_year": float(s[2]) if s[2] else None} for s in stats]
+    if fresh:
+        stats = db.query(
+            models.Museum.country,
+            func.count(models.Artwork.id).label("artwork_count"),
+            func.avg(models.Artwork.year_created).label("avg_year")
+        ).join(
+            models.Artwork, models.Museum.id == models.Artwork.museum_id
+        ).group_by(
+            models.Museum.country
+        ).order_by(models.Museum.country).all()
+    else:
+        key = _stats_key()
+        stats = _stats_query(db, "country", key).order_by(key).all()
+
+    return [{"country": s[0], "artwork_count": s[1], "avg_year": _avg(s[2])} for s in stats]
+
+def get_stats_by_genre(db: Session, fresh: bool = False):
+    """Статистика произведений по жанрам, по убыванию числа произведений"""
+    if fresh:
+        artwork_count = func.count(models.Artwork.id)
+        stats = db.query(
+            models.Genre.id, models.Genre.name, artwork_count, func.avg(models.Artwork.year_created)
+        ).join(
+            models.Artwork, models.Artwork.genre_id == models.Genre.id
+        ).group_by(models.Genre.id).order_by(artwork_count.desc(), models.Genre.id).all()
+    else:
+        stats = _stats_query(db, "genre", models.Genre.id, models.Genre.name).join(
+            models.Genre, models.Genre.id == cast(_stats_key(), Integer)
+        ).order_by(models.ArtworkStat.artwork_count.desc(), models.Genre.id).all()
+
+    return [
+        {"genre_id": s[0], "genre_name": s[1], "artwork_count": s[2], "avg_year": _avg(s[3])}
+        for s in stats
+    ]
+
+def get_stats_by_artist(db: Session, skip: int = 0, limit: int = 100, fresh: bool = False):
+    """Статистика произведений по художникам, по убыванию числа произведений"""
+    if fresh:
+        artwork_count = func.count(models.Artwork.id)
+        query = db.query(
+            models.Artist.id, models.Artist.name, artwork_count, func.avg(models.Artwork.year_created)
+        ).join(
+            models.Artwork, models.Artwork.artist_id == models.Artist.id
+        ).group_by(models.Artist.id).order_by(artwork_count.desc(), models.Artist.id)
+    else:
+        query = _stats_query(db, "artist", models.Artist.id, models.Artist.name).join(
+            models.Artist, models.Artist.id == cast(_stats_key(), Integer)
+        ).order_by(models.ArtworkStat.artwork_count.desc(), models.Artist.id)
+    stats = query.offset(skip).limit(limit).all()
+
+    return [
+        {"artist_id": s[0], "artist_name": s[1], "artwork_count": s[2], "avg_year": _avg(s[3])}
+        for s in stats
+    ]
+
+def get_stats_by_decade(db: Session, fresh: bool = False):
+    """Статистика произведений по десятилетиям создания (decade=None - год не указан)"""
+    if fresh:
+        decade = func.artwork_decade(models.Artwork.year_created)
+        stats = db.query(
+            decade, func.count(models.Artwork.id), func.avg(models.Artwork.year_created)
+        ).group_by(decade).order_by(decade.asc().nulls_last()).all()
+    else:
+        decade = cast(_stats_key(), Integer)
+        stats = _stats_query(db, "decade", decade).order_by(decade.asc().nulls_last()).all()
+
+    return [{"decade": s[0], "artwork_count": s[1], "avg_year": _avg(s[2])} for s in stats]
 
 def get_artworks_sorted(db: Session, skip: int = 0, limit: int = 100, sort_by: str = "id", sort_order: str = "asc"):
     """Получить произведения с сортировкой"""
@@ -163,10 +521,13 @@ def get_artworks_sorted(db: Session, skip: int = 0, limit: int = 100, sort_by: s
     return db.query(models.Artwork).order_by(order_field).offset(skip).limit(limit).all()
 
 def search_artworks_by_metadata(
-    db: Session, 
-    pattern: str, 
-    skip: int = 0, 
-    limit: int = 100
+    db: Session,
+    pattern: str,
+    page: int = 1,
+    size: int = 10,
+    count: str = "exact",
+    fields=ARTWORK_FIELDS,
+    facets=None
 ):
     """
     Поиск по JSON полю metadata_json с использованием регулярного выражения
@@ -176,58 +537,205 @@ def search_artworks_by_metadata(
     - '.*1000000.*' - ищет число 1000000
     - '.*true.*' - ищет булево значение true
     """
-    
-    query = text("""
-        SELECT * 
-        FROM artworks 
-        WHERE metadata_json::text ~ :pattern
-        ORDER BY id
-        LIMIT :limit 
-        OFFSET :offset
-    """)
-    
-    result = db.execute(query, {
-        "pattern": pattern,
-        "limit": limit,
-        "offset": skip
-    })
-    
-    artworks = []
-    for row in result:
-        # row - это Row объект, преобразуем в dict
-        artwork_dict = dict(row._mapping)  # Используем _mapping для Python 3.11+
-        artworks.append(artwork_dict)
-    
-    return artworks
+    query = regex_metadata_query(db, pattern, fields)
+    return pagination.fetch_page(db, query, page=page, size=size, count=count, facets=facets)
+
+def regex_metadata_query(db: Session, pattern: str, fields=ARTWORK_FIELDS):
+    # metadata_json::text ~ pattern - то же выражение, что в индексе ix_artworks_metadata_json_gin
+    return artwork_rows(db, fields).filter(
+        cast(models.Artwork.metadata_json, Text).regexp_match(pattern)
+    )
+
+METADATA_KEY_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Числа, которые лежат внутри строк: size_cm хранится как "ШИРИНАxВЫСОТА"
+METADATA_DERIVED_NUMBERS = {
+    "size_cm.width": ("size_cm", 1),
+    "size_cm.height": ("size_cm", 2),
+}
+
+def _metadata_key(key: str):
+    # Ключ подставляется литералом, а не параметром: только так
+    # выражение совпадает с индексом ix_artworks_estimated_value_guarded
+    if not METADATA_KEY_RE.match(key):
+        raise ValueError(f"Некорректный ключ metadata_json: {key!r}")
+    return literal_column(f"'{key}'")
+
+def _metadata_number(key: str):
+    """(выражение numeric, условие что значение - число) для ключа range"""
+    metadata = models.Artwork.metadata_json
+    if key in METADATA_DERIVED_NUMBERS:
+        source, part = METADATA_DERIVED_NUMBERS[key]
+        raw = metadata.op("->>")(_metadata_key(source))
+        guard = raw.op("~")(literal_column(r"'^[0-9]+x[0-9]+$'"))
+        number = case((guard, cast(func.split_part(raw, "x", part), Numeric)))
+        return number, None
+    # Порядок AND-условий PostgreSQL не гарантирует: приведение - только
+    # внутри CASE, guard отдельно - для частичного индекса по тому же CASE
+    guard = func.jsonb_typeof(metadata.op("->")(_metadata_key(key))) == literal_column("'number'")
+    return case((guard, cast(metadata.op("->>")(_metadata_key(key)), Numeric))), guard
 
-def get_artworks_paginated(db: Session, page: int = 1, size: int = 10):
+def _parse_metadata_value(raw: str):
+    """true/false/null/числа - как JSON, всё остальное - строка"""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+def _parse_number(raw: str, item: str):
+    try:
+        return float(raw)
+    except ValueError:
+        raise ValueError(f"Граница диапазона должна быть числом: {item!r}")
+
+def metadata_conditions(eq=(), ranges=(), has=()):
+    """
+    Условия структурного поиска по metadata_json.
+    eq:     ["style:oil", "is_famous:true"]  -> metadata_json @> '{"style": "oil", "is_famous": true}'
+    ranges: ["estimated_value_usd:1000000..5000000", "size_cm.width:..100"]
+    has:    ["discount_percent"]             -> metadata_json ? 'discount_percent'
+    ValueError при некорректном выражении.
+    """
+    conditions = []
+
+    contained = {}
+    for item in eq:
+        key, sep, raw = item.partition(":")
+        if not sep:
+            raise ValueError(f"Ожидается key:value, получено {item!r}")
+        _metadata_key(key)
+        contained[key] = _parse_metadata_value(raw)
+    if contained:
+        # Одно containment-условие на все пары - его обслуживает
+        # GIN-индекс ix_artworks_metadata_json_path_ops
+        conditions.append(models.Artwork.metadata_json.contains(contained))
+
+    for item in ranges:
+        key, sep, bounds = item.partition(":")
+        low, dots, high = bounds.partition("..")
+        if not sep or not dots or not (low or high):
+            raise ValueError(f"Ожидается key:min..max, получено {item!r}")
+        number, guard = _metadata_number(key)
+        if guard is not None:
+            conditions.append(guard)
+        if low:
+            conditions.append(number >= _parse_number(low, item))
+        if high:
+            conditions.append(number <= _parse_number(high, item))
+
+    for key in has:
+        conditions.append(models.Artwork.metadata_json.has_key(_metadata_key(key)))
+
+    return conditions
+
+def search_artworks_by_metadata_structured(
+    db: Session,
+    conditions,
+    page: int = 1,
+    size: int = 10,
+    count: str = "exact",
+    fields=ARTWORK_FIELDS,
+    facets=None
+):
+    """Структурный поиск по metadata_json (условия из metadata_conditions)"""
+    query = artwork_rows(db, fields).filter(and_(*conditions))
+    return pagination.fetch_page(db, query, page=page, size=size, count=count, facets=facets)
+
+FULLTEXT_CONFIGS = ("russian", "english", "simple")
+
+FULLTEXT_HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxFragments=2, MaxWords=20, MinWords=5"
+
+def search_artworks_fulltext(
+    db: Session,
+    q: str,
+    lang: str = "russian",
+    page: int = 1,
+    size: int = 10,
+    count: str = "exact",
+    fields=ARTWORK_FIELDS,
+    facets=None
+):
+    """
+    Полнотекстовый поиск по названию, описанию и имени художника.
+    q - в синтаксисе websearch_to_tsquery: слова, "фраза", or, -исключение.
+    lang - конфигурация разбора запроса: russian (русский и английский
+    стемминг), english или simple (точные словоформы).
+    Результаты по убыванию ts_rank, с подсветкой совпадений.
+    fields - поля произведения в ответе (rank, artist_name и подсветка есть всегда).
+    facets - счётчики фасетов по всем найденным (facets.FacetRequest).
+    """
+    config = cast(lang, REGCONFIG)
+    tsquery = func.websearch_to_tsquery(config, q)
+    rank = func.ts_rank(models.Artwork.search_vector, tsquery)
+
+    # ts_headline дорогой, PostgreSQL вычисляет его уже после ORDER BY/LIMIT,
+    # то есть только для строк страницы
+    query = artwork_rows(db, fields).add_columns(
+        rank.label("rank"),
+        models.Artist.name.label("artist_name"),
+        func.ts_headline(config, models.Artwork.title, tsquery, "HighlightAll=true").label("title_highlight"),
+        func.ts_headline(config, models.Artwork.description, tsquery, FULLTEXT_HEADLINE_OPTIONS).label("description_highlight")
+    ).outerjoin(
+        models.Artist, models.Artwork.artist_id == models.Artist.id
+    ).filter(
+        models.Artwork.search_vector.op("@@")(tsquery)
+    )
+
+    result = pagination.fetch_page(
+        db, query, page=page, size=size, count=count,
+        order=[rank.desc(), models.Artwork.id.desc()], facets=facets
+    )
+    hits = []
+    for row in result["data"]:
+        hit = dict(zip(fields, row))
+        hit.update({
+            "rank": row.rank,
+            "artist_name": row.artist_name,
+            "title_highlight": row.title_highlight,
+            "description_highlight": row.description_highlight
+        })
+        hits.append(hit)
+    result["data"] = hits
+    return result
+
+def get_artworks_page(
+    db: Session,
+    page: int = 1,
+    size: int = 10,
+    sort_by: str = "id",
+    sort_order: str = "asc",
+    cursor: str = None,
+    count: str = "exact",
+    fields=ARTWORK_FIELDS
+):
+    """
+    Страница произведений с сортировкой.
+    Без cursor - обычная пагинация по page (OFFSET).
+    С cursor - keyset-пагинация: WHERE (ключ, id) > (последний ключ, последний id),
+    стоимость страницы не зависит от глубины. Пустой cursor = первая страница.
+    count - стратегия подсчёта total (exact, cached, estimated, none).
+    fields - поля в ответе (artwork_fields).
+    pagination.InvalidCursor если курсор некорректный.
+    """
+    return pagination.fetch_page(
+        db, artwork_rows(db, fields, sort_by),
+        page=page, size=size, sort_by=sort_by, sort_order=sort_order,
+        cursor=cursor, count=count
+    )
+
+def get_artworks_paginated(
+    db: Session,
+    page: int = 1,
+    size: int = 10,
+    cursor: str = None,
+    count: str = "exact",
+    fields=ARTWORK_FIELDS
+):
     """
     Получить произведения с пагинацией
     page: номер страницы с 1
     size: количество записей на странице
+    cursor: курсор keyset-пагинации (вместо page)
+    count: стратегия подсчёта total
     """
-    # сколько записей пропустить
-    offset = (page - 1) * size
-    
-    # Получim данные для текущей страницы
-    artworks = db.query(models.Artwork).offset(offset).limit(size).all()
-    
-    # Получаем общее количество записей
-    total = db.query(models.Artwork).count()
-    
-    # Рассчитываем общее количество страниц
-    total_pages = (total + size - 1) // size  # Округление вверх
-    
-    # Проверяем наличие следующей и предыдущей страницы
-    has_next = page < total_pages
-    has_prev = page > 1
-    
-    return {
-        "total": total,
-        "page": page,
-        "size": size,
-        "total_pages": total_pages,
-        "has_next": has_next,
-        "has_prev": has_prev,
-        "data": artworks
-    }
\ No newline at end of file
+    return get_artworks_page(db, page=page, size=size, cursor=cursor, count=count, fields=fields)
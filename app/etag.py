@@ -0,0 +1,65 @@
+import hashlib
+from urllib.parse import parse_qsl
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+
+def make_etag(path: str, query_string: bytes, versions) -> str:
+    """Слабый ETag из пути, параметров (порядок не важен) и версий таблиц"""
+    params = sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+    raw = repr((path, params, versions)).encode()
+    return 'W/"' + hashlib.sha1(raw).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Сравнение слабое: W/"x" и "x" совпадают
+    opaque = etag[2:]
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+class ETagMiddleware:
+    """
+    Условный GET для путей из tables ({путь: таблицы или функция
+    query_string -> таблицы, если набор зависит от параметров}). ETag считается до
+    обращения к эндпоинту, поэтому совпавший If-None-Match получает 304 без
+    запроса в PostgreSQL и без сериализации.
+    """
+
+    def __init__(self, app, tables, versions):
+        self.app = app
+        self.tables = tables
+        self.versions = versions
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.tables:
+            await self.app(scope, receive, send)
+            return
+
+        self.versions.start()
+        tables = self.tables[scope["path"]]
+        if callable(tables):
+            tables = tables(scope["query_string"])
+        snapshot = self.versions.snapshot(tables)
+        if snapshot is None:
+            await self.app(scope, receive, send)
+            return
+
+        etag = make_etag(scope["path"], scope["query_string"], snapshot)
+        if etag_matches(Headers(scope=scope).get("if-none-match"), etag):
+            await Response(status_code=304, headers={"ETag": etag})(scope, receive, send)
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                MutableHeaders(scope=message)["ETag"] = etag
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
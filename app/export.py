@@ -0,0 +1,157 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from starlette.concurrency import run_in_threadpool
+
+from app import crud
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import SessionLocal
+
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _iter_batches(stmt, batch_size: int, bind):
+    """
+    Строки пачками по batch_size через серверный курсор (yield_per
+    включает stream_results), поэтому память не зависит от размера таблицы.
+    Сессия своя: зависимость get_db закрывается до начала стриминга.
+    """
+    db = SessionLocal(bind=bind)
+    try:
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        for batch in result.mappings().partitions():
+            yield batch
+    finally:
+        db.close()
+
+
+async def _aiter_batches(stmt, batch_size: int, bind):
+    """То же для async-режима: серверный курсор asyncpg, без пула потоков"""
+    async with bind.connect() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=batch_size))
+        async for batch in result.mappings().partitions():
+            yield batch
+
+
+def _ndjson_chunk(batch):
+    lines = [
+        json.dumps(dict(row), default=_json_default, ensure_ascii=False)
+        for row in batch
+    ]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _ndjson_chunks(batches):
+    for batch in batches:
+        yield _ndjson_chunk(batch)
+
+
+class _CsvEncoder:
+    """Пишет пачки строк в CSV; заголовок уходит вместе с первой пачкой"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow(columns)
+
+    def chunk(self, batch):
+        for row in batch:
+            self.writer.writerow([
+                json.dumps(row[c], ensure_ascii=False) if c == "metadata_json" and row[c] is not None
+                else row[c]
+                for c in self.columns
+            ])
+        return self.flush()
+
+    def flush(self):
+        data = self.buffer.getvalue().encode()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+def _csv_chunks(batches, columns):
+    encoder = _CsvEncoder(columns)
+    for batch in batches:
+        yield encoder.chunk(batch)
+    # Пустая выгрузка - всё равно отдаём заголовок
+    tail = encoder.flush()
+    if tail:
+        yield tail
+
+
+def file_encoder(export_format: str, columns):
+    """
+    (заголовок, функция пачка -> bytes) для выгрузки в файл (задание export,
+    app/jobs.py): заголовок пишется один раз, в начало файла
+    """
+    if export_format != "csv":
+        return b"", _ndjson_chunk
+    encoder = _CsvEncoder(columns)
+    return encoder.flush(), encoder.chunk
+
+
+async def _stream_threadpool(stmt, export_format: str, bind):
+    batches = _iter_batches(stmt, EXPORT_BATCH_SIZE, bind)
+    if export_format == "csv":
+        chunks = _csv_chunks(batches, [c.name for c in stmt.selected_columns])
+    else:
+        chunks = _ndjson_chunks(batches)
+
+    try:
+        while True:
+            chunk = await run_in_threadpool(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await run_in_threadpool(chunks.close)
+
+
+async def _stream_async(stmt, export_format: str, bind):
+    batches = _aiter_batches(stmt, EXPORT_BATCH_SIZE, bind)
+    if export_format == "csv":
+        encoder = _CsvEncoder([c.name for c in stmt.selected_columns])
+        encode = encoder.chunk
+    else:
+        encoder, encode = None, _ndjson_chunk
+
+    try:
+        async for batch in batches:
+            yield encode(batch)
+        if encoder is not None:
+            tail = encoder.flush()
+            if tail:
+                yield tail
+    finally:
+        await batches.aclose()
+
+
+def stream_artworks(export_format: str, bind, with_details: bool = False, **filters):
+    """
+    Асинхронный поток байтов для StreamingResponse.
+    Каждая пачка читается из БД только когда клиент забрал предыдущую
+    (send ждёт освобождения буфера) - это и есть backpressure.
+    bind - Engine (пачки читаются в пуле потоков) или AsyncEngine (через asyncpg),
+    обычно реплика из database.read_engine().
+    При обрыве соединения генератор закрывается и курсор освобождается.
+    """
+    stmt = crud.get_artworks_export_select(with_details=with_details, **filters)
+    if isinstance(bind, AsyncEngine):
+        return _stream_async(stmt, export_format, bind)
+    return _stream_threadpool(stmt, export_format, bind)
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from sqlalchemy import and_, case, func, literal, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import aliased
+
+from app import config, models
+from app.versions import table_versions
+
+# Фасеты: сколько результатов фильтра или поиска у каждого жанра, музея,
+# художника и десятилетия. Считаются одним GROUPING SETS по отфильтрованному
+# набору и приезжают скалярным подзапросом в той же выборке, что и страница, -
+# без отдельного запроса на каждый фасет.
+
+FACETS = ("genre", "museum", "artist", "decade")
+
+# фасет -> справочник с именем значения (у десятилетия имени нет)
+FACET_TABLES = {"genre": "genres", "museum": "museums", "artist": "artists"}
+
+
+class FacetRequest(NamedTuple):
+    names: tuple
+    top: int
+
+
+def parse_facets(value: str = None, top: int = config.FACETS_TOP):
+    """"genre,decade" -> FacetRequest в порядке FACETS; None, если фасеты не запрошены"""
+    if not value:
+        return None
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = requested.difference(FACETS)
+    if unknown:
+        raise ValueError(f"Неизвестные фасеты: {', '.join(sorted(unknown))}. Доступны: {', '.join(FACETS)}")
+    names = tuple(name for name in FACETS if name in requested)
+    return FacetRequest(names, top) if names else None
+
+
+def facet_tables(names):
+    """Таблицы, от которых зависят счётчики фасетов (для ETag и ключа кэша)"""
+    return ("artworks",) + tuple(FACET_TABLES[name] for name in names if name in FACET_TABLES)
+
+
+def _facet_columns():
+    return {
+        "genre": models.Artwork.genre_id,
+        "museum": models.Artwork.museum_id,
+        "artist": models.Artwork.artist_id,
+        "decade": func.artwork_decade(models.Artwork.year_created),
+    }
+
+
+def facet_subquery(query, request: FacetRequest):
+    """
+    Скалярный подзапрос jsonb {фасет: {"values", "other", "items"}} по набору query
+    (без ORDER BY/LIMIT страницы): items - top значений по убыванию числа,
+    values - сколько всего разных значений, other - результатов вне top
+    """
+    columns = _facet_columns()
+    filtered = (
+        query.with_entities(*(columns[name].label(name) for name in request.names))
+        .order_by(None)
+        .subquery("faceted")
+    )
+    # В каждом наборе GROUPING SETS задана одна колонка, остальные - NULL:
+    # grouping() = 0 у колонки своего набора, coalesce даёт её значение (NULL - группа без значения)
+    grouped = select(
+        case(*((func.grouping(filtered.c[name]) == 0, literal(name)) for name in request.names)).label("facet"),
+        func.coalesce(*(filtered.c[name] for name in request.names)).label("value"),
+        func.count().label("count"),
+    ).group_by(func.grouping_sets(*(filtered.c[name] for name in request.names))).subquery("grouped")
+
+    ranked = select(
+        grouped,
+        func.row_number().over(
+            partition_by=grouped.c.facet, order_by=(grouped.c["count"].desc(), grouped.c.value)
+        ).label("rank"),
+        func.count().over(partition_by=grouped.c.facet).label("values"),
+        func.sum(grouped.c["count"]).over(partition_by=grouped.c.facet).label("total"),
+    ).subquery("ranked")
+
+    # Имена - только для строк top, по одному LEFT JOIN на запрошенный справочник
+    source = ranked
+    names = []
+    for name, model in (("genre", models.Genre), ("museum", models.Museum), ("artist", models.Artist)):
+        if name in request.names:
+            lookup = aliased(model, name=f"facet_{name}")
+            source = source.outerjoin(lookup, and_(ranked.c.facet == name, lookup.id == ranked.c.value))
+            names.append(lookup.name)
+    item = func.jsonb_build_object("value", ranked.c.value, "count", ranked.c["count"])
+    if names:
+        named = func.jsonb_build_object("value", ranked.c.value, "name", func.coalesce(*names), "count", ranked.c["count"])
+        item = case((ranked.c.facet == "decade", item), else_=named)
+
+    per_facet = select(
+        ranked.c.facet,
+        func.jsonb_build_object(
+            "values", func.max(ranked.c["values"]),
+            "other", func.max(ranked.c.total) - func.sum(ranked.c["count"]),
+            "items", func.jsonb_agg(aggregate_order_by(item, ranked.c.rank)),
+        ).label("body"),
+    ).select_from(source).where(ranked.c.rank <= request.top).group_by(ranked.c.facet).subquery("per_facet")
+
+    # correlate(None): как и total_count, считается по всему набору, а не по строке страницы
+    return select(func.jsonb_object_agg(per_facet.c.facet, per_facet.c.body)).scalar_subquery().correlate(None)
+
+
+def complete(counts, request: FacetRequest):
+    """Фасеты без единого значения (пустой набор) - пустыми, а не пропущенными"""
+    counts = counts or {}
+    return {name: counts.get(name) or {"values": 0, "other": 0, "items": []} for name in request.names}
+
+
+def count_facets(db, query, request: FacetRequest):
+    """Отдельный запрос - когда страница пуста и подзапросу не к чему было приехать"""
+    return complete(db.execute(select(facet_subquery(query, request))).scalar(), request)
+
+
+def fetch(db, query, page_query, request: FacetRequest, first_page: bool):
+    """
+    (строки page_query, фасеты набора query): из кэша или колонкой facets
+    в той же выборке, что и страница (строки crud.artwork_rows - лишняя
+    колонка в конце отбрасывается при сборке ответа)
+    """
+    key = cache_key(query, request)
+    counts = cache_get(key)
+    if counts is not None:
+        return page_query.all(), counts
+    rows = page_query.add_columns(facet_subquery(query, request).label("facets")).all()
+    if rows:
+        counts = complete(rows[0][-1], request)
+    elif first_page:
+        counts = complete(None, request)
+    else:
+        counts = count_facets(db, query, request)
+    cache_put(key, counts)
+    return rows, counts
+
+
+#  КЭШ ----------------
+# Ключ - SQL набора с параметрами, фасеты, top и версии таблиц (app/versions):
+# любая запись в artworks или справочник фасета, в том числе из другого
+# воркера, даёт новый ключ. Пока версиям доверять нельзя, кэш не используется.
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cache_key(query, request: FacetRequest):
+    if config.FACETS_CACHE_TTL_S <= 0:
+        return None
+    versions = table_versions.snapshot(facet_tables(request.names))
+    if versions is None:
+        return None
+    compiled = query.statement.compile(dialect=postgresql.dialect())
+    params = tuple(sorted((k, repr(v)) for k, v in compiled.params.items()))
+    return str(compiled), params, request, versions
+
+
+def cache_get(key):
+    if key is None:
+        return None
+    with _cache_lock:
+        item = _cache.get(key)
+        if item is None:
+            return None
+        counts, stored_at = item
+        if time.monotonic() - stored_at > config.FACETS_CACHE_TTL_S:
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return counts
+
+
+def cache_put(key, counts):
+    if key is None:
+        return
+    with _cache_lock:
+        _cache[key] = (counts, time.monotonic())
+        _cache.move_to_end(key)
+        while len(_cache) > config.FACETS_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
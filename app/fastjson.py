@@ -0,0 +1,69 @@
+import orjson
+from starlette.responses import Response
+
+from app.crud import ARTWORK_FIELDS, expand_key, expand_target
+
+
+class FastJSONResponse(Response):
+    """
+    JSON через orjson: datetime, dict из jsonb и прочее кодируются
+    в C без промежуточного jsonable_encoder
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+def artwork_dicts(rows, fields=ARTWORK_FIELDS):
+    """
+    Строки crud.artwork_rows -> словари полей fields. Служебные колонки
+    после fields (id для курсора, total_count, facets) отбрасывает zip
+    """
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def expand_items(items, related):
+    """Вложить объекты из crud.load_related в каждый словарь: artist_id -> artist"""
+    for relation, objects in related.items():
+        key = expand_key(relation)
+        for item in items:
+            item[relation] = objects.get(item[key])
+    return items
+
+
+def included_section(related):
+    """Объекты из crud.load_related один раз, по таблицам: {"artists": [...], ...}"""
+    return {expand_target(relation).__tablename__: list(objects.values()) for relation, objects in related.items()}
+
+
+def artworks_response(rows, fields=ARTWORK_FIELDS, related=None, included=False, facets=None):
+    """
+    Список произведений - то же, что response_model=List[schemas.Artwork].
+    С included или facets - schemas.ArtworkList: {"data": [...], "included": {...}, "facets": {...}}
+    """
+    data = artwork_dicts(rows, fields)
+    if related and not included:
+        expand_items(data, related)
+    if not (related and included) and facets is None:
+        return FastJSONResponse(data)
+    body = {"data": data}
+    if related and included:
+        body["included"] = included_section(related)
+    if facets is not None:
+        body["facets"] = facets
+    return FastJSONResponse(body)
+
+
+def artwork_page_response(page, fields=ARTWORK_FIELDS, related=None, included=False):
+    """Страница fetch_page - то же, что response_model=schemas.PaginatedResponse"""
+    return search_page_response(dict(page, data=artwork_dicts(page["data"], fields)), related, included)
+
+
+def search_page_response(page, related=None, included=False):
+    """Страница, в которой data - уже словари (полнотекстовый поиск)"""
+    if related and included:
+        page["included"] = included_section(related)
+    elif related:
+        expand_items(page["data"], related)
+    return FastJSONResponse(page)
@@ -0,0 +1,119 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app import config, crud, models, pagination, versions
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Групповой коммит одиночных вставок: POST /artists/, /genres/, /museums/,
+# /artworks/, пришедшие в пределах окна, поток-пакетировщик записывает
+# одним многострочным INSERT ... RETURNING на таблицу и одним COMMIT -
+# одна транзакция (и один проход триггеров artwork_stats) на пачку, а не
+# на запрос. Каждый запрос получает свою строку или свою ошибку: упавшая
+# строка не откатывает соседей (SAVEPOINT на строку, crud.insert_rows).
+# Цена - до window_s задержки у первой вставки пачки.
+
+
+class GroupCommit:
+    def __init__(self, session_factory, enabled: bool, window_s: float, max_batch: int):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None or not self.enabled:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+
+    def submit(self, model, row) -> Future:
+        """
+        Поставить строку (словарь колонок) в ближайшую пачку. Future -
+        Row вставленной строки или исключение, как у crud.create_*;
+        в event loop - await asyncio.wrap_future(...)
+        """
+        future = Future()
+        self._queue.put((model, row, future))
+        self.start()
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window_s
+            # после окна - без ожидания добираем то, что уже в очереди
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._flush(batch)
+            except Exception as e:
+                # ошибка самой вставки из пачки в одну строку или сбой COMMIT
+                logger.warning("Групповой коммит: пачка из %s вставок не записана: %s", len(batch), e)
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _flush(self, batch):
+        by_model = {}
+        for model, row, future in batch:
+            by_model.setdefault(model, []).append((row, future))
+
+        results = []
+        db = self.session_factory()
+        try:
+            for model, items in by_model.items():
+                inserted = crud.insert_rows(db, model, [row for row, _ in items], isolated=len(batch) > 1)
+                results.extend(zip((future for _, future in items), inserted))
+                if any(not isinstance(result, Exception) for result in inserted):
+                    versions.table_versions.touch(model.__tablename__)
+            db.commit()
+        finally:
+            db.close()
+
+        if models.Artwork in by_model:
+            pagination.invalidate_counts()
+        self.batches += 1
+        self.rows += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for future, result in results:
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window_s * 1000,
+            "max_batch": self.max_batch,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch": round(self.rows / self.batches, 2) if self.batches else None,
+            "largest_batch": self.largest_batch,
+        }
+
+
+group_commit = GroupCommit(
+    SessionLocal,
+    enabled=config.DB_GROUP_COMMIT,
+    window_s=config.DB_GROUP_COMMIT_WINDOW_MS / 1000,
+    max_batch=config.DB_GROUP_COMMIT_MAX_BATCH
+)
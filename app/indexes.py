@@ -0,0 +1,150 @@
+from sqlalchemy import text
+
+# Отчёт об индексах для /internal/indexes: размер, число сканирований,
+# неиспользуемые и перекрытые другими индексы. Счётчики pg_stat у каждого
+# сервера свои - чтение идёт в реплики, поэтому сканирования суммируются
+# по primary и всем репликам. У секционированного индекса размер и
+# сканирования - сумма по индексам секций.
+
+INDEXES_SQL = text("""
+    SELECT t.relname, c.relname, am.amname, pg_get_indexdef(x.indexrelid),
+           ARRAY(SELECT pg_get_indexdef(x.indexrelid, k, true) FROM generate_series(1, x.indnkeyatts) AS k),
+           ARRAY(SELECT pg_get_indexdef(x.indexrelid, k, true) FROM generate_series(x.indnkeyatts + 1, x.indnatts) AS k),
+           pg_get_expr(x.indpred, x.indrelid), x.indisunique,
+           EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = x.indexrelid), x.indisvalid,
+           leaf.scans, leaf.tuples_read, leaf.bytes, leaf.last_scan
+    FROM pg_index x
+    JOIN pg_class c ON c.oid = x.indexrelid
+    JOIN pg_class t ON t.oid = x.indrelid
+    JOIN pg_am am ON am.oid = c.relam
+    CROSS JOIN LATERAL (
+        SELECT coalesce(sum(s.idx_scan), 0)::bigint, coalesce(sum(s.idx_tup_read), 0)::bigint,
+               coalesce(sum(pg_relation_size(l.relid)), 0)::bigint, max(s.last_idx_scan)
+        FROM (
+            SELECT relid FROM pg_partition_tree(x.indexrelid) WHERE isleaf
+            UNION SELECT x.indexrelid WHERE c.relkind = 'i'
+        ) AS l
+        LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = l.relid
+    ) AS leaf(scans, tuples_read, bytes, last_scan)
+    WHERE t.relnamespace = CAST(current_schema() AS regnamespace) AND NOT c.relispartition
+    ORDER BY t.relname, c.relname
+""")
+
+TABLES_SQL = text("""
+    SELECT t.relname, coalesce(sum(pg_table_size(l.relid)), 0)::bigint,
+           coalesce(sum(s.n_tup_ins), 0)::bigint, coalesce(sum(s.n_tup_upd), 0)::bigint,
+           coalesce(sum(s.n_tup_hot_upd), 0)::bigint, coalesce(sum(s.n_tup_del), 0)::bigint,
+           coalesce(sum(s.seq_scan), 0)::bigint, coalesce(sum(s.idx_scan), 0)::bigint
+    FROM pg_class t
+    CROSS JOIN LATERAL (
+        SELECT relid FROM pg_partition_tree(t.oid) WHERE isleaf
+        UNION SELECT t.oid WHERE t.relkind = 'r'
+    ) AS l
+    LEFT JOIN pg_stat_user_tables s ON s.relid = l.relid
+    WHERE t.relnamespace = CAST(current_schema() AS regnamespace)
+      AND t.relkind IN ('r', 'p') AND NOT t.relispartition
+    GROUP BY t.relname
+    ORDER BY t.relname
+""")
+
+STATS_SINCE_SQL = text("SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()")
+
+
+def _indexes(conn):
+    return [
+        {
+            "table": table, "name": name, "method": method, "definition": definition,
+            "columns": list(columns), "include": list(include), "predicate": predicate,
+            "unique": unique, "constraint": constraint, "valid": valid,
+            "scans": scans, "tuples_read": tuples_read, "bytes": size, "last_scan": last_scan,
+        }
+        for (table, name, method, definition, columns, include, predicate, unique,
+             constraint, valid, scans, tuples_read, size, last_scan) in conn.execute(INDEXES_SQL)
+    ]
+
+
+def covered_by(index, other) -> bool:
+    """
+    other делает index лишним: тот же метод и условие, ключ index - начало
+    ключа other (btree; у остальных методов - полное совпадение), колонки
+    INCLUDE есть в other. Индексы ограничений (PK, UNIQUE) не лишние никогда,
+    из двух одинаковых лишний - второй по имени
+    """
+    if index["constraint"] or index["unique"] or index is other:
+        return False
+    if index["table"] != other["table"] or index["method"] != other["method"]:
+        return False
+    if index["predicate"] != other["predicate"]:
+        return False
+    columns = len(index["columns"])
+    if index["method"] == "btree":
+        if other["columns"][:columns] != index["columns"]:
+            return False
+    elif other["columns"] != index["columns"]:
+        return False
+    if not set(index["include"]) <= set(other["columns"] + other["include"]):
+        return False
+    # точные копии перекрывают друг друга - лишней считаем только одну
+    same = index["columns"] == other["columns"] and index["include"] == other["include"]
+    return not same or other["constraint"] or other["unique"] or index["name"] > other["name"]
+
+
+def index_report(servers):
+    """servers - [(имя, sync engine)]: первый - primary, остальные - реплики"""
+    (primary_name, primary), *others = servers
+    with primary.connect() as conn:
+        indexes = _indexes(conn)
+        tables = conn.execute(TABLES_SQL).all()
+        stats_since = conn.execute(STATS_SINCE_SQL).scalar()
+
+    by_name = {}
+    for index in indexes:
+        index["scans_by_server"] = {primary_name: index["scans"]}
+        by_name[(index["table"], index["name"])] = index
+    errors = {}
+    for name, engine in others:
+        try:
+            with engine.connect() as conn:
+                replica_indexes = _indexes(conn)
+        except Exception as e:
+            errors[name] = str(e).strip()
+            continue
+        for replica_index in replica_indexes:
+            index = by_name.get((replica_index["table"], replica_index["name"]))
+            if index is not None:
+                index["scans_by_server"][name] = replica_index["scans"]
+                index["scans"] += replica_index["scans"]
+
+    for index in indexes:
+        index["redundant_with"] = [other["name"] for other in indexes if covered_by(index, other)]
+        index["unused"] = index["scans"] == 0 and not (index["unique"] or index["constraint"])
+
+    summary = []
+    for table, table_bytes, inserts, updates, hot_updates, deletes, seq_scans, index_scans in tables:
+        own = [index for index in indexes if index["table"] == table]
+        summary.append({
+            "table": table,
+            "table_bytes": table_bytes,
+            "indexes": len(own),
+            "index_bytes": sum(index["bytes"] for index in own),
+            # каждая вставка и не-HOT обновление пишет во все индексы таблицы
+            "inserts": inserts,
+            "updates": updates,
+            "hot_updates": hot_updates,
+            "deletes": deletes,
+            "seq_scans": seq_scans,
+            "index_scans": index_scans,
+        })
+
+    return {
+        "servers": [name for name, _ in servers],
+        "errors": errors,
+        "stats_since": stats_since,
+        "tables": summary,
+        "indexes": indexes,
+        "unused": [index["name"] for index in indexes if index["unused"]],
+        "redundant": [
+            {"name": index["name"], "covered_by": index["redundant_with"], "bytes": index["bytes"]}
+            for index in indexes if index["redundant_with"]
+        ],
+    }
@@ -0,0 +1,259 @@
+import logging
+import os
+from typing import NamedTuple
+
+from sqlalchemy import bindparam, func, insert, select, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app import config, crud, export, models, schemas
+
+logger = logging.getLogger(__name__)
+
+# Фоновые задания: долгие массовые операции выполняет отдельный процесс
+# (python -m app.worker), а не HTTP-запрос. Очередь - таблица jobs: API
+# вставляет строку и отвечает 202, воркер забирает её через FOR UPDATE
+# SKIP LOCKED (параллельные воркеры не ждут друг друга и не берут одно
+# задание дважды) и выполняет по шагам. Чекпойнт шага пишется в той же
+# транзакции, что и работа шага, - после падения воркера задание
+# продолжается с последнего зафиксированного шага, без повтора и пропуска.
+
+NOTIFY_CHANNEL = "jobs"
+
+# Очередное задание: новое или брошенное упавшим воркером (heartbeat старше stale_s)
+CLAIM_SQL = text("""
+    UPDATE jobs
+    SET status = 'running', attempts = attempts + 1, worker = :worker, error = NULL,
+        started_at = coalesce(started_at, timezone('utc', now())),
+        heartbeat_at = timezone('utc', now())
+    WHERE id = (
+        SELECT id FROM jobs
+        WHERE status = 'queued'
+           OR (status = 'running' AND heartbeat_at < timezone('utc', now()) - make_interval(secs => :stale_s))
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, kind, params, checkpoint, attempts
+""")
+
+# Задание всё ещё наше: его не забрал другой воркер, пока этот молчал
+OWNED = "id = :id AND worker = :worker AND attempts = :attempts AND status = 'running'"
+
+SAVE_SQL = text(f"UPDATE jobs SET checkpoint = :checkpoint, progress = :progress WHERE {OWNED}").bindparams(
+    bindparam("checkpoint", type_=JSONB), bindparam("progress", type_=JSONB)
+)
+FINISH_SQL = text(f"""
+    UPDATE jobs SET status = :status, result = :result, error = :error,
+                    finished_at = timezone('utc', now()), heartbeat_at = timezone('utc', now())
+    WHERE {OWNED}
+""").bindparams(bindparam("result", type_=JSONB))
+# Останов воркера - не попытка: attempts возвращается назад
+REQUEUE_SQL = text(f"UPDATE jobs SET status = 'queued', worker = NULL, attempts = attempts - 1 WHERE {OWNED}")
+HEARTBEAT_SQL = text("""
+    UPDATE jobs SET heartbeat_at = timezone('utc', now())
+    WHERE id = ANY(:ids) AND worker = :worker AND status = 'running'
+""")
+RETRY_SQL = text("""
+    UPDATE jobs SET status = 'queued', attempts = 0, error = NULL, finished_at = NULL
+    WHERE id = :id AND status = 'failed'
+    RETURNING id
+""")
+NOTIFY_SQL = text("SELECT pg_notify(:channel, :payload)")
+
+
+class JobInterrupted(Exception):
+    """Воркер останавливается: задание вернётся в очередь и продолжится с чекпойнта"""
+
+
+class JobLost(Exception):
+    """Задание забрал другой воркер (этот не слал heartbeat дольше JOBS_STALE_S)"""
+
+
+class JobContext:
+    """Сессия и чекпойнт выполняемого задания - первый аргумент обработчика вида"""
+
+    def __init__(self, db, job, worker: str, stopping):
+        self.db = db
+        self.id = job["id"]
+        self.attempts = job["attempts"]
+        self.worker = worker
+        self.checkpoint = job["checkpoint"] or {}
+        self._stopping = stopping
+
+    def owned(self):
+        return {"id": self.id, "worker": self.worker, "attempts": self.attempts}
+
+    def save(self, checkpoint, progress=None):
+        """
+        Чекпойнт и прогресс - в текущей транзакции db: COMMIT шага фиксирует
+        их вместе с работой шага. При останове воркера - JobInterrupted до
+        записи: незафиксированный шаг откатится и повторится при возобновлении
+        """
+        if self._stopping.is_set():
+            raise JobInterrupted()
+        result = self.db.execute(SAVE_SQL, dict(self.owned(), checkpoint=checkpoint, progress=progress))
+        if result.rowcount == 0:
+            raise JobLost()
+        self.checkpoint = checkpoint
+
+
+#  ВИДЫ ЗАДАНИЙ ----------------
+# Обработчик (ctx, params) -> result; params - проверенные schemas.*JobParams
+# в виде JSON. Каждый шаг: работа, ctx.save(чекпойнт, прогресс), COMMIT.
+
+def apply_discount(ctx: JobContext, params):
+    """Скидка диапазонами id; чекпойнт - следующий диапазон"""
+    before = ctx.checkpoint.get("updated", 0)
+
+    def progress(last_id, max_id, updated):
+        ctx.save(
+            {"next_id": last_id + 1, "max_id": max_id, "updated": before + updated},
+            {"done": last_id, "total": max_id, "unit": "id"}
+        )
+
+    updated = crud.update_expensive_artworks_discount(
+        ctx.db, params["discount_percent"], threshold=params["threshold"], chunk_size=params["chunk_size"],
+        progress=progress, start_id=ctx.checkpoint.get("next_id"), max_id=ctx.checkpoint.get("max_id")
+    )
+    return {"updated_count": before + updated}
+
+
+def export_path(job_id: int, export_format: str) -> str:
+    return os.path.join(config.JOBS_EXPORT_DIR, f"artworks-{job_id}.{export_format}")
+
+
+def export_artworks(ctx: JobContext, params):
+    """
+    Выгрузка в файл JOBS_EXPORT_DIR пачками по id (keyset). Чекпойнт -
+    последний id и длина файла: при возобновлении файл обрезается до неё,
+    так что недописанная пачка не дублируется. Строки, изменённые во время
+    выгрузки, попадают в том виде, в каком были при чтении своей пачки
+    """
+    request = schemas.ExportJobParams.model_validate(params)
+    filters = request.model_dump(exclude={"format", "with_details"})
+    stmt = crud.get_artworks_export_select(with_details=request.with_details, **filters)
+
+    checkpoint = dict(ctx.checkpoint)
+    if "total" not in checkpoint:
+        checkpoint.update(last_id=0, rows=0, bytes=0, total=ctx.db.execute(
+            select(func.count()).select_from(stmt.order_by(None).subquery())
+        ).scalar())
+        ctx.db.commit()
+
+    path = export_path(ctx.id, request.format)
+    os.makedirs(config.JOBS_EXPORT_DIR, exist_ok=True)
+    header, encode = export.file_encoder(request.format, [c.name for c in stmt.selected_columns])
+    with open(path, "ab") as f:
+        f.truncate(checkpoint["bytes"])
+        if checkpoint["bytes"] == 0:
+            f.write(header)
+            checkpoint["bytes"] = len(header)
+        while True:
+            batch = ctx.db.execute(
+                stmt.where(models.Artwork.id > checkpoint["last_id"]).limit(config.JOBS_EXPORT_BATCH_SIZE)
+            ).mappings().all()
+            if not batch:
+                break
+            chunk = encode(batch)
+            f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+            checkpoint["last_id"] = batch[-1]["id"]
+            checkpoint["rows"] += len(batch)
+            checkpoint["bytes"] += len(chunk)
+            ctx.save(dict(checkpoint), {"done": checkpoint["rows"], "total": checkpoint["total"], "unit": "row"})
+            ctx.db.commit()
+    return {"rows": checkpoint["rows"], "bytes": checkpoint["bytes"], "file": f"/jobs/{ctx.id}/file"}
+
+
+def rebuild_stats(ctx: JobContext, params):
+    """
+    Пересчёт artwork_stats (artwork_stats_rebuild) - один шаг: функция
+    держит SHARE-блокировку artworks, и делить её на части нельзя
+    """
+    if not ctx.checkpoint.get("done"):
+        ctx.db.execute(text("SELECT artwork_stats_rebuild()"))
+        ctx.save({"done": True}, {"done": 1, "total": 1, "unit": "step"})
+        ctx.db.commit()
+    return {"groups": ctx.db.execute(select(func.count()).select_from(models.ArtworkStat)).scalar()}
+
+
+INDEX_NAMES_SQL = text("""
+    SELECT c.relname FROM pg_index x JOIN pg_class c ON c.oid = x.indexrelid
+    WHERE x.indrelid = CAST(:table AS regclass)
+    ORDER BY c.relname
+""")
+
+
+def reindex(ctx: JobContext, params):
+    """
+    REINDEX INDEX CONCURRENTLY по одному индексу таблицы (секционированный
+    индекс - по секциям); чекпойнт - уже перестроенные. Прерванный REINDEX
+    оставляет невалидный *_ccnew - он виден в /internal/indexes (valid=false)
+    """
+    names = ctx.db.execute(INDEX_NAMES_SQL, {"table": params["table"]}).scalars().all()
+    ctx.db.commit()
+    done = list(ctx.checkpoint.get("done", []))
+    for name in names:
+        if name in done:
+            continue
+        # CONCURRENTLY не работает в транзакции
+        with ctx.db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f'REINDEX INDEX CONCURRENTLY "{name}"'))
+        done.append(name)
+        ctx.save({"done": done}, {"done": len(done), "total": len(names), "unit": "index"})
+        ctx.db.commit()
+    return {"reindexed": done}
+
+
+class JobKind(NamedTuple):
+    run: object
+    params: type
+
+
+KINDS = {
+    "apply_discount": JobKind(apply_discount, schemas.DiscountJobParams),
+    "export": JobKind(export_artworks, schemas.ExportJobParams),
+    "stats_rebuild": JobKind(rebuild_stats, schemas.StatsRebuildJobParams),
+    "reindex": JobKind(reindex, schemas.ReindexJobParams),
+}
+
+
+#  API ----------------
+
+def submit(db, kind: str, params=None):
+    """
+    Поставить задание в очередь и разбудить воркеры (NOTIFY уходит при COMMIT).
+    ValueError - неизвестный вид или неверные параметры
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Неизвестный вид задания: {kind}. Доступны: {', '.join(KINDS)}")
+    params = KINDS[kind].params.model_validate(params or {}).model_dump(mode="json")
+    job = db.execute(
+        insert(models.Job).values(kind=kind, params=params).returning(*models.Job.__table__.c)
+    ).mappings().one()
+    db.execute(NOTIFY_SQL, {"channel": NOTIFY_CHANNEL, "payload": str(job["id"])})
+    db.commit()
+    return dict(job)
+
+
+def get_job(db, job_id: int):
+    return db.get(models.Job, job_id)
+
+
+def list_jobs(db, status: str = None, limit: int = 50):
+    query = db.query(models.Job)
+    if status is not None:
+        query = query.filter(models.Job.status == status)
+    return query.order_by(models.Job.id.desc()).limit(limit).all()
+
+
+def retry_job(db, job_id: int):
+    """Упавшее задание - снова в очередь; продолжится с чекпойнта. None, если не failed"""
+    retried = db.execute(RETRY_SQL, {"id": job_id}).scalar()
+    if retried is None:
+        db.rollback()
+        return None
+    db.execute(NOTIFY_SQL, {"channel": NOTIFY_CHANNEL, "payload": str(job_id)})
+    db.commit()
+    return get_job(db, job_id)
@@ -1,161 +1,409 @@
-from fastapi import FastAPI, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app import models, crud, schemas
-from app.database import engine, get_db
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
 
-models.Base.metadata.create_all(bind=engine)
+from fastapi import FastAPI, Body, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy.exc import DBAPIError
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional, Union
+from urllib.parse import parse_qsl
+from app import crud, facets as facet_counts, jobs, models, schemas, pagination, export, config, metrics, startup
+from app.fastjson import artwork_page_response, artworks_response, search_page_response
+from app.database import DbSession, async_engine, engine, get_db, mark_written, read_engine, replicas, run_db
+from app.etag import ETagMiddleware
+from app.group_commit import group_commit
+from app.indexes import index_report
+from app.partitions import artwork_partitions
+from app.pool import pool_status
+from app.slow_queries import slow_queries
+from app.versions import table_versions
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Схему создаёт alembic upgrade head, здесь только проверяем её в фоне:
+    # воркер сразу отвечает на /healthz, а трафик получает после /readyz
+    table_versions.start()
+    replicas.start()
+    artwork_partitions.start()
+    group_commit.start()
+    preparing = asyncio.create_task(startup.prepare())
+    yield
+    preparing.cancel()
+    await startup.dispose_engines()
 
 app = FastAPI(
     title="Art API",
     description="REST API для управления произведениями искусства",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+def _artwork_tables(query_string: bytes):
+    """
+    artworks, таблицы связей из expand= и справочники фасетов из facets=
+    (имена значений). Неверный expand или facets всё равно получит 400
+    """
+    params = parse_qsl(query_string.decode("latin-1"))
+    expand = ",".join(value for key, value in params if key == "expand")
+    requested = {name.strip() for name in expand.split(",")}
+    relations = [name for name in crud.EXPAND_SCHEMAS if name in requested]
+    tables = ("artworks",) + tuple(crud.expand_target(name).__tablename__ for name in relations)
+    facets = {name.strip() for key, value in params if key == "facets" for name in value.split(",")}
+    return tables + tuple(table for table in facet_counts.facet_tables(facets) if table not in tables)
+
+# Условный GET: путь -> таблицы, от которых зависит ответ
+ETAG_TABLES = {
+    "/artists/": ("artists",),
+    "/genres/": ("genres",),
+    "/museums/": ("museums",),
+    "/artworks/": _artwork_tables,
+    "/artworks/paginated/": _artwork_tables,
+    "/artworks/filter/": _artwork_tables,
+    "/artworks/with-details/": ("artworks", "artists", "genres", "museums"),
+    "/stats/by-country/": ("artworks", "museums"),
+    "/stats/by-genre/": ("artworks", "genres"),
+    "/stats/by-artist/": ("artworks", "artists"),
+    "/stats/by-decade/": ("artworks",),
+    # имя художника попадает в search_vector триггером, то есть через UPDATE artworks
+    "/artworks/search/": _artwork_tables,
+    "/artworks/search/metadata/": _artwork_tables,
+    "/artworks/search/metadata/structured/": _artwork_tables,
+}
+app.add_middleware(ETagMiddleware, tables=ETAG_TABLES, versions=table_versions)
+# снаружи ETag: 304 тоже попадают в метрики
+app.add_middleware(metrics.MetricsMiddleware, routes=app.router.routes)
+
+BULK_MAX_ITEMS = 10000
+
+async def _create_one(db: DbSession, create, model, item):
+    """
+    POST одного объекта: crud.create_* в своей транзакции или, с
+    DB_GROUP_COMMIT, в общей пачке - тогда запрос ждёт её COMMIT,
+    не занимая поток
+    """
+    if not group_commit.enabled:
+        return await run_db(db, create, item)
+    row = await asyncio.wrap_future(group_commit.submit(model, item.dict()))
+    mark_written(db)
+    return row
+
+def _bulk_response(result, atomic: bool):
+    """В режиме atomic любая ошибка откатывает всю пачку - отвечаем 400 со списком ошибок"""
+    if atomic and result["errors"]:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Ничего не создано", "errors": result["errors"]}
+        )
+    return result
+
+def artwork_expand(
+    expand: Optional[str] = Query(None, description="Связанные объекты через запятую: artist, genre, museum")
+):
+    """Связи проверяются до запроса к БД: неизвестная связь - 400"""
+    try:
+        return crud.artwork_expand(expand)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def artwork_fields(
+    fields: Optional[str] = Query(None, description="Поля произведения через запятую, например id,title,year_created (по умолчанию все)"),
+    expand=Depends(artwork_expand)
+):
+    """Список полей проверяется до запроса к БД: неизвестное поле - 400"""
+    try:
+        return crud.artwork_fields(fields, expand)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def artwork_facets(
+    facets: Optional[str] = Query(None, description="Счётчики по всей выборке через запятую: genre, museum, artist, decade"),
+    facets_top: int = Query(config.FACETS_TOP, description="Сколько значений каждого фасета вернуть", ge=1, le=config.FACETS_TOP_MAX)
+):
+    """Фасеты проверяются до запроса к БД: неизвестный фасет - 400"""
+    try:
+        return facet_counts.parse_facets(facets, facets_top)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+INCLUDED_DESCRIPTION = "true - связанные объекты из expand один раз в секции included, а не в каждой строке"
+
+async def _load_related(db, rows, expand):
+    """Один IN-запрос на каждую связь из expand (None, если expand пуст)"""
+    if not expand:
+        return None
+    return await run_db(db, crud.load_related, rows, expand)
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Art API работает! Перейди на /docs для документации"}
 
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness: процесс жив и event loop отвечает (БД не проверяется)
+    """
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: схема на alembic head, пул прогрет, горячие запросы выполнены
+    """
+    status = startup.readiness.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 # ---------------- ARTIST ----------------
 @app.post("/artists/", response_model=schemas.Artist)
-def add_artist(artist: schemas.ArtistCreate, db: Session = Depends(get_db)):
-    return crud.create_artist(db, artist)
+async def add_artist(artist: schemas.ArtistCreate, db: DbSession = Depends(get_db)):
+    return await _create_one(db, crud.create_artist, models.Artist, artist)
+
+@app.post("/artists/bulk/", response_model=schemas.ArtistBulkResult)
+async def add_artists_bulk(
+    artists: List[schemas.ArtistCreate] = Body(..., max_length=BULK_MAX_ITEMS),
+    chunk_size: int = Query(500, description="Строк в одном INSERT", ge=1, le=5000),
+    atomic: bool = Query(True, description="true - всё или ничего, false - сохранить успешные"),
+    db: DbSession = Depends(get_db)
+):
+    return _bulk_response(await run_db(db, crud.create_artists_bulk, artists, chunk_size=chunk_size, atomic=atomic), atomic)
 
 @app.get("/artists/", response_model=List[schemas.Artist])
-def list_artists(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_artists(db, skip=skip, limit=limit)
+async def list_artists(skip: int = 0, limit: int = 100, db: DbSession = Depends(get_db)):
+    return await run_db(db, crud.get_artists, skip=skip, limit=limit)
 
 # ---------------- GENRE ----------------
 @app.post("/genres/", response_model=schemas.Genre)
-def add_genre(genre: schemas.GenreCreate, db: Session = Depends(get_db)):
-    return crud.create_genre(db, genre)
+async def add_genre(genre: schemas.GenreCreate, db: DbSession = Depends(get_db)):
+    return await _create_one(db, crud.create_genre, models.Genre, genre)
+
+@app.post("/genres/bulk/", response_model=schemas.GenreBulkResult)
+async def add_genres_bulk(
+    genres: List[schemas.GenreCreate] = Body(..., max_length=BULK_MAX_ITEMS),
+    chunk_size: int = Query(500, description="Строк в одном INSERT", ge=1, le=5000),
+    atomic: bool = Query(True, description="true - всё или ничего, false - сохранить успешные"),
+    db: DbSession = Depends(get_db)
+):
+    return _bulk_response(await run_db(db, crud.create_genres_bulk, genres, chunk_size=chunk_size, atomic=atomic), atomic)
 
 @app.get("/genres/", response_model=List[schemas.Genre])
-def list_genres(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_genres(db, skip=skip, limit=limit)
+async def list_genres(skip: int = 0, limit: int = 100, db: DbSession = Depends(get_db)):
+    return await run_db(db, crud.get_genres, skip=skip, limit=limit)
 
 # ---------------- MUSEUM ----------------
 @app.post("/museums/", response_model=schemas.Museum)
-def add_museum(museum: schemas.MuseumCreate, db: Session = Depends(get_db)):
-    return crud.create_museum(db, museum)
+async def add_museum(museum: schemas.MuseumCreate, db: DbSession = Depends(get_db)):
+    return await _create_one(db, crud.create_museum, models.Museum, museum)
+
+@app.post("/museums/bulk/", response_model=schemas.MuseumBulkResult)
+async def add_museums_bulk(
+    museums: List[schemas.MuseumCreate] = Body(..., max_length=BULK_MAX_ITEMS),
+    chunk_size: int = Query(500, description="Строк в одном INSERT", ge=1, le=5000),
+    atomic: bool = Query(True, description="true - всё или ничего, false - сохранить успешные"),
+    db: DbSession = Depends(get_db)
+):
+    return _bulk_response(await run_db(db, crud.create_museums_bulk, museums, chunk_size=chunk_size, atomic=atomic), atomic)
 
 @app.get("/museums/", response_model=List[schemas.Museum])
-def list_museums(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_museums(db, skip=skip, limit=limit)
+async def list_museums(skip: int = 0, limit: int = 100, db: DbSession = Depends(get_db)):
+    return await run_db(db, crud.get_museums, skip=skip, limit=limit)
 
 # ---------------- ARTWORK ----------------
 @app.post("/artworks/", response_model=schemas.Artwork)
-def add_artwork(artwork: schemas.ArtworkCreate, db: Session = Depends(get_db)):
-    return crud.create_artwork(db, artwork)
+async def add_artwork(artwork: schemas.ArtworkCreate, db: DbSession = Depends(get_db)):
+    return await _create_one(db, crud.create_artwork, models.Artwork, artwork)
+
+@app.post("/artworks/bulk/", response_model=schemas.ArtworkBulkResult)
+async def add_artworks_bulk(
+    artworks: List[schemas.ArtworkCreate] = Body(..., max_length=BULK_MAX_ITEMS),
+    chunk_size: int = Query(500, description="Строк в одном INSERT", ge=1, le=5000),
+    atomic: bool = Query(True, description="true - всё или ничего, false - сохранить успешные"),
+    db: DbSession = Depends(get_db)
+):
+    return _bulk_response(await run_db(db, crud.create_artworks_bulk, artworks, chunk_size=chunk_size, atomic=atomic), atomic)
 
 @app.get("/artworks/", response_model=schemas.PaginatedResponse)
-def list_artworks(
+async def list_artworks(
     page: int = Query(1, description="Номер страницы (начинается с 1)", ge=1),
     size: int = Query(10, description="Количество записей на странице", ge=1, le=100),
     sort_by: str = Query("id", description="Поле для сортировки: id, year, title, created_at"),
     sort_order: str = Query("asc", description="Направление: asc или desc"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor (пустой - первая страница в режиме курсора)"),
+    count: str = Query("exact", description="Подсчёт total: exact, cached, estimated или none", pattern="^(exact|cached|estimated|none)$"),
+    fields=Depends(artwork_fields),
+    expand=Depends(artwork_expand),
+    included: bool = Query(False, description=INCLUDED_DESCRIPTION),
+    db: DbSession = Depends(get_db)
 ):
     """
     Получить список произведений с пагинацией и сортировкой
     """
-    # Рассчитываем offset для пагинации
-    offset = (page - 1) * size
-    
-    # Получаем отсортированные данные с учетом пагинации
-    if sort_by == "year":
-        order_field = models.Artwork.year_created
-    elif sort_by == "title":
-        order_field = models.Artwork.title
-    elif sort_by == "created_at":
-        order_field = models.Artwork.created_at
-    else:
-        order_field = models.Artwork.id
-    
-    if sort_order.lower() == "desc":
-        order_field = order_field.desc()
-    else:
-        order_field = order_field.asc()
-    
-    # Получаем данные для текущей страницы
-    artworks = db.query(models.Artwork).order_by(order_field).offset(offset).limit(size).all()
-    
-    # Получаем общее количество записей
-    total = db.query(models.Artwork).count()
-    
-    # Рассчитываем общее количество страниц
-    total_pages = (total + size - 1) // size
-    
-    # Проверяем наличие следующей и предыдущей страницы
-    has_next = page < total_pages
-    has_prev = page > 1
-    
-    return {
-        "total": total,
-        "page": page,
-        "size": size,
-        "total_pages": total_pages,
-        "has_next": has_next,
-        "has_prev": has_prev,
-        "data": artworks
-    }
+    try:
+        result = await run_db(
+            db, crud.get_artworks_page, page=page, size=size,
+            sort_by=sort_by, sort_order=sort_order, cursor=cursor, count=count, fields=fields
+        )
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return artwork_page_response(result, fields, await _load_related(db, result["data"], expand), included)
 
 @app.get("/artworks/paginated/", response_model=schemas.PaginatedResponse)
-def get_paginated_artworks(
+async def get_paginated_artworks(
     page: int = Query(1, description="Номер страницы (начинается с 1)", ge=1),
     size: int = Query(10, description="Количество записей на странице", ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor (пустой - первая страница в режиме курсора)"),
+    count: str = Query("exact", description="Подсчёт total: exact, cached, estimated или none", pattern="^(exact|cached|estimated|none)$"),
+    fields=Depends(artwork_fields),
+    expand=Depends(artwork_expand),
+    included: bool = Query(False, description=INCLUDED_DESCRIPTION),
+    db: DbSession = Depends(get_db)
 ):
     """
     Получить произведения с пагинацией
     """
-    return crud.get_artworks_paginated(db, page=page, size=size)
+    try:
+        result = await run_db(
+            db, crud.get_artworks_paginated, page=page, size=size, cursor=cursor, count=count, fields=fields
+        )
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return artwork_page_response(result, fields, await _load_related(db, result["data"], expand), included)
 
 # ========== СЛОЖНЫЕ ЗАПРОСЫ ==========
-@app.get("/artworks/filter/", response_model=List[schemas.Artwork])
-def filter_artworks(
+@app.get("/artworks/filter/", response_model=Union[List[schemas.Artwork], schemas.ArtworkList])
+async def filter_artworks(
     min_year: int = Query(None, description="Минимальный год создания"),
     max_year: int = Query(None, description="Максимальный год создания"),
     artist_id: int = Query(None, description="ID художника"),
     museum_id: int = Query(None, description="ID музея"),
     genre_id: int = Query(None, description="ID жанра"),
+    created_from: datetime = Query(None, description="Добавлены не раньше (created_at >=)"),
+    created_to: datetime = Query(None, description="Добавлены раньше (created_at <)"),
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    fields=Depends(artwork_fields),
+    expand=Depends(artwork_expand),
+    included: bool = Query(False, description=INCLUDED_DESCRIPTION),
+    facets=Depends(artwork_facets),
+    db: DbSession = Depends(get_db)
 ):
-    return crud.get_artworks_filtered(
-        db, skip=skip, limit=limit,
+    rows = await run_db(
+        db, crud.get_artworks_filtered, skip=skip, limit=limit,
         min_year=min_year, max_year=max_year,
         artist_id=artist_id, museum_id=museum_id,
-        genre_id=genre_id
+        genre_id=genre_id, created_from=created_from, created_to=created_to,
+        fields=fields, facets=facets
+    )
+    counts = None
+    if facets is not None:
+        rows, counts = rows["data"], rows["facets"]
+    return artworks_response(rows, fields, await _load_related(db, rows, expand), included, counts)
+
+@app.get("/artworks/export/")
+async def export_artworks(
+    request: Request,
+    export_format: str = Query("ndjson", alias="format", description="Формат: ndjson или csv", pattern="^(ndjson|csv)$"),
+    with_details: bool = Query(False, description="Добавить имена художника, жанра и музея"),
+    min_year: int = Query(None, description="Минимальный год создания"),
+    max_year: int = Query(None, description="Максимальный год создания"),
+    artist_id: int = Query(None, description="ID художника"),
+    museum_id: int = Query(None, description="ID музея"),
+    genre_id: int = Query(None, description="ID жанра"),
+    created_from: datetime = Query(None, description="Добавлены не раньше (created_at >=)"),
+    created_to: datetime = Query(None, description="Добавлены раньше (created_at <)")
+):
+    """
+    Потоковая выгрузка всех произведений (с фильтрами /artworks/filter/)
+    """
+    return StreamingResponse(
+        export.stream_artworks(
+            export_format, read_engine(request), with_details=with_details,
+            min_year=min_year, max_year=max_year,
+            artist_id=artist_id, museum_id=museum_id, genre_id=genre_id,
+            created_from=created_from, created_to=created_to
+        ),
+        media_type=export.MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="artworks.{export_format}"'}
     )
 
 @app.get("/artworks/with-details/", response_model=List[schemas.ArtworkWithDetails])
-def get_artworks_details(
+async def get_artworks_details(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db)
 ):
-    return crud.get_artworks_with_details(db, skip=skip, limit=limit)
+    return await run_db(db, crud.get_artworks_with_details, skip=skip, limit=limit)
 
-@app.put("/artworks/apply-discount/")
-def apply_discount_to_expensive(
-    discount_percent: float = Query(10.0, description="Процент скидки"),
-    db: Session = Depends(get_db)
+@app.put("/artworks/apply-discount/", status_code=202, response_model=schemas.Job)
+async def apply_discount_to_expensive(
+    response: Response,
+    discount_percent: float = Query(10.0, description="Процент скидки", gt=0, le=100),
+    threshold: float = Query(1000000, description="Скидка для произведений дороже этой суммы (USD)", ge=0),
+    chunk_size: int = Query(10000, description="Строк (по диапазону id) в одной транзакции", ge=100, le=1000000),
+    db: DbSession = Depends(get_db)
 ):
-    updated = crud.update_expensive_artworks_discount(db, discount_percent)
-    return {
-        "message": f"Скидка {discount_percent}% применена к {updated} произведениям",
-        "updated_count": updated
-    }
+    """
+    Скидка применяется фоновым заданием (python -m app.worker): ответ 202
+    сразу, прогресс и updated_count - в GET /jobs/{id} (заголовок Location)
+    """
+    params = {"discount_percent": discount_percent, "threshold": threshold, "chunk_size": chunk_size}
+    return _job_accepted(await run_db(db, jobs.submit, "apply_discount", params), response)
 
 @app.get("/stats/by-country/", response_model=List[schemas.StatsByCountry])
-def get_stats_by_country(db: Session = Depends(get_db)):
-    return crud.get_stats_by_country(db)
+async def get_stats_by_country(
+    fresh: bool = Query(False, description="true - живой GROUP BY по artworks (сверка) вместо агрегатов"),
+    db: DbSession = Depends(get_db)
+):
+    return await run_db(db, crud.get_stats_by_country, fresh=fresh)
+
+@app.get("/stats/by-genre/", response_model=List[schemas.StatsByGenre])
+async def get_stats_by_genre(
+    fresh: bool = Query(False, description="true - живой GROUP BY по artworks (сверка) вместо агрегатов"),
+    db: DbSession = Depends(get_db)
+):
+    return await run_db(db, crud.get_stats_by_genre, fresh=fresh)
+
+@app.get("/stats/by-artist/", response_model=List[schemas.StatsByArtist])
+async def get_stats_by_artist(
+    skip: int = 0,
+    limit: int = 100,
+    fresh: bool = Query(False, description="true - живой GROUP BY по artworks (сверка) вместо агрегатов"),
+    db: DbSession = Depends(get_db)
+):
+    return await run_db(db, crud.get_stats_by_artist, skip=skip, limit=limit, fresh=fresh)
+
+@app.get("/stats/by-decade/", response_model=List[schemas.StatsByDecade])
+async def get_stats_by_decade(
+    fresh: bool = Query(False, description="true - живой GROUP BY по artworks (сверка) вместо агрегатов"),
+    db: DbSession = Depends(get_db)
+):
+    return await run_db(db, crud.get_stats_by_decade, fresh=fresh)
+
+# ========== ПОЛНОТЕКСТОВЫЙ ПОИСК ==========
+@app.get("/artworks/search/", response_model=schemas.ArtworkSearchResponse)
+async def search_artworks(
+    q: str = Query(..., description='Запрос: слова, "точная фраза", or, -исключение', min_length=1),
+    lang: str = Query("russian", description="Разбор запроса: russian (русский и английский), english или simple (точные словоформы)", pattern="^(russian|english|simple)$"),
+    page: int = Query(1, description="Номер страницы", ge=1),
+    size: int = Query(10, description="Количество на странице", ge=1, le=100),
+    count: str = Query("exact", description="Подсчёт total: exact, cached, estimated или none", pattern="^(exact|cached|estimated|none)$"),
+    fields=Depends(artwork_fields),
+    expand=Depends(artwork_expand),
+    included: bool = Query(False, description=INCLUDED_DESCRIPTION),
+    facets=Depends(artwork_facets),
+    db: DbSession = Depends(get_db)
+):
+    """
+    Поиск по названию, описанию и имени художника, по убыванию релевантности
+    """
+    result = await run_db(
+        db, crud.search_artworks_fulltext, q, lang=lang, page=page, size=size, count=count,
+        fields=fields, facets=facets
+    )
+    return search_page_response(result, await _load_related(db, result["data"], expand), included)
 
 # ========== ПОЛНОТЕКСТОВЫЙ ПОИСК ПО JSON (ПУНКТ 6) ==========
 @app.get("/artworks/search/metadata/", response_model=schemas.PaginatedResponse)
-def search_in_metadata(
+async def search_in_metadata(
     pattern: str = Query(..., description="""Регулярное выражение для поиска в JSON поле metadata_json.
     
     Примеры:
@@ -166,73 +414,207 @@ def search_in_metadata(
     """),
     page: int = Query(1, description="Номер страницы", ge=1),
     size: int = Query(10, description="Количество на странице", ge=1, le=100),
-    db: Session = Depends(get_db)
+    count: str = Query("exact", description="Подсчёт total: exact, cached, estimated или none", pattern="^(exact|cached|estimated|none)$"),
+    fields=Depends(artwork_fields),
+    expand=Depends(artwork_expand),
+    included: bool = Query(False, description=INCLUDED_DESCRIPTION),
+    facets=Depends(artwork_facets),
+    db: DbSession = Depends(get_db)
 ):
     """
     Поиск по JSON полю с пагинацией
     """
+    if not pattern or pattern.strip() == "":
+        raise HTTPException(
+            status_code=400, 
+            detail="Pattern cannot be empty"
+        )
+
     try:
-        if not pattern or pattern.strip() == "":
-            raise HTTPException(
-                status_code=400, 
-                detail="Pattern cannot be empty"
-            )
-        
-        # Рассчитываем offset
-        offset = (page - 1) * size
-        
-        # Используем raw SQL для поиска
-        from sqlalchemy import text
-        query = text("""
-            SELECT * FROM artworks 
-            WHERE metadata_json::text ~ :pattern
-            ORDER BY id
-            LIMIT :limit OFFSET :offset
-        """)
-        
-        result = db.execute(query, {
-            "pattern": pattern.strip(),
-            "limit": size,
-            "offset": offset
-        })
-        
-        # Получаем данные
-        artworks_data = [dict(row) for row in result]
-        
-        # Получаем ОБЩЕЕ количество найденных записей (без пагинации)
-        count_query = text("""
-            SELECT COUNT(*) FROM artworks 
-            WHERE metadata_json::text ~ :pattern
-        """)
-        
-        total_result = db.execute(count_query, {"pattern": pattern.strip()})
-        total = total_result.scalar()  # Получаем число
-        
-        # Рассчитываем страницы
-        total_pages = (total + size - 1) // size if total > 0 else 0
-        has_next = page < total_pages
-        has_prev = page > 1
-        
-        # Преобразуем словари в объекты Artwork
-        from app import models
-        artworks = []
-        for item in artworks_data:
-            artwork = models.Artwork(**item)
-            artworks.append(artwork)
-        
-        return {
-            "total": total,
-            "page": page,
-            "size": size,
-            "total_pages": total_pages,
-            "has_next": has_next,
-            "has_prev": has_prev,
-            "data": artworks
-        }
-        
-    except Exception as e:
-        print(f"Search error: {e}")
+        result = await run_db(
+            db, crud.search_artworks_by_metadata,
+            pattern.strip(), page=page, size=size, count=count, fields=fields, facets=facets
+        )
+    except DBAPIError as e:
+        # PostgreSQL отклонил регулярное выражение (SQLSTATE 2201B).
+        # psycopg2 отдаёт его как DataError, asyncpg - как общий DBAPIError,
+        # поэтому смотрим на код ошибки, а не на класс
+        if getattr(e.orig, "pgcode", None) != "2201B":
+            raise
+        # у asyncpg текст ошибки - в исходном исключении драйвера
         raise HTTPException(
-            status_code=500, 
-            detail=f"Search failed: {str(e)}"
-        )
\ No newline at end of file
+            status_code=400, 
+            detail=f"Invalid pattern: {e.orig.__cause__ or e.orig}"
+        )
+    return artwork_page_response(result, fields, await _load_related(db, result["data"], expand), included)
+
+
+@app.get("/artworks/search/metadata/structured/", response_model=schemas.PaginatedResponse)
+async def search_in_metadata_structured(
+    eq: List[str] = Query([], description="Равенство key:value, например style:oil или is_famous:true (через @>)"),
+    ranges: List[str] = Query([], alias="range", description="Числовой диапазон key:min..max, например estimated_value_usd:1000000.. или size_cm.width:..100"),
+    has: List[str] = Query([], description="Ключ должен присутствовать, например discount_percent"),
+    page: int = Query(1, description="Номер страницы", ge=1),
+    size: int = Query(10, description="Количество на странице", ge=1, le=100),
+    count: str = Query("exact", description="Подсчёт total: exact, cached, estimated или none", pattern="^(exact|cached|estimated|none)$"),
+    fields=Depends(artwork_fields),
+    expand=Depends(artwork_expand),
+    included: bool = Query(False, description=INCLUDED_DESCRIPTION),
+    facets=Depends(artwork_facets),
+    db: DbSession = Depends(get_db)
+):
+    """
+    Структурный поиск по JSON полю: условия объединяются через AND
+    """
+    try:
+        conditions = crud.metadata_conditions(eq=eq, ranges=ranges, has=has)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not conditions:
+        raise HTTPException(status_code=400, detail="Нужно хотя бы одно условие: eq, range или has")
+
+    result = await run_db(
+        db, crud.search_artworks_by_metadata_structured,
+        conditions, page=page, size=size, count=count, fields=fields, facets=facets
+    )
+    return artwork_page_response(result, fields, await _load_related(db, result["data"], expand), included)
+
+
+# ========== ФОНОВЫЕ ЗАДАНИЯ ==========
+def _job_accepted(job, response: Response):
+    """
+    Задание и Location для опроса (202 - status_code маршрута). Заголовки
+    ставятся на response из зависимостей, а не в свой JSONResponse: иначе
+    FastAPI не перенесёт cookie db_primary, выставленную записью задания,
+    и опрос Location может уйти в отстающую реплику
+    """
+    job = schemas.Job.model_validate(job)
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job
+
+@app.post("/jobs/", status_code=202, response_model=schemas.Job)
+async def create_job(job: schemas.JobCreate, response: Response, db: DbSession = Depends(get_db)):
+    """
+    Поставить задание в очередь: apply_discount, export, stats_rebuild, reindex
+    (параметры - schemas.*JobParams). Выполняет python -m app.worker
+    """
+    try:
+        return _job_accepted(await run_db(db, jobs.submit, job.kind, job.params), response)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/jobs/", response_model=List[schemas.Job])
+async def list_jobs(
+    status: Optional[str] = Query(None, description="queued, running, done или failed", pattern="^(queued|running|done|failed)$"),
+    limit: int = Query(50, ge=1, le=1000),
+    db: DbSession = Depends(get_db)
+):
+    return await run_db(db, jobs.list_jobs, status=status, limit=limit)
+
+async def _get_job(db, job_id: int):
+    job = await run_db(db, jobs.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    return job
+
+@app.get("/jobs/{job_id}", response_model=schemas.Job)
+async def get_job(job_id: int, db: DbSession = Depends(get_db)):
+    return await _get_job(db, job_id)
+
+@app.post("/jobs/{job_id}/retry", status_code=202, response_model=schemas.Job)
+async def retry_job(job_id: int, response: Response, db: DbSession = Depends(get_db)):
+    """Упавшее задание - снова в очередь, продолжится с последнего чекпойнта"""
+    await _get_job(db, job_id)
+    job = await run_db(db, jobs.retry_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=409, detail="Повторить можно только задание в статусе failed")
+    return _job_accepted(job, response)
+
+@app.get("/jobs/{job_id}/file")
+async def get_job_file(job_id: int, db: DbSession = Depends(get_db)):
+    """Файл выгрузки (задание export); JOBS_EXPORT_DIR общий у API и воркера"""
+    job = await _get_job(db, job_id)
+    if job.kind != "export" or job.status != "done":
+        raise HTTPException(status_code=409, detail="Файл есть только у выполненного задания export")
+    export_format = job.params["format"]
+    return FileResponse(
+        jobs.export_path(job.id, export_format),
+        media_type=export.MEDIA_TYPES[export_format],
+        filename=f"artworks.{export_format}"
+    )
+
+
+# ========== ВНУТРЕННИЕ ==========
+def _pools():
+    pools = {"sync": pool_status(engine)}
+    if async_engine is not None:
+        pools["async"] = pool_status(async_engine)
+    for i, replica in enumerate(replicas.replicas):
+        pools[f"replica {i}"] = pool_status(replica.async_engine or replica.engine)
+    return pools
+
+@app.get("/internal/pool")
+async def get_pool_status():
+    """
+    Состояние пулов соединений: занятые, overflow, ожидание свободного соединения
+    """
+    return {"mode": config.DB_MODE, "pgbouncer": config.DB_PGBOUNCER, "pools": _pools()}
+
+@app.get("/internal/group-commit")
+async def get_group_commit_status():
+    """Групповой коммит вставок: пачки, средний и наибольший размер, очередь"""
+    return group_commit.status()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Метрики в формате Prometheus: время ответа и SQL на запрос по маршрутам,
+    SQL по типам выражений, состояние пулов
+    """
+    for name, status in _pools().items():
+        for key, value in status.items():
+            metrics.DB_POOL.set((name, key), value)
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/internal/slow-queries")
+async def get_slow_queries(recent: int = Query(20, ge=0, le=config.DB_SLOW_QUERY_BUFFER)):
+    """
+    Медленные SQL (дольше DB_SLOW_QUERY_MS) по видам запроса: сколько раз,
+    суммарное и максимальное время, маршруты, план EXPLAIN; recent - последние записи
+    """
+    return slow_queries.report(recent)
+
+@app.delete("/internal/slow-queries")
+async def clear_slow_queries():
+    """
+    Очистить журнал медленных запросов
+    """
+    slow_queries.clear()
+    return {"message": "Журнал медленных запросов очищен"}
+
+@app.get("/internal/partitions")
+async def get_partitions_status():
+    """
+    Секции artworks: ключ, шаг, границы и оценка строк; пусто, если таблица не секционирована
+    """
+    return await run_in_threadpool(artwork_partitions.status)
+
+@app.get("/internal/indexes")
+async def get_index_report():
+    """
+    Индексы: размер, сканирования (primary и реплики), неиспользуемые и
+    перекрытые другими; по таблицам - число индексов и записи, которые их обновляют
+    """
+    servers = [("primary", engine)] + [(replica.name, replica.engine) for replica in replicas.replicas]
+    return await run_in_threadpool(index_report, servers)
+
+@app.get("/internal/replicas")
+async def get_replicas_status():
+    """
+    Реплики для чтения: отставание и доступность
+    """
+    return {
+        "strategy": replicas.strategy,
+        "max_lag_s": replicas.max_lag_s,
+        "replicas": replicas.status()
+    }
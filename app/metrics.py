@@ -0,0 +1,264 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+# Метрики в текстовом формате Prometheus для /metrics. Счётчики живут в памяти
+# процесса: у каждого воркера uvicorn свои, Prometheus опрашивает воркеры отдельно.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Путь без совпавшего маршрута (404, сканеры) - одной меткой, чтобы не плодить ряды
+UNMATCHED_ROUTE = "unmatched"
+ROUTE_CACHE_SIZE = 1024
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), value=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels=(), value=1):
+        self.inc(labels, -value)
+
+    def set(self, labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """Фиксированные границы; на каждое наблюдение - bisect и три сложения под замком"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # счётчики по корзинам (последняя - +Inf), сумма
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            values = [(k, list(counts), total) for k, (counts, total) in self._values.items()]
+        lines = self.header()
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, [("le", _number(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+#  HTTP ----------------
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Запросы по маршруту и статусу", ("method", "route", "status"))
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds", "Время ответа, включая потоковое тело", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Запросы, обрабатываемые прямо сейчас", ("method", "route"))
+
+#  SQL НА ЗАПРОС ----------------
+DB_STATEMENTS_PER_REQUEST = Histogram(
+    "db_statements_per_request", "SQL-выражений на HTTP-запрос (N+1, лишние COUNT)",
+    ("method", "route"), STATEMENT_BUCKETS)
+DB_DURATION_PER_REQUEST = Histogram(
+    "db_duration_per_request_seconds", "Суммарное время SQL на HTTP-запрос", ("method", "route"))
+DB_ROWS = Counter(
+    "db_rows_total", "Строки, затронутые или возвращённые SQL (rowcount драйвера)", ("method", "route"))
+
+#  SQL ВСЕГО ----------------
+DB_STATEMENTS = Counter(
+    "db_statements_total", "SQL-выражения по первому слову, включая фоновые", ("kind",))
+DB_DURATION = Counter(
+    "db_statement_duration_seconds_total", "Время SQL-выражений по первому слову", ("kind",))
+
+#  ПУЛЫ ----------------
+DB_POOL = Gauge(
+    "db_pool", "Состояние пулов соединений (как /internal/pool)", ("pool", "key"))
+
+REGISTRY = [
+    HTTP_REQUESTS, HTTP_DURATION, HTTP_IN_FLIGHT,
+    DB_STATEMENTS_PER_REQUEST, DB_DURATION_PER_REQUEST, DB_ROWS,
+    DB_STATEMENTS, DB_DURATION, DB_POOL,
+]
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---- SQL ----
+class RequestSql:
+    """Накопитель SQL текущего HTTP-запроса"""
+    __slots__ = ("labels", "statements", "seconds", "rows")
+
+    def __init__(self, labels=("", "")):
+        self.labels = labels
+        self.statements = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+
+# run_in_threadpool и AsyncSession.run_sync работают в копии контекста запроса -
+# объект общий, поэтому выражения из потоков и greenlet попадают в тот же накопитель
+_request_sql: ContextVar = ContextVar("request_sql", default=None)
+
+
+def current_route():
+    """(метод, шаблон маршрута) HTTP-запроса, в котором выполняется код, или None"""
+    current = _request_sql.get()
+    return current.labels if current is not None else None
+
+
+def _statement_kind(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper()[:16] if words else ""
+
+
+def track_sql(engine):
+    """Считать выражения, время и строки движка (sync или AsyncEngine)"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        kind = _statement_kind(statement)
+        DB_STATEMENTS.inc((kind,))
+        DB_DURATION.inc((kind,), elapsed)
+        current = _request_sql.get()
+        if current is not None:
+            current.statements += 1
+            current.seconds += elapsed
+            rows = cursor.rowcount
+            if rows and rows > 0:
+                current.rows += rows
+
+    return engine
+
+
+# ---- MIDDLEWARE ----
+class MetricsMiddleware:
+    """
+    Время ответа, запросы в работе и SQL на запрос по шаблону маршрута
+    (путь с параметрами - одним рядом, а не по ряду на значение). Маршрут ищется до вызова
+    приложения и кэшируется по (метод, путь).
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+        self._route_cache = {}
+
+    def _route(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        route = self._route_cache.get(key)
+        if route is not None:
+            return route
+        route = UNMATCHED_ROUTE
+        for candidate in self.routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate.path
+                break
+        if len(self._route_cache) < ROUTE_CACHE_SIZE:
+            self._route_cache[key] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        labels = (scope["method"], self._route(scope))
+        status = 500
+        sql = RequestSql(labels)
+        token = _request_sql.set(sql)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(labels)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_sql.reset(token)
+            HTTP_IN_FLIGHT.dec(labels)
+            HTTP_REQUESTS.inc(labels + (status,))
+            HTTP_DURATION.observe(labels, elapsed)
+            DB_STATEMENTS_PER_REQUEST.observe(labels, sql.statements)
+            DB_DURATION_PER_REQUEST.observe(labels, sql.seconds)
+            if sql.rows:
+                DB_ROWS.inc(labels, sql.rows)
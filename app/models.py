@@ -1,12 +1,13 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, DateTime, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from app.database import Base
 from datetime import datetime
 
 class Artist(Base):
     __tablename__ = "artists"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     country = Column(String)
     birth_year = Column(Integer)
@@ -17,7 +18,7 @@ class Artist(Base):
 class Genre(Base):
     __tablename__ = "genres"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     description = Column(String)
 
@@ -26,7 +27,7 @@ class Genre(Base):
 class Museum(Base):
     __tablename__ = "museums"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     city = Column(String)
     country = Column(String)
@@ -36,12 +37,14 @@ class Museum(Base):
 class Artwork(Base):
     __tablename__ = "artworks"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False)
     year_created = Column(Integer)
     description = Column(String)
-    metadata_json = Column(JSON)
+    metadata_json = Column(JSONB)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Заполняется триггером artworks_search_vector, в обычных запросах не грузится
+    search_vector = deferred(Column(TSVECTOR))
 
     artist_id = Column(Integer, ForeignKey("artists.id"))
     genre_id = Column(Integer, ForeignKey("genres.id"))
@@ -49,4 +52,36 @@ class Artwork(Base):
 
     artist = relationship("Artist", back_populates="artworks")
     genre = relationship("Genre", back_populates="artworks")
-    museum = relationship("Museum", back_populates="artworks")
\ No newline at end of file
+    museum = relationship("Museum", back_populates="artworks")
+
+# Агрегаты по artworks в разрезах country/genre/artist/decade.
+# Заполняется только триггерами (миграция 9c2f5e8a3d14), приложение лишь читает.
+# key - jsonb: страна, id жанра/художника или десятилетие; 'null' - группа NULL.
+class ArtworkStat(Base):
+    __tablename__ = "artwork_stats"
+
+    dimension = Column(String, primary_key=True)
+    key = Column(JSONB, primary_key=True)
+    artwork_count = Column(BigInteger, nullable=False, default=0)
+    year_sum = Column(BigInteger, nullable=False, default=0)
+    year_count = Column(BigInteger, nullable=False, default=0)
+
+# Фоновые задания (app/jobs.py): ставит API, выполняет python -m app.worker.
+# checkpoint - где продолжить после сбоя, progress - для GET /jobs/{id}.
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String, nullable=False)
+    params = Column(JSONB, nullable=False, server_default="{}")
+    status = Column(String, nullable=False, server_default="queued")
+    checkpoint = Column(JSONB)
+    progress = Column(JSONB)
+    result = Column(JSONB)
+    error = Column(String)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    worker = Column(String)
+    created_at = Column(DateTime, nullable=False, server_default=text("(now() AT TIME ZONE 'utc')"))
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -0,0 +1,354 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import and_, func, literal_column, or_, text, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app import facets as facet_counts, models
+from app.versions import table_versions
+
+# NULL в year_created при сортировке заменяется этим значением.
+# Так порядок совпадает с порядком PostgreSQL по умолчанию
+# (NULLS LAST для asc, NULLS FIRST для desc), а keyset-условие
+# можно записать одним сравнением кортежей по индексу.
+YEAR_NULL_SENTINEL = 2147483647
+
+SORT_FIELDS = ("id", "year", "title", "created_at")
+
+# Колонка artworks, из которой key_value берёт ключ курсора
+SORT_COLUMNS = {"id": "id", "year": "year_created", "title": "title", "created_at": "created_at"}
+
+
+class InvalidCursor(ValueError):
+    """Курсор не декодируется или получен для другой сортировки"""
+
+
+def sort_key(sort_by: str):
+    """Выражение сортировки для sort_by (неизвестные значения -> id)"""
+    if sort_by == "year":
+        # literal_column, а не bind-параметр: выражение должно совпадать
+        # с выражением индекса ix_artworks_year_id
+        return func.coalesce(
+            models.Artwork.year_created, literal_column(str(YEAR_NULL_SENTINEL))
+        )
+    if sort_by == "title":
+        return models.Artwork.title
+    if sort_by == "created_at":
+        return models.Artwork.created_at
+    return models.Artwork.id
+
+
+def normalize_sort(sort_by: str, sort_order: str):
+    if sort_by not in SORT_FIELDS:
+        sort_by = "id"
+    sort_order = "desc" if sort_order.lower() == "desc" else "asc"
+    return sort_by, sort_order
+
+
+def order_by(sort_by: str, sort_order: str):
+    """ORDER BY (ключ, id) - id делает порядок однозначным"""
+    key = sort_key(sort_by)
+    if sort_by == "id":
+        columns = [key]
+    else:
+        columns = [key, models.Artwork.id]
+    if sort_order == "desc":
+        return [c.desc() for c in columns]
+    return [c.asc() for c in columns]
+
+
+def key_value(artwork, sort_by: str):
+    """Значение ключа сортировки для строки (то, что попадёт в курсор)"""
+    if sort_by == "year":
+        if artwork.year_created is None:
+            return YEAR_NULL_SENTINEL
+        return artwork.year_created
+    if sort_by == "title":
+        return artwork.title
+    if sort_by == "created_at":
+        return artwork.created_at.isoformat()
+    return artwork.id
+
+
+def encode_cursor(artwork, sort_by: str, sort_order: str) -> str:
+    """Непрозрачный курсор: последний (ключ сортировки, id) страницы"""
+    payload = {
+        "s": sort_by,
+        "o": sort_order,
+        "k": key_value(artwork, sort_by),
+        "i": artwork.id,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str):
+    """Возвращает (ключ, id) из курсора; InvalidCursor если курсор битый или от другой сортировки"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key, last_id = payload["k"], int(payload["i"])
+        cursor_sort = (payload["s"], payload["o"])
+        if sort_by == "created_at":
+            key = datetime.fromisoformat(key)
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor("Некорректный курсор")
+    if cursor_sort != (sort_by, sort_order):
+        raise InvalidCursor("Курсор получен для другой сортировки")
+    return key, last_id
+
+
+def keyset_filter(sort_by: str, sort_order: str, key, last_id: int):
+    """WHERE (ключ, id) > (последний ключ, последний id) - или < для desc"""
+    if sort_by == "id":
+        column, value = models.Artwork.id, last_id
+    else:
+        column = tuple_(sort_key(sort_by), models.Artwork.id)
+        value = tuple_(key, last_id)
+    if sort_order == "desc":
+        condition = column < value
+    else:
+        condition = column > value
+    bound = partition_bound(sort_by, sort_order, key)
+    return condition if bound is None else and_(condition, bound)
+
+
+def partition_bound(sort_by: str, sort_order: str, key):
+    """
+    Следствие keyset-условия по самой колонке: сравнение кортежей PostgreSQL
+    не использует для отсечения секций, а created_at >= :k - использует
+    (и для year_created, если таблица секционирована по году)
+    """
+    if sort_by == "created_at":
+        column = models.Artwork.created_at
+        return column <= key if sort_order == "desc" else column >= key
+    if sort_by == "year":
+        column = models.Artwork.year_created
+        if sort_order == "desc":
+            # COALESCE(year, sentinel) <= k: при k = sentinel подходят все строки
+            return None if key >= YEAR_NULL_SENTINEL else column <= key
+        return or_(column >= key, column.is_(None))
+    return None
+
+
+#  ПОДСЧЁТ TOTAL ----------------
+# exact     - точное число в том же запросе, что и страница (скалярный подзапрос)
+# cached    - точное число из кэша; в ключе версия artworks (table_versions),
+#             так что запись любого процесса, включая воркер заданий, его обходит
+# estimated - оценка планировщика (pg_class.reltuples или строки из EXPLAIN)
+# none      - без total/total_pages, has_next по size+1 строкам
+COUNT_STRATEGIES = ("exact", "cached", "estimated", "none")
+
+COUNT_CACHE_TTL = 60          # секунд
+COUNT_CACHE_MAX_ENTRIES = 1024
+
+_count_cache = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+
+def invalidate_counts():
+    """Сбросить кэш total после своей записи в artworks; чужие записи меняют версию в ключе"""
+    with _count_cache_lock:
+        _count_cache.clear()
+
+
+def _cache_key(query):
+    """None - версии artworks сейчас не доверять (см. TableVersions.snapshot), кэш не используется"""
+    versions = table_versions.snapshot(("artworks",))
+    if versions is None:
+        return None
+    compiled = query.statement.compile(dialect=postgresql.dialect())
+    return str(compiled), tuple(sorted((k, repr(v)) for k, v in compiled.params.items())), versions
+
+
+def _cache_get(key):
+    if key is None:
+        return None
+    with _count_cache_lock:
+        item = _count_cache.get(key)
+        if item is None:
+            return None
+        total, stored_at = item
+        if time.monotonic() - stored_at > COUNT_CACHE_TTL:
+            del _count_cache[key]
+            return None
+        return total
+
+
+def _cache_put(key, total):
+    with _count_cache_lock:
+        _count_cache[key] = (total, time.monotonic())
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.popitem(last=False)
+
+
+def _count_subquery(query):
+    # correlate(None): подзапрос считает весь отфильтрованный набор,
+    # а не привязывается к строке внешнего запроса
+    return (
+        query.with_entities(func.count(models.Artwork.id))
+        .order_by(None)
+        .scalar_subquery()
+        .correlate(None)
+    )
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) <запрос> - параметры привязываются как у самого запроса"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def explain(db, statement):
+    """План запроса (верхний узел) без выполнения"""
+    plan = db.execute(Explain(statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def estimate_count(db, query):
+    """Оценка числа строк по статистике планировщика, без выполнения запроса"""
+    if query.whereclause is None:
+        # У секционированной таблицы строки - в секциях (листьях дерева)
+        reltuples = db.execute(
+            text("""
+                SELECT CASE WHEN bool_and(c.reltuples >= 0) THEN sum(c.reltuples)::bigint END
+                FROM pg_class c
+                WHERE (c.oid = CAST(:table AS regclass) AND c.relkind = 'r')
+                   OR c.oid IN (SELECT relid FROM pg_partition_tree(CAST(:table AS regclass)) WHERE isleaf)
+            """),
+            {"table": models.Artwork.__tablename__}
+        ).scalar()
+        # NULL - таблица или одна из секций ещё ни разу не анализировалась
+        if reltuples is not None:
+            return int(reltuples)
+
+    plan = explain(db, query.with_entities(models.Artwork.id).order_by(None).statement)
+    return int(plan["Plan Rows"])
+
+
+def _selects_entity(query):
+    """db.query(models.Artwork, ...), а не db.query(колонки)"""
+    return query.column_descriptions[0]["expr"] is models.Artwork
+
+
+def fetch_page(
+    db,
+    query,
+    page: int = 1,
+    size: int = 10,
+    sort_by: str = "id",
+    sort_order: str = "asc",
+    cursor: str = None,
+    count: str = "exact",
+    order=None,
+    facets=None
+):
+    """
+    Страница по отфильтрованному запросу db.query(models.Artwork, ...).
+    Без cursor - OFFSET по page, с cursor - keyset (пустой cursor = первая страница).
+    count - стратегия подсчёта total, см. COUNT_STRATEGIES.
+    order - свой ORDER BY вместо sort_by/sort_order (тогда курсоры не выдаются).
+    facets - facets.FacetRequest: счётчики по всему набору в ключе "facets",
+    той же выборкой, что и страница (или из кэша фасетов).
+    Если в запросе несколько сущностей, в data попадают кортежи; если
+    колонки (crud.artwork_rows) - строки Row, с лишними полями total_count
+    и facets в конце.
+    """
+    sort_by, sort_order = normalize_sort(sort_by, sort_order)
+
+    total = None
+    cache_key = None
+    if count == "cached":
+        cache_key = _cache_key(query)
+        total = _cache_get(cache_key)
+    elif count == "estimated":
+        total = estimate_count(db, query)
+
+    # exact и промах кэша - total приезжает вместе со страницей
+    inline_total = count == "exact" or (count == "cached" and total is None)
+
+    counts = None
+    facets_key = None
+    if facets is not None:
+        facets_key = facet_counts.cache_key(query, facets)
+        counts = facet_counts.cache_get(facets_key)
+    inline_facets = facets is not None and counts is None
+
+    if order is None:
+        page_query = query.order_by(*order_by(sort_by, sort_order))
+    else:
+        page_query = query.order_by(*order)
+    if inline_total:
+        page_query = page_query.add_columns(_count_subquery(query).label("total_count"))
+    if inline_facets:
+        page_query = page_query.add_columns(facet_counts.facet_subquery(query, facets).label("facets"))
+    if cursor is None:
+        page_query = page_query.offset((page - 1) * size)
+    elif cursor:
+        key, last_id = decode_cursor(cursor, sort_by, sort_order)
+        page_query = page_query.filter(keyset_filter(sort_by, sort_order, key, last_id))
+
+    # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+    rows = page_query.limit(size + 1).all()
+    has_next = len(rows) > size
+    rows = rows[:size]
+
+    # Служебные колонки в конце строки: total_count, затем facets
+    extra = inline_total + inline_facets
+    first_page = cursor is None and page == 1
+    if inline_total:
+        if rows:
+            total = rows[0][-extra]
+        elif first_page:
+            total = 0
+        else:
+            # Страница за концом выборки - подзапросу не к чему было приехать
+            total = query.with_entities(func.count(models.Artwork.id)).order_by(None).scalar()
+        if cache_key is not None:
+            _cache_put(cache_key, total)
+    if inline_facets:
+        if rows:
+            counts = facet_counts.complete(rows[0][-1], facets)
+        elif first_page:
+            counts = facet_counts.complete(None, facets)
+        else:
+            counts = facet_counts.count_facets(db, query, facets)
+        facet_counts.cache_put(facets_key, counts)
+    if extra and _selects_entity(query):
+        rows = [row[0] if len(row) == extra + 1 else tuple(row[:-extra]) for row in rows]
+
+    next_cursor = None
+    if has_next and order is None:
+        last = rows[-1]
+        next_cursor = encode_cursor(last[0] if isinstance(last, tuple) else last, sort_by, sort_order)
+
+    result = {
+        "total": total,
+        "page": page if cursor is None else None,
+        "size": size,
+        "total_pages": (total + size - 1) // size if total is not None else None,
+        "has_next": has_next,
+        "has_prev": page > 1 if cursor is None else bool(cursor),
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+        "count_strategy": count,
+        "data": rows
+    }
+    if facets is not None:
+        result["facets"] = counts
+    return result
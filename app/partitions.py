@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+from app import config
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Секции artworks (миграция d5a7c3e9f812). Функции создания секций живут
+# в PostgreSQL; здесь - периодический вызов, чтобы текущая и следующие
+# секции существовали заранее и новые строки не копились в artworks_default:
+# создание секции держит artworks_default под ACCESS EXCLUSIVE на время её
+# полного скана (см. artworks_create_partition), с пустой default это мгновенно.
+
+PARTITIONING_SQL = text("SELECT key, step FROM artworks_partitioning")
+CREATE_FUTURE_SQL = text("SELECT artworks_create_future_partitions(:ahead)")
+CREATE_RANGE_SQL = text("SELECT artworks_create_partitions(:low, :high)")
+PARTITIONS_SQL = text("""
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = CAST('artworks' AS regclass)
+    ORDER BY c.relname
+""")
+
+
+def partitioning(conn):
+    """(ключ, шаг) секционирования artworks или None, если таблица одна"""
+    if conn.execute(text("SELECT to_regclass('artworks_partitioning')")).scalar() is None:
+        return None
+    row = conn.execute(PARTITIONING_SQL).first()
+    return tuple(row) if row is not None else None
+
+
+def create_partitions(conn, created_range=None, year_range=None):
+    """
+    Секции под загружаемые данные (скрипты заполнения): created_range или
+    year_range - (от, до), в зависимости от ключа. Без секционирования ничего не делает.
+    """
+    info = partitioning(conn)
+    if info is None:
+        return 0
+    low_high = created_range if info[0] == "created_at" else year_range
+    if low_high is None:
+        return 0
+    return conn.execute(CREATE_RANGE_SQL, {"low": str(low_high[0]), "high": str(low_high[1])}).scalar()
+
+
+class PartitionMaintainer:
+    """Фоновый поток: раз в interval_s создаёт секции на ahead шагов вперёд"""
+
+    def __init__(self, engine, ahead: int, interval_s: float):
+        self.engine = engine
+        self.ahead = ahead
+        self.interval_s = interval_s
+        self.checked_at = None
+        self.error = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None or self.interval_s <= 0:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="artworks-partitions", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.check()
+            time.sleep(self.interval_s)
+
+    def check(self):
+        try:
+            with self.engine.begin() as conn:
+                if partitioning(conn) is not None:
+                    conn.execute(CREATE_FUTURE_SQL, {"ahead": self.ahead})
+            self.error = None
+        except Exception as e:
+            # до миграции или при недоступной БД - повторим через interval_s
+            if self.error is None:
+                logger.warning("Секции artworks не проверены: %s", e)
+            self.error = str(e)
+        self.checked_at = time.time()
+
+    def status(self):
+        with self.engine.connect() as conn:
+            info = partitioning(conn)
+            partitions = [
+                {"name": name, "bound": bound, "estimated_rows": max(rows, 0)}
+                for name, bound, rows in conn.execute(PARTITIONS_SQL)
+            ] if info is not None else []
+        return {
+            "key": info[0] if info else None,
+            "step": info[1] if info else None,
+            "ahead": self.ahead,
+            "checked_at": self.checked_at,
+            "error": self.error,
+            "partitions": partitions,
+        }
+
+
+artwork_partitions = PartitionMaintainer(
+    engine,
+    ahead=config.ARTWORKS_PARTITIONS_AHEAD,
+    interval_s=config.ARTWORKS_PARTITION_CHECK_INTERVAL_S
+)
@@ -0,0 +1,123 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    """Счётчики пула: заполняются событиями пула и замером времени выдачи"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def add(self, name: str, value: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def add_wait(self, elapsed_ms: float):
+        with self._lock:
+            self.waits += 1
+            self.wait_total_ms += elapsed_ms
+            if elapsed_ms > self.wait_max_ms:
+                self.wait_max_ms = elapsed_ms
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "waits": self.waits,
+                "wait_total_ms": round(self.wait_total_ms, 3),
+                "wait_max_ms": round(self.wait_max_ms, 3),
+                "wait_avg_ms": round(self.wait_total_ms / self.waits, 3) if self.waits else 0.0,
+            }
+
+
+class _TimedGetMixin:
+    """Замеряет ожидание соединения, когда пул исчерпан (все заняты, overflow выбран)"""
+
+    def _do_get(self):
+        exhausted = (
+            self._max_overflow > -1
+            and self.checkedin() == 0
+            and self.overflow() >= self._max_overflow
+        )
+        if not exhausted:
+            return super()._do_get()
+
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            # пул исчерпан дольше pool_timeout
+            self.stats.add("timeouts")
+            raise
+        finally:
+            self.stats.add_wait((time.perf_counter() - started) * 1000)
+
+    def recreate(self):
+        # dispose()/пересоздание пула не должно терять накопленные счётчики
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedQueuePool(_TimedGetMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedGetMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument(engine):
+    """Подключить счётчики к пулу движка (sync или AsyncEngine)"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+    pool.stats = PoolStats()
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        pool.stats.add("connects")
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool.stats.add("checkouts")
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        pool.stats.add("checkins")
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        pool.stats.add("invalidations")
+
+    return engine
+
+
+def pool_status(engine):
+    """Текущее состояние пула и накопленные счётчики для /internal/pool"""
+    pool = getattr(engine, "sync_engine", engine).pool
+    status = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # overflow() отрицателен, пока пул не заполнен до pool_size
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout_s": pool.timeout(),
+    }
+    status.update(pool.stats.snapshot())
+    return status
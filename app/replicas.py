@@ -0,0 +1,125 @@
+import itertools
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+REPLICA_STRATEGIES = ("round_robin", "least_connections")
+
+# Отставание реплики в секундах. Если всё полученное WAL уже применено,
+# реплика догнала primary, даже когда последняя транзакция была давно.
+LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replica:
+    def __init__(self, name: str, engine, async_engine=None):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        self.lag_s = None
+        self.error = None
+        self.checked_at = None
+
+    def checked_out(self, async_mode: bool) -> int:
+        engine = self.async_engine.sync_engine if async_mode else self.engine
+        return engine.pool.checkedout()
+
+
+class ReplicaSet:
+    """
+    Реплики для чтения. Фоновый поток раз в check_interval_s меряет отставание
+    каждой реплики; choose() выдаёт только реплики с отставанием не больше
+    max_lag_s. Пока отставание неизвестно или все реплики отстали - None,
+    и чтение идёт в primary.
+    """
+
+    def __init__(self, replicas, strategy: str = "round_robin",
+                 max_lag_s: float = 5.0, check_interval_s: float = 1.0):
+        if strategy not in REPLICA_STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия выбора реплики: {strategy}")
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.max_lag_s = max_lag_s
+        self.check_interval_s = check_interval_s
+        self._counter = itertools.count()
+        self._monitor = None
+        self._monitor_lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def start(self):
+        """Запустить проверку отставания заранее (иначе - при первом choose())"""
+        if self.replicas:
+            self._ensure_monitor()
+
+    def _ensure_monitor(self):
+        if self._monitor is not None:
+            return
+        with self._monitor_lock:
+            if self._monitor is None:
+                self._monitor = threading.Thread(target=self._monitor_loop, name="replica-lag", daemon=True)
+                self._monitor.start()
+
+    def _monitor_loop(self):
+        while True:
+            self.check()
+            time.sleep(self.check_interval_s)
+
+    def check(self):
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    replica.lag_s = float(conn.execute(LAG_SQL).scalar())
+                replica.error = None
+            except Exception as e:
+                # Недоступная реплика выпадает из выбора до следующей удачной проверки
+                if replica.error is None:
+                    logger.warning("Реплика %s недоступна: %s", replica.name, e)
+                replica.lag_s = None
+                replica.error = str(e)
+            replica.checked_at = time.time()
+
+    def available(self):
+        return [
+            r for r in self.replicas
+            if r.lag_s is not None and r.lag_s <= self.max_lag_s
+        ]
+
+    def choose(self, async_mode: bool = False):
+        """Реплика для чтения или None - тогда читать из primary"""
+        if not self.replicas:
+            return None
+        self._ensure_monitor()
+        candidates = self.available()
+        if not candidates:
+            return None
+        turn = next(self._counter)
+        if self.strategy == "least_connections":
+            # при равной загрузке - по кругу, чтобы не упираться в первую реплику
+            return min(
+                candidates[turn % len(candidates):] + candidates[:turn % len(candidates)],
+                key=lambda r: r.checked_out(async_mode)
+            )
+        return candidates[turn % len(candidates)]
+
+    def status(self):
+        return [
+            {
+                "name": r.name,
+                "lag_s": r.lag_s,
+                "available": r.lag_s is not None and r.lag_s <= self.max_lag_s,
+                "error": r.error,
+                "checked_at": r.checked_at,
+            }
+            for r in self.replicas
+        ]
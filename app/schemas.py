@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, List
+from pydantic import BaseModel, Field
+from typing import Any, Literal, Optional, Dict, List
 from datetime import datetime
 
 class ArtistBase(BaseModel):
@@ -64,33 +64,150 @@ class ArtworkWithDetails(BaseModel):
     title: str
     year_created: Optional[int]
     description: Optional[str]
-    artist_name: str
-    genre_name: str
-    museum_name: str
-    museum_country: str
+    artist_name: Optional[str]
+    genre_name: Optional[str]
+    museum_name: Optional[str]
+    museum_country: Optional[str]
     
     class Config:
         from_attributes = True
 
 class StatsByCountry(BaseModel):
-    country: str
+    country: Optional[str]
     artwork_count: int
     avg_year: Optional[float]
     
     class Config:
         from_attributes = True
 
+class StatsByGenre(BaseModel):
+    genre_id: int
+    genre_name: str
+    artwork_count: int
+    avg_year: Optional[float]
+
+class StatsByArtist(BaseModel):
+    artist_id: int
+    artist_name: str
+    artwork_count: int
+    avg_year: Optional[float]
+
+class StatsByDecade(BaseModel):
+    decade: Optional[int]
+    artwork_count: int
+    avg_year: Optional[float]
+
+class FacetItem(BaseModel):
+    value: Optional[int]    # id жанра/музея/художника или десятилетие; None - не указано
+    name: Optional[str] = None  # имя из справочника (у десятилетия нет)
+    count: int
+
+class Facet(BaseModel):
+    values: int             # Сколько всего разных значений в выборке
+    other: int              # Результатов со значениями вне items
+    items: List[FacetItem]  # top значений по убыванию count
+
+class ArtworkList(BaseModel):
+    """
+    Список произведений с included или facets (без них - просто массив Artwork)
+    """
+    data: List[Artwork]
+    included: Optional[Dict[str, List[Dict[str, Any]]]] = None  # Связанные объекты по таблицам (included=true)
+    facets: Optional[Dict[str, Facet]] = None  # Счётчики по всей выборке (facets=genre,...)
+
 class PaginatedResponse(BaseModel):
     """
     схема для пагинированного ответа
     """
-    total: int              # Общее количество записей
-    page: int               # Текущая страница
+    total: Optional[int]    # Общее количество записей (None при count=none)
+    page: Optional[int]     # Текущая страница (None в режиме курсора)
     size: int               # Количество записей на странице
-    total_pages: int        # Общее количество страниц
+    total_pages: Optional[int]  # Общее количество страниц (None при count=none)
     has_next: bool          # Есть ли следующая страница
     has_prev: bool          # Есть ли предыдущая страница
+    cursor: Optional[str] = None       # Курсор, по которому получена страница
+    next_cursor: Optional[str] = None  # Курсор следующей страницы
+    count_strategy: str = "exact"      # Чем получен total: exact, cached, estimated, none
+    facets: Optional[Dict[str, Facet]] = None  # Счётчики по всей выборке (facets=genre,...)
     data: List[Artwork]     # Сами данные
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ArtworkSearchHit(Artwork):
+    artist_name: Optional[str] = None
+    rank: float
+    title_highlight: str                        # Название с <b>совпадениями</b>
+    description_highlight: Optional[str] = None # Фрагменты описания с совпадениями
+
+class ArtworkSearchResponse(PaginatedResponse):
+    data: List[ArtworkSearchHit]
+
+class BulkError(BaseModel):
+    index: int              # Позиция элемента во входном массиве
+    error: str
+
+class BulkCreateResult(BaseModel):
+    """
+    результат массового создания
+    """
+    created: int
+    errors: List[BulkError] = []
+
+class ArtistBulkResult(BulkCreateResult):
+    data: List[Artist]
+
+class GenreBulkResult(BulkCreateResult):
+    data: List[Genre]
+
+class MuseumBulkResult(BulkCreateResult):
+    data: List[Museum]
+
+class ArtworkBulkResult(BulkCreateResult):
+    data: List[Artwork]
+
+# ---- ФОНОВЫЕ ЗАДАНИЯ ----
+# Параметры по видам заданий (app/jobs.py); проверяются при постановке в очередь
+
+class DiscountJobParams(BaseModel):
+    discount_percent: float = Field(10.0, gt=0, le=100)
+    threshold: float = Field(1000000, ge=0)          # скидка для произведений дороже (USD)
+    chunk_size: int = Field(10000, ge=100, le=1000000)  # строк (диапазон id) в одной транзакции
+
+class ExportJobParams(BaseModel):
+    format: Literal["ndjson", "csv"] = "ndjson"
+    with_details: bool = False
+    min_year: Optional[int] = None
+    max_year: Optional[int] = None
+    artist_id: Optional[int] = None
+    museum_id: Optional[int] = None
+    genre_id: Optional[int] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+class StatsRebuildJobParams(BaseModel):
+    pass
+
+class ReindexJobParams(BaseModel):
+    table: Literal["artworks", "artists", "genres", "museums", "artwork_stats"] = "artworks"
+
+class JobCreate(BaseModel):
+    kind: str                       # apply_discount, export, stats_rebuild, reindex
+    params: Dict[str, Any] = {}
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    params: Dict[str, Any]
+    status: str                     # queued, running, done, failed
+    progress: Optional[Dict[str, Any]] = None  # {"done", "total", "unit"}
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,243 @@
+import hashlib
+import logging
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from app import config
+from app.metrics import current_route
+
+logger = logging.getLogger(__name__)
+
+# Журнал медленных SQL: выражения дольше DB_SLOW_QUERY_MS попадают в кольцевой
+# буфер с нормализованным текстом, типами параметров и маршрутом. План
+# (EXPLAIN без ANALYZE - запрос не выполняется) снимает отдельный поток на
+# своём соединении, уже после того, как запрос ответил.
+
+# Без ANALYZE эти выражения не выполняются; SET, COPY, DDL и т.п. EXPLAIN не принимает
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+# %(name)s у psycopg2, $1 у asyncpg
+_PARAM_RE = re.compile(r"%\([^)]+\)s|%s|\$\d+")
+# asyncpg приводит типы: IN ($1::INTEGER, $2::INTEGER)
+_IN_LIST_RE = re.compile(r"\bIN \(\?(?:::\w+)?(?:, \?(?:::\w+)?)*\)", re.IGNORECASE)
+_ASYNCPG_PARAM_RE = re.compile(r"\$(\d+)")
+
+
+def normalize(statement: str) -> str:
+    """Текст без значений: литералы и параметры -> ?, IN (?, ?, ?) -> IN (...)"""
+    sql = _WHITESPACE_RE.sub(" ", statement).strip()
+    sql = _STRING_RE.sub("?", sql)
+    sql = _PARAM_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    return _IN_LIST_RE.sub("IN (...)", sql)
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def param_shape(parameters, executemany: bool = False):
+    """Типы параметров без значений: {"param_1": "int", ...} или ["str", ...]"""
+    if executemany:
+        parameters = list(parameters)
+        return {"executemany": len(parameters), "first": param_shape(parameters[0]) if parameters else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+def _psycopg2_statement(statement: str, parameters):
+    """Выражение asyncpg ($1, кортеж) -> pyformat для EXPLAIN через psycopg2"""
+    if isinstance(parameters, dict):
+        return statement, parameters
+    named = {f"p{i}": value for i, value in enumerate(parameters or (), start=1)}
+    return _ASYNCPG_PARAM_RE.sub(r"%(p\1)s", statement.replace("%", "%%")), named
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, capacity: int, explain: bool, explain_interval_s: float):
+        self.threshold_s = threshold_ms / 1000
+        self.capacity = capacity
+        self.explain = explain
+        self.explain_interval_s = explain_interval_s
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=capacity)
+        self._recorded = 0
+        # fingerprint -> время последнего EXPLAIN: один план в explain_interval_s
+        self._explained_at = {}
+        self._plans = {}
+        self._queue = queue.Queue(maxsize=100)
+        self._worker = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_s > 0
+
+    def track(self, engine, explain_engine=None):
+        """
+        Следить за выражениями движка (sync или AsyncEngine). EXPLAIN идёт через
+        explain_engine (psycopg2) - у async-движка это его синхронный двойник.
+        """
+        if not self.enabled:
+            return engine
+        sync_engine = getattr(engine, "sync_engine", engine)
+        explain_engine = explain_engine or sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context._slow_query_started = time.perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, "_slow_query_started", None)
+            if started is None:
+                return
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.threshold_s:
+                self.record(statement, parameters, executemany, elapsed, explain_engine)
+
+        return engine
+
+    def record(self, statement, parameters, executemany, elapsed, explain_engine):
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        route = current_route()
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "fingerprint": key,
+            "sql": normalized,
+            "params": param_shape(parameters, executemany),
+            "method": route[0] if route else None,
+            "route": route[1] if route else None,
+            "database": explain_engine.url.render_as_string(hide_password=True),
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self._recorded += 1
+            due = (
+                self.explain and not executemany
+                and normalized.split(" ", 1)[0].upper() in EXPLAINABLE
+                and time.monotonic() - self._explained_at.get(key, float("-inf")) >= self.explain_interval_s
+            )
+            if due:
+                self._explained_at[key] = time.monotonic()
+        if due:
+            self._submit(key, statement, parameters, explain_engine)
+
+    # ---- EXPLAIN ----
+    def _submit(self, key, statement, parameters, explain_engine):
+        self._start_worker()
+        try:
+            self._queue.put_nowait((key, statement, parameters, explain_engine))
+        except queue.Full:
+            # план не важнее запросов: очередь полна - пропускаем, снимем в следующий раз
+            with self._lock:
+                self._explained_at.pop(key, None)
+
+    def _start_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._explain_loop, name="slow-query-explain", daemon=True)
+                self._worker.start()
+
+    def _explain_loop(self):
+        while True:
+            key, statement, parameters, explain_engine = self._queue.get()
+            try:
+                plan = self._explain(statement, parameters, explain_engine)
+            except Exception as e:
+                plan = {"error": str(e).strip()}
+                logger.info("EXPLAIN медленного запроса %s не удался: %s", key, e)
+            with self._lock:
+                self._plans[key] = plan
+                if len(self._plans) > self.capacity:
+                    self._forget_evicted()
+
+    def _forget_evicted(self):
+        # планы и отметки EXPLAIN видов, которых уже нет в буфере
+        buffered = {entry["fingerprint"] for entry in self._entries}
+        for known in (self._plans, self._explained_at):
+            for key in [key for key in known if key not in buffered]:
+                del known[key]
+
+    def _explain(self, statement, parameters, explain_engine):
+        statement, parameters = _psycopg2_statement(statement, parameters)
+        # курсор DBAPI напрямую: мимо событий движка, сам EXPLAIN в журнал не попадёт
+        with explain_engine.connect() as conn:
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+                return cursor.fetchone()[0]
+            finally:
+                cursor.close()
+                conn.rollback()
+
+    # ---- ОТЧЁТ ----
+    def report(self, recent: int = 20):
+        with self._lock:
+            entries = list(self._entries)
+            plans = dict(self._plans)
+            recorded = self._recorded
+
+        groups = {}
+        for entry in entries:
+            group = groups.get(entry["fingerprint"])
+            if group is None:
+                group = groups[entry["fingerprint"]] = {
+                    "fingerprint": entry["fingerprint"],
+                    "sql": entry["sql"],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "routes": set(),
+                    "params": entry["params"],
+                }
+            group["count"] += 1
+            group["total_ms"] += entry["duration_ms"]
+            group["max_ms"] = max(group["max_ms"], entry["duration_ms"])
+            group["last_at"] = entry["at"]
+            if entry["route"] is not None:
+                group["routes"].add(f'{entry["method"]} {entry["route"]}')
+
+        queries = sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)
+        for group in queries:
+            group["total_ms"] = round(group["total_ms"], 3)
+            group["avg_ms"] = round(group["total_ms"] / group["count"], 3)
+            group["routes"] = sorted(group["routes"])
+            group["plan"] = plans.get(group["fingerprint"])
+        return {
+            "threshold_ms": self.threshold_s * 1000,
+            "capacity": self.capacity,
+            "recorded": recorded,
+            "buffered": len(entries),
+            "queries": queries,
+            "recent": entries[-recent:][::-1] if recent else [],
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._recorded = 0
+            self._plans.clear()
+            self._explained_at.clear()
+
+
+slow_queries = SlowQueryLog(
+    threshold_ms=config.DB_SLOW_QUERY_MS,
+    capacity=config.DB_SLOW_QUERY_BUFFER,
+    explain=config.DB_SLOW_QUERY_EXPLAIN,
+    explain_interval_s=config.DB_SLOW_QUERY_EXPLAIN_INTERVAL_S,
+)
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from starlette.concurrency import run_in_threadpool
+
+from app import config, crud
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine, replicas, run_db
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+# Запросы горячих эндпоинтов: прогревают кэш компиляции SQLAlchemy,
+# подготовленные выражения и shared_buffers до первого клиента
+WARMUP_QUERIES = [
+    (crud.get_artworks_page, {}),
+    (crud.get_artworks_page, {"cursor": "", "count": "none"}),
+    (crud.get_artists, {}),
+    (crud.get_genres, {}),
+    (crud.get_museums, {}),
+    (crud.get_stats_by_country, {}),
+]
+
+
+class SchemaNotReady(Exception):
+    """Схема БД не совпадает с head миграций"""
+
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.schema = None
+        self.warm_connections = 0
+        self.warmup_ms = None
+        self.error = None
+        self.attempts = 0
+        self.started_at = time.monotonic()
+        self.ready_after_s = None
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "schema": self.schema,
+            "warm_connections": self.warm_connections,
+            "warmup_ms": self.warmup_ms,
+            "attempts": self.attempts,
+            "ready_after_s": self.ready_after_s,
+            "error": self.error,
+        }
+
+
+readiness = Readiness()
+
+
+def alembic_heads():
+    """head из каталога миграций - без обращения к БД"""
+    return set(ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_heads())
+
+
+def _current_heads(conn):
+    return set(MigrationContext.configure(conn).get_current_heads())
+
+
+def _schema_revisions():
+    with engine.connect() as conn:
+        return _current_heads(conn)
+
+
+async def check_schema():
+    heads = await run_in_threadpool(alembic_heads)
+    if async_engine is not None:
+        async with async_engine.connect() as conn:
+            current = await conn.run_sync(_current_heads)
+    else:
+        current = await run_in_threadpool(_schema_revisions)
+    readiness.schema = {"current": sorted(current), "head": sorted(heads)}
+    if current != heads:
+        raise SchemaNotReady(f"Схема БД {sorted(current) or 'пустая'}, ожидается {sorted(heads)} - выполните alembic upgrade head")
+
+
+def _open_sync_connections(sync_engine, n: int):
+    # Все n соединений держим одновременно, иначе пул отдаст одно и то же
+    with ThreadPoolExecutor(n) as executor:
+        connections = list(executor.map(lambda _: sync_engine.connect(), range(n)))
+    for connection in connections:
+        connection.close()
+    return len(connections)
+
+
+async def _open_async_connections(async_eng, n: int):
+    results = await asyncio.gather(*[async_eng.connect() for _ in range(n)], return_exceptions=True)
+    for result in results:
+        if not isinstance(result, BaseException):
+            await result.close()
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return len(results)
+
+
+async def warm_pools(n: int):
+    """Открыть n соединений в пуле основного движка и каждой реплики"""
+    n = min(n, config.DB_POOL_SIZE)
+    if n <= 0:
+        return 0
+    if async_engine is not None:
+        opened = await _open_async_connections(async_engine, n)
+        for replica in replicas.replicas:
+            await _open_async_connections(replica.async_engine, n)
+    else:
+        opened = await run_in_threadpool(_open_sync_connections, engine, n)
+        for replica in replicas.replicas:
+            await run_in_threadpool(_open_sync_connections, replica.engine, n)
+    return opened
+
+
+async def run_warmup_queries():
+    db = AsyncSessionLocal() if async_engine is not None else SessionLocal()
+    try:
+        for fn, kwargs in WARMUP_QUERIES:
+            await run_db(db, fn, **kwargs)
+    finally:
+        if async_engine is not None:
+            await db.close()
+        else:
+            await run_in_threadpool(db.close)
+
+
+async def prepare():
+    """
+    Фоновая подготовка воркера: схема на head, пул прогрет, горячие запросы выполнены.
+    Пока не готово, /readyz отвечает 503; при ошибке (БД недоступна, миграция
+    ещё не прошла) повторяем через STARTUP_RETRY_S.
+    """
+    while True:
+        readiness.attempts += 1
+        try:
+            if config.DB_CHECK_SCHEMA:
+                await check_schema()
+            readiness.warm_connections = await warm_pools(config.DB_WARM_CONNECTIONS)
+            if config.DB_WARMUP_QUERIES:
+                started = time.perf_counter()
+                await run_warmup_queries()
+                readiness.warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+        except Exception as e:
+            readiness.error = str(e)
+            logger.warning("Воркер не готов (попытка %s): %s", readiness.attempts, e)
+            await asyncio.sleep(config.STARTUP_RETRY_S)
+            continue
+
+        readiness.error = None
+        readiness.ready = True
+        readiness.ready_after_s = round(time.monotonic() - readiness.started_at, 3)
+        logger.info("Воркер готов за %s с", readiness.ready_after_s)
+        return
+
+
+async def dispose_engines():
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
+    for replica in replicas.replicas:
+        if replica.async_engine is not None:
+            await replica.async_engine.dispose()
+        replica.engine.dispose()
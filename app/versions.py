@@ -0,0 +1,143 @@
+import logging
+import os
+import select
+import threading
+import time
+
+import psycopg2
+from sqlalchemy.engine import make_url
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+VERSIONED_TABLES = ("artists", "genres", "museums", "artworks")
+NOTIFY_CHANNEL = "table_versions"
+
+# После touch() таблица считается изменённой, пока не придёт уведомление
+# о новой версии (обычно миллисекунды после COMMIT) или не истечёт этот срок
+# (например, транзакция откатилась)
+PENDING_TIMEOUT_S = 1.0
+HEARTBEAT_S = 5.0
+
+
+class TableVersions:
+    """
+    Версии таблиц для ETag. Триггер на каждый INSERT/UPDATE/DELETE шлёт
+    NOTIFY table_versions с номером из <table>_version_seq; фоновый поток
+    слушает канал, поэтому записи других процессов и воркеров видны здесь
+    сразу после их COMMIT.
+
+    Номер берётся до COMMIT, а уведомления приходят в порядке COMMIT: T1 с
+    номером 5 может закоммититься после T2 с номером 6. Поэтому версия - не
+    номер, а локальный счётчик уведомлений таблицы, который растёт на каждое
+    уведомление, и эпоха соединения слушателя. Эпоха своя у каждого процесса
+    и переподключения (уведомления без слушателя теряются): одинаковые
+    счётчики разных процессов не дают одинаковый ETag - ценой того, что 304
+    отдаёт только процесс, выдавший ETag.
+
+    snapshot() возвращает None, когда версии доверять нельзя - тогда ETag не выдаётся:
+    - слушатель не подключён (уведомления могли потеряться);
+    - после своей записи уведомление ещё не пришло;
+    - версия сменилась меньше settle_s назад, а чтение может уйти в реплику,
+      которая ещё не догнала primary.
+    """
+
+    def __init__(self, url: str, tables=VERSIONED_TABLES, settle_s: float = 0.0):
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.tables = tuple(tables)
+        self.settle_s = settle_s
+        self._epoch = None
+        self._versions = {}
+        self._changed_at = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="table-versions", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                logger.warning("Слушатель версий таблиц отключился: %s", e)
+            self._ready.clear()
+            time.sleep(1)
+
+    def _listen(self):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            # Записи до LISTEN и пока слушателя не было - в прошлой эпохе
+            with self._lock:
+                self._epoch = os.urandom(8).hex()
+                self._changed_at = dict.fromkeys(self.tables, time.monotonic())
+            self._ready.set()
+
+            while True:
+                if select.select([conn], [], [], HEARTBEAT_S) == ([], [], []):
+                    # тишина - проверяем, что соединение живо
+                    cur.execute("SELECT 1")
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self._notify(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+    def _notify(self, payload: str):
+        """Уведомление "<table>:<номер>"; номер не сравнивается - см. docstring класса"""
+        table, _, _ = payload.partition(":")
+        self._apply(table)
+
+    def _apply(self, table: str):
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+            self._changed_at[table] = time.monotonic()
+            self._pending.pop(table, None)
+
+    def touch(self, *tables):
+        """
+        Вызывается из crud перед COMMIT: запоминает текущую версию, и пока
+        не придёт уведомление о более новой, ETag для таблиц не выдаётся -
+        клиент, только что записавший, не получит 304 со старыми данными
+        """
+        deadline = time.monotonic() + PENDING_TIMEOUT_S
+        with self._lock:
+            for table in tables:
+                self._pending[table] = (self._versions.get(table), deadline)
+
+    def snapshot(self, tables):
+        """Версии таблиц (кортеж) или None, если ETag сейчас выдавать нельзя"""
+        if not self._ready.is_set():
+            return None
+        now = time.monotonic()
+        with self._lock:
+            result = [self._epoch]
+            for table in tables:
+                version = self._versions.get(table)
+                pending = self._pending.get(table)
+                if pending is not None:
+                    if pending[0] == version and now < pending[1]:
+                        return None
+                    del self._pending[table]
+                if self.settle_s and now - self._changed_at.get(table, 0) < self.settle_s:
+                    return None
+                result.append(version or 0)
+            return tuple(result)
+
+
+table_versions = TableVersions(
+    config.DB_LISTEN_URL,
+    settle_s=config.DB_REPLICA_MAX_LAG_S if config.DATABASE_REPLICA_URLS else 0.0
+)
@@ -0,0 +1,206 @@
+import argparse
+import logging
+import os
+import select
+import signal
+import socket
+import threading
+import time
+
+import psycopg2
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app import config, jobs
+
+logger = logging.getLogger(__name__)
+
+# Воркер фоновых заданий: python -m app.worker [--concurrency N]
+# Каждый из concurrency потоков сам забирает задания из jobs (SKIP LOCKED),
+# отдельные потоки слушают NOTIFY jobs и шлют heartbeat выполняемых заданий.
+# SIGTERM/SIGINT: задания возвращаются в очередь на ближайшем чекпойнте
+# и продолжаются следующим воркером.
+
+
+def create_jobs_engine(url: str, concurrency: int):
+    """
+    Свой движок, без DB_STATEMENT_TIMEOUT_MS API: REINDEX и пересчёт
+    статистики идут дольше. На поток - сессия задания и соединение для
+    REINDEX CONCURRENTLY, ещё одно - heartbeat
+    """
+    return create_engine(
+        url,
+        pool_size=2 * concurrency + 1,
+        pool_pre_ping=True,
+        connect_args={"options": f"-c statement_timeout={config.JOBS_STATEMENT_TIMEOUT_MS}"}
+    )
+
+
+class JobWorker:
+    def __init__(
+        self,
+        engine,
+        listen_url: str,
+        concurrency: int = 1,
+        name: str = None,
+        poll_interval_s: float = config.JOBS_POLL_INTERVAL_S,
+        heartbeat_s: float = config.JOBS_HEARTBEAT_S,
+        stale_s: float = config.JOBS_STALE_S,
+        max_attempts: int = config.JOBS_MAX_ATTEMPTS
+    ):
+        self.engine = engine
+        self.dsn = make_url(listen_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.concurrency = concurrency
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval_s = poll_interval_s
+        self.heartbeat_s = heartbeat_s
+        self.stale_s = stale_s
+        self.max_attempts = max_attempts
+        self.stopping = threading.Event()
+        self._wake = threading.Event()
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def run(self):
+        """Выполнять задания до stop()"""
+        threading.Thread(target=self._listen_loop, name="jobs-listen", daemon=True).start()
+        threading.Thread(target=self._heartbeat_loop, name="jobs-heartbeat", daemon=True).start()
+        workers = [
+            threading.Thread(target=self._work_loop, name=f"jobs-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        for thread in workers:
+            thread.start()
+        logger.info("Воркер %s: %s потоков", self.name, self.concurrency)
+        # join с таймаутом - главный поток успевает обработать SIGTERM
+        while any(thread.is_alive() for thread in workers):
+            for thread in workers:
+                thread.join(1)
+
+    def stop(self):
+        self.stopping.set()
+        self._wake.set()
+
+    def _work_loop(self):
+        while not self.stopping.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.warning("Очередь заданий недоступна: %s", e)
+            self._wake.wait(self.poll_interval_s)
+            self._wake.clear()
+
+    def run_once(self) -> bool:
+        """Забрать и выполнить одно задание; False - очередь пуста"""
+        with self.engine.begin() as conn:
+            job = conn.execute(jobs.CLAIM_SQL, {"worker": self.name, "stale_s": self.stale_s}).mappings().first()
+        if job is None:
+            return False
+        self._execute(dict(job))
+        return True
+
+    def _execute(self, job):
+        db = Session(bind=self.engine)
+        ctx = jobs.JobContext(db, job, self.name, self.stopping)
+        with self._lock:
+            self._running.add(job["id"])
+        try:
+            kind = jobs.KINDS.get(job["kind"])
+            if kind is None:
+                raise ValueError(f"Неизвестный вид задания: {job['kind']}")
+            if job["attempts"] > self.max_attempts:
+                # брошено упавшими воркерами слишком много раз - вероятно, его и роняет
+                raise RuntimeError(f"Воркер терял задание {job['attempts'] - 1} раз, больше не продолжаем")
+            logger.info("Задание %s (%s): попытка %s, чекпойнт %s", job["id"], job["kind"], job["attempts"], job["checkpoint"])
+            result = kind.run(ctx, job["params"])
+            db.commit()
+            self._finish(db, ctx, "done", result=result)
+            logger.info("Задание %s выполнено: %s", job["id"], result)
+        except jobs.JobInterrupted:
+            db.rollback()
+            db.execute(jobs.REQUEUE_SQL, ctx.owned())
+            db.commit()
+            logger.info("Задание %s возвращено в очередь, чекпойнт %s", job["id"], ctx.checkpoint)
+        except jobs.JobLost:
+            db.rollback()
+            logger.warning("Задание %s забрал другой воркер", job["id"])
+        except Exception as e:
+            db.rollback()
+            logger.exception("Задание %s не выполнено", job["id"])
+            self._finish(db, ctx, "failed", error=str(e).strip())
+        finally:
+            with self._lock:
+                self._running.discard(job["id"])
+            db.close()
+
+    def _finish(self, db, ctx, status: str, result=None, error: str = None):
+        db.execute(jobs.FINISH_SQL, dict(ctx.owned(), status=status, result=result, error=error))
+        db.commit()
+
+    def _heartbeat_loop(self):
+        """heartbeat_at выполняемых заданий: по нему другие воркеры отличают долгий шаг от падения"""
+        while True:
+            time.sleep(self.heartbeat_s)
+            with self._lock:
+                ids = list(self._running)
+            if not ids:
+                continue
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(jobs.HEARTBEAT_SQL, {"ids": ids, "worker": self.name})
+            except Exception as e:
+                logger.warning("heartbeat заданий не записан: %s", e)
+
+    def _listen_loop(self):
+        while not self.stopping.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.warning("Слушатель очереди заданий отключился: %s", e)
+            time.sleep(1)
+
+    def _listen(self):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {jobs.NOTIFY_CHANNEL}")
+            # задания, поставленные, пока слушателя не было
+            self._wake.set()
+            while not self.stopping.is_set():
+                if select.select([conn], [], [], self.poll_interval_s) == ([], [], []):
+                    cur.execute("SELECT 1")
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()
+                    self._wake.set()
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воркер фоновых заданий (таблица jobs)")
+    parser.add_argument("--concurrency", type=int, default=config.JOBS_CONCURRENCY, help="Заданий одновременно")
+    parser.add_argument("--once", action="store_true", help="Выполнить то, что в очереди, и выйти")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    worker = JobWorker(
+        create_jobs_engine(config.JOBS_DATABASE_URL, args.concurrency),
+        config.JOBS_DATABASE_URL,
+        concurrency=args.concurrency
+    )
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: worker.stop())
+    if args.once:
+        while not worker.stopping.is_set() and worker.run_once():
+            pass
+    else:
+        worker.run()
+
+
+if __name__ == "__main__":
+    main()
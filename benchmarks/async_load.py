@@ -0,0 +1,151 @@
+# benchmarks/async_load.py
+"""
+Нагрузочное сравнение режимов DB_MODE=sync и DB_MODE=async при высокой
+конкурентности. Для каждого режима поднимается свой uvicorn, затем
+--concurrency клиентов в течение --duration секунд гоняют смесь запросов.
+
+    python benchmarks/async_load.py --concurrency 200 --duration 30
+    python benchmarks/async_load.py --modes async --workers 4
+    python benchmarks/async_load.py --url http://localhost:8000   # уже запущенный сервер
+
+Нужен httpx (есть в requirements.txt). База должна быть заполнена
+(scripts/seed_data.py), иначе запросы будут пустыми и сравнение бессмысленно.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (вес, путь) - в основном чтение, как в реальном трафике
+REQUEST_MIX = [
+    (30, "/artworks/?size=20"),
+    (15, "/artworks/?size=20&cursor=&sort_by=year&count=none"),
+    (15, "/artworks/filter/?min_year=1500&max_year=1700&limit=50"),
+    (10, "/artworks/with-details/?limit=50"),
+    (10, "/artworks/search/metadata/structured/?eq=style:oil&size=20"),
+    (10, "/artworks/search/?q=night&size=20"),
+    (5, "/stats/by-country/"),
+    (5, "/artists/"),
+]
+
+
+def _percentile(samples, q):
+    return samples[math.ceil(len(samples) * q) - 1]
+
+
+async def _worker(client, deadline, latencies, errors):
+    paths = [p for _, p in REQUEST_MIX]
+    weights = [w for w, _ in REQUEST_MIX]
+    while time.perf_counter() < deadline:
+        path = random.choices(paths, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            latencies.append((time.perf_counter() - started) * 1000)
+        else:
+            errors.append(path)
+
+
+async def run_load(url, concurrency, duration, warmup):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        # Прогрев: соединения клиента и пул БД на сервере
+        await asyncio.gather(*[
+            _worker(client, time.perf_counter() + warmup, [], []) for _ in range(concurrency)
+        ])
+
+        latencies, errors = [], []
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            _worker(client, started + duration, latencies, errors) for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    if not latencies:
+        return {"requests": 0, "errors": len(errors)}
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(_percentile(latencies, 0.95), 2),
+        "p99_ms": round(_percentile(latencies, 0.99), 2),
+    }
+
+
+def _start_server(mode, port, workers):
+    env = dict(os.environ, DB_MODE=mode)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(url + "/", timeout=1)
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"uvicorn ({mode}) не поднялся на порту {port}")
+
+
+def _print_row(name, result):
+    if not result["requests"]:
+        print(f"{name:<8} нет успешных ответов, ошибок: {result['errors']}")
+        return
+    print(
+        f"{name:<8} {result['rps']:>9} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+        f"{result['p99_ms']:>9} {result['requests']:>9} {result['errors']:>7}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="sync,async", help="Режимы через запятую: sync, async")
+    parser.add_argument("--url", help="Не запускать сервер, нагружать этот адрес")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="Процессов uvicorn")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20, help="Секунд замера")
+    parser.add_argument("--warmup", type=float, default=3, help="Секунд прогрева")
+    args = parser.parse_args()
+
+    results = {}
+    if args.url:
+        results["server"] = asyncio.run(run_load(args.url, args.concurrency, args.duration, args.warmup))
+    else:
+        for mode in args.modes.split(","):
+            process, url = _start_server(mode, args.port, args.workers)
+            try:
+                results[mode] = asyncio.run(run_load(url, args.concurrency, args.duration, args.warmup))
+            finally:
+                process.terminate()
+                process.wait()
+
+    print(f"\nconcurrency={args.concurrency} duration={args.duration}s workers={args.workers}")
+    print(f"{'mode':<8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'requests':>9} {'errors':>7}")
+    for name, result in results.items():
+        _print_row(name, result)
+
+    if "sync" in results and "async" in results and results["sync"].get("rps"):
+        print(f"\nasync / sync по req/s: {results['async']['rps'] / results['sync']['rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
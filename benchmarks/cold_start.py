@@ -0,0 +1,110 @@
+# benchmarks/cold_start.py
+"""
+Холодный старт воркера: с прогревом (пул + горячие запросы) и без него.
+Для каждого варианта --runs раз поднимается свой uvicorn и меряется:
+- время до ответа /healthz (процесс принимает соединения);
+- время до 200 от /readyz (схема на head, пул прогрет);
+- задержки первой волны запросов сразу после готовности - то, что видят
+  клиенты, когда балансировщик пускает трафик на новый воркер.
+
+    python benchmarks/cold_start.py --runs 5 --burst 50
+    DB_MODE=async python benchmarks/cold_start.py
+
+Нужен httpx (есть в requirements.txt), база на alembic head и заполнена.
+"""
+import argparse
+import asyncio
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VARIANTS = {
+    "warm": {},
+    "cold": {"DB_WARM_CONNECTIONS": "0", "DB_WARMUP_QUERIES": "0"},
+}
+
+BURST_PATHS = [
+    "/artworks/?size=20",
+    "/artworks/?size=20&cursor=&count=none",
+    "/artists/",
+    "/stats/by-country/",
+]
+
+
+def _percentile(samples, q):
+    return samples[math.ceil(len(samples) * q) - 1]
+
+
+def _wait_for(url, path, status, started, timeout=30):
+    while time.perf_counter() - started < timeout:
+        try:
+            if httpx.get(url + path, timeout=1).status_code == status:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{path} не ответил {status} за {timeout} с")
+
+
+async def _burst(url, n):
+    async def one(client, path):
+        started = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        return (time.perf_counter() - started) * 1000
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        return sorted(await asyncio.gather(*[
+            one(client, BURST_PATHS[i % len(BURST_PATHS)]) for i in range(n)
+        ]))
+
+
+def run_once(variant_env, port, burst):
+    env = dict(os.environ, **variant_env)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        live_s = _wait_for(url, "/healthz", 200, started)
+        ready_s = _wait_for(url, "/readyz", 200, started)
+        latencies = asyncio.run(_burst(url, burst))
+    finally:
+        process.terminate()
+        process.wait()
+    return live_s, ready_s, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--burst", type=int, default=40, help="Параллельных запросов после готовности")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    print(f"{'variant':<8} {'healthz s':>10} {'readyz s':>10} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, variant_env in VARIANTS.items():
+        live, ready, first = [], [], []
+        for _ in range(args.runs):
+            live_s, ready_s, latencies = run_once(variant_env, args.port, args.burst)
+            live.append(live_s)
+            ready.append(ready_s)
+            first.extend(latencies)
+        first.sort()
+        print(
+            f"{name:<8} {statistics.median(live):>10.3f} {statistics.median(ready):>10.3f} "
+            f"{statistics.median(first):>9.1f} {_percentile(first, 0.99):>9.1f} {first[-1]:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
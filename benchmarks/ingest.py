@@ -0,0 +1,146 @@
+# benchmarks/ingest.py
+"""
+Поток одиночных вставок: --concurrency клиентов шлют POST /artworks/
+без пауз. Для каждого варианта поднимается свой uvicorn и меряется:
+- вставок в секунду и задержки (p50/p95/p99);
+- COMMIT на запрос (pg_stat_database.xact_commit). Каждый слушатель
+  LISTEN table_versions добавляет по транзакции на каждую пишущую
+  транзакцию (разбор уведомления), поэтому без группового коммита это
+  1 + число слушателей; пачки уменьшают и то, и другое.
+Вставленные строки в конце удаляются.
+
+    python benchmarks/ingest.py --requests 5000 --concurrency 32
+    DB_MODE=async python benchmarks/ingest.py --variants single,group
+
+Нужен httpx (есть в requirements.txt), база на alembic head.
+"""
+import argparse
+import asyncio
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+import psycopg2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import config  # noqa: E402
+
+TITLE_PREFIX = "ingest-bench"
+
+VARIANTS = {
+    "single": {"DB_GROUP_COMMIT": "0"},
+    "group": {"DB_GROUP_COMMIT": "1"},
+}
+
+# Занятый backend сбрасывает счётчики в pg_stat_database с задержкой, а при
+# отключении - сразу: COMMIT считаются от запуска до остановки сервера
+STATS_FLUSH_S = 0.5
+
+
+def _percentile(samples, q):
+    return samples[math.ceil(len(samples) * q) - 1]
+
+
+def _wait_ready(url, started, timeout=60):
+    while time.perf_counter() - started < timeout:
+        try:
+            if httpx.get(url + "/readyz", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"/readyz не ответил 200 за {timeout} с")
+
+
+def _commits(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()")
+        return cur.fetchone()[0]
+
+
+async def _load(url, requests, concurrency, variant):
+    latencies = []
+    counter = iter(range(requests))
+
+    async def worker(client):
+        for i in counter:
+            started = time.perf_counter()
+            response = await client.post("/artworks/", json={
+                "title": f"{TITLE_PREFIX} {variant} {i}",
+                "artist_id": 1 + i % 100,
+                "genre_id": 1 + i % 10,
+                "museum_id": 1 + i % 50,
+                "year_created": 1900 + i % 100,
+                "metadata_json": {"source": TITLE_PREFIX},
+            })
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+    return sorted(latencies), elapsed
+
+
+def run_variant(name, port, requests, concurrency, warmup):
+    env = dict(os.environ, **VARIANTS[name])
+    conn = psycopg2.connect(config.DATABASE_URL)
+    conn.autocommit = True
+    commits_before = _commits(conn)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(url, started)
+        asyncio.run(_load(url, warmup, concurrency, name))
+        latencies, elapsed = asyncio.run(_load(url, requests, concurrency, name))
+    finally:
+        process.terminate()
+        process.wait()
+    time.sleep(STATS_FLUSH_S)
+    commits = _commits(conn) - commits_before
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM artworks WHERE title LIKE %s", (TITLE_PREFIX + " %",))
+    conn.close()
+    return {
+        "variant": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "inserts_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(_percentile(latencies, 0.95), 2),
+        "p99_ms": round(_percentile(latencies, 0.99), 2),
+        # вместе с прогревом, слушателями NOTIFY и служебными транзакциями сервера
+        "commits_per_request": round(commits / (warmup + requests), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Одиночные вставки: по транзакции на запрос против группового коммита")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="Через запятую: " + ", ".join(VARIANTS))
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for name in args.variants.split(","):
+        if name not in VARIANTS:
+            parser.error(f"Неизвестный вариант: {name}")
+        result = run_variant(name, args.port, args.requests, args.concurrency, args.warmup)
+        print(" ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/metadata_search.py
+"""
+Сравнение регулярного поиска по metadata_json::text и структурного
+поиска (@> / диапазоны) на большой таблице.
+
+    python benchmarks/metadata_search.py --seed-rows 1000000
+    python benchmarks/metadata_search.py --iterations 50
+
+--seed-rows добавляет синтетические строки в artworks (INSERT ... SELECT
+generate_series) - запускать на отдельной базе.
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app import crud, models, pagination
+from app.database import SessionLocal
+
+SEED_SQL = text("""
+    INSERT INTO artworks (title, year_created, description, metadata_json, created_at)
+    SELECT 'Synthetic #' || g,
+           1400 + (g * 37) % 550,
+           'Synthetic artwork ' || g,
+           jsonb_build_object(
+               'style', (ARRAY['oil', 'watercolor', 'charcoal', 'fresco'])[1 + g % 4],
+               'size_cm', (30 + g % 170) || 'x' || (30 + g % 90),
+               'is_famous', g % 7 = 0,
+               'estimated_value_usd', 10000 + (g * 7919) % 100000000
+           ),
+           now()
+    FROM generate_series(1, :rows) AS g
+""")
+
+# (название, регулярное выражение, eq, ranges, has) - одинаковый смысл двумя способами.
+# Ключи в тексте jsonb идут в порядке длины, поэтому "style" раньше "is_famous".
+SCENARIOS = [
+    ("style=oil", '"style": "oil"', ["style:oil"], [], []),
+    ("style=oil AND is_famous=true", '"style": "oil".*"is_famous": true',
+     ["style:oil", "is_famous:true"], [], []),
+    ("has discount_percent", '"discount_percent"', [], [], ["discount_percent"]),
+    ("estimated_value_usd >= 99M", '"estimated_value_usd": (99[0-9]{6}|[1-9][0-9]{8,})[.,}]',
+     [], ["estimated_value_usd:99000000.."], []),
+]
+
+
+def _time(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[math.ceil(len(samples) * 0.95) - 1], 2),
+    }
+
+
+def _plan_indexes(db, query):
+    """Какие индексы выбрал планировщик для COUNT по условию"""
+    plan = pagination.explain(db, query.with_entities(models.Artwork.id).statement)
+    found = []
+
+    def walk(node):
+        if "Index Name" in node:
+            found.append(node["Index Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan)
+    return found or ["Seq Scan"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-rows", type=int, default=0, help="добавить столько синтетических строк")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--count", default="exact", help="стратегия total для обоих путей")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.seed_rows:
+            print(f"Добавляем {args.seed_rows} строк...")
+            # миллионы строк дольше DB_STATEMENT_TIMEOUT_MS - снимаем его для этой транзакции
+            db.execute(text("SET LOCAL statement_timeout = 0"))
+            db.execute(SEED_SQL, {"rows": args.seed_rows})
+            db.commit()
+            db.execute(text("ANALYZE artworks"))
+            db.commit()
+
+        rows = db.query(models.Artwork).count()
+        print(f"Строк в artworks: {rows}\n")
+
+        results = []
+        for name, pattern, eq, ranges, has in SCENARIOS:
+            conditions = crud.metadata_conditions(eq=eq, ranges=ranges, has=has)
+            regex = _time(lambda: crud.search_artworks_by_metadata(db, pattern, count=args.count), args.iterations)
+            structured = _time(
+                lambda: crud.search_artworks_by_metadata_structured(db, conditions, count=args.count),
+                args.iterations
+            )
+            regex_total = crud.search_artworks_by_metadata(db, pattern)["total"]
+            structured_total = crud.search_artworks_by_metadata_structured(db, conditions)["total"]
+            results.append({
+                "scenario": name,
+                "regex": {**regex, "total": regex_total,
+                          "indexes": _plan_indexes(db, crud.regex_metadata_query(db, pattern))},
+                "structured": {**structured, "total": structured_total,
+                               "indexes": _plan_indexes(db, db.query(models.Artwork).filter(*conditions))},
+            })
+            db.rollback()
+
+        for r in results:
+            speedup = r["regex"]["p50_ms"] / max(r["structured"]["p50_ms"], 0.01)
+            print(f"{r['scenario']}")
+            print(f"  regex:      p50 {r['regex']['p50_ms']:>9} ms  p95 {r['regex']['p95_ms']:>9} ms  "
+                  f"total {r['regex']['total']:>8}  {', '.join(r['regex']['indexes'])}")
+            print(f"  structured: p50 {r['structured']['p50_ms']:>9} ms  p95 {r['structured']['p95_ms']:>9} ms  "
+                  f"total {r['structured']['total']:>8}  {', '.join(r['structured']['indexes'])}")
+            print(f"  x{speedup:.1f}\n")
+
+        print(json.dumps({"rows": rows, "iterations": args.iterations, "results": results}, ensure_ascii=False))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
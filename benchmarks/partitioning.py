@@ -0,0 +1,213 @@
+# benchmarks/partitioning.py
+"""
+Секционирование artworks: сколько секций и страниц читают запросы фильтров,
+сортировки и скидки и сколько они идут - до и после миграции d5a7c3e9f812.
+
+    python benchmarks/seed.py --scale 2000000 --force         # отдельная база!
+    alembic downgrade 9c2f5e8a3d14
+    python benchmarks/partitioning.py --out single.json
+    alembic upgrade head                                      # ARTWORKS_PARTITION_KEY=created_at
+    python benchmarks/partitioning.py --compare single.json
+
+Запросы строит код приложения (crud, pagination) и выполняет
+EXPLAIN (ANALYZE, BUFFERS): время планирования и выполнения - медианы
+--iterations прогонов со случайными параметрами (--seed), секции - сколько
+таблиц план действительно открыл (never executed не считается), страницы -
+shared hit + read. UPDATE скидки выполняется в транзакции и откатывается.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+from datetime import timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, func, select, text, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app import crud, models, pagination
+from app.database import SessionLocal
+
+
+class ExplainAnalyze(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(ExplainAnalyze, "postgresql")
+def _compile_explain_analyze(element, compiler, **kw):
+    return "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def _random_row(db, rng, ctx):
+    """(id, created_at, year_created) случайной строки - опорная точка курсора"""
+    return db.execute(
+        select(models.Artwork.id, models.Artwork.created_at, models.Artwork.year_created)
+        .where(models.Artwork.id >= rng.randint(ctx["min_id"], ctx["max_id"]))
+        .order_by(models.Artwork.id).limit(1)
+    ).one()
+
+
+def _cursor_page(sort_by, sort_order, bound=True):
+    def build(db, rng, ctx):
+        artwork_id, created_at, year = _random_row(db, rng, ctx)
+        key = created_at if sort_by == "created_at" else (year if year is not None else pagination.YEAR_NULL_SENTINEL)
+        if bound:
+            condition = pagination.keyset_filter(sort_by, sort_order, key, artwork_id)
+        else:
+            # как было до секционирования: только сравнение кортежей
+            column = tuple_(pagination.sort_key(sort_by), models.Artwork.id)
+            value = tuple_(key, artwork_id)
+            condition = column < value if sort_order == "desc" else column > value
+        return (
+            crud.artwork_rows(db).filter(condition)
+            .order_by(*pagination.order_by(sort_by, sort_order)).limit(21).statement
+        )
+    return build
+
+
+def _created_month(db, rng, ctx):
+    start = ctx["min_created"] + timedelta(seconds=rng.random() * ctx["created_span_s"])
+    filters = crud.artwork_filters(created_from=start, created_to=start + timedelta(days=30))
+    return crud.artwork_rows(db).filter(and_(*filters)).order_by(models.Artwork.id).limit(50).statement
+
+
+def _created_month_count(db, rng, ctx):
+    start = ctx["min_created"] + timedelta(seconds=rng.random() * ctx["created_span_s"])
+    filters = crud.artwork_filters(created_from=start, created_to=start + timedelta(days=30))
+    return select(func.count()).select_from(models.Artwork).where(and_(*filters))
+
+
+def _year_range(db, rng, ctx):
+    low = rng.randint(1400, 1990)
+    filters = crud.artwork_filters(min_year=low, max_year=low + 20)
+    return crud.artwork_rows(db).filter(and_(*filters)).order_by(models.Artwork.id).limit(50).statement
+
+
+def _first_page_by_id(db, rng, ctx):
+    return crud.artwork_rows(db).order_by(models.Artwork.id).limit(21).statement
+
+
+def _discount_chunk(db, rng, ctx):
+    id_from = rng.randint(ctx["min_id"], ctx["max_id"])
+    return crud.DISCOUNT_SQL.bindparams(discount=10, threshold=1_000_000, id_from=id_from, id_to=id_from + 10_000)
+
+
+CASES = {
+    "cursor_created_at_asc": _cursor_page("created_at", "asc"),
+    "cursor_created_at_asc_no_bound": _cursor_page("created_at", "asc", bound=False),
+    "cursor_created_at_desc": _cursor_page("created_at", "desc"),
+    "cursor_year_asc": _cursor_page("year", "asc"),
+    "cursor_year_asc_no_bound": _cursor_page("year", "asc", bound=False),
+    "filter_created_month": _created_month,
+    "count_created_month": _created_month_count,
+    "filter_year_range": _year_range,
+    "first_page_by_id": _first_page_by_id,
+    "discount_chunk": _discount_chunk,
+}
+
+
+def _relations(plan, found):
+    """Таблицы, которые узел плана и его потомки действительно читали"""
+    if plan.get("Relation Name") and plan.get("Actual Loops", 0) > 0 and plan["Node Type"] != "ModifyTable":
+        found.add(plan["Relation Name"])
+    for child in plan.get("Plans", ()):
+        _relations(child, found)
+    return found
+
+
+def _explain(db, statement):
+    result = db.execute(ExplainAnalyze(statement)).scalar()
+    db.rollback()
+    return (json.loads(result) if isinstance(result, str) else result)[0]
+
+
+def _context(db):
+    min_id, max_id, min_created, max_created = db.execute(text(
+        "SELECT min(id), max(id), min(created_at), max(created_at) FROM artworks"
+    )).one()
+    if max_id is None:
+        sys.exit("artworks пуста - сначала python benchmarks/seed.py")
+    partitions = db.execute(text(
+        "SELECT count(*) FROM pg_inherits WHERE inhparent = CAST('artworks' AS regclass)"
+    )).scalar()
+    return {
+        "min_id": min_id, "max_id": max_id, "min_created": min_created,
+        "created_span_s": max(1.0, (max_created - min_created).total_seconds() - 30 * 86400),
+        "partitions": partitions,
+    }
+
+
+def run(iterations: int, seed: int, cases):
+    db = SessionLocal()
+    try:
+        ctx = _context(db)
+        results = {}
+        for name in cases:
+            rng = random.Random(f"{seed}:{name}")
+            samples = []
+            for _ in range(iterations):
+                explained = _explain(db, CASES[name](db, rng, ctx))
+                plan = explained["Plan"]
+                samples.append((
+                    explained["Planning Time"], explained["Execution Time"], len(_relations(plan, set())),
+                    plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+                ))
+            planning, execution, relations, buffers = zip(*samples)
+            results[name] = {
+                "planning_ms": round(statistics.median(planning), 3),
+                "execution_ms": round(statistics.median(execution), 3),
+                "relations": round(statistics.median(relations), 1),
+                "buffers": round(statistics.median(buffers)),
+            }
+        return {"rows": ctx["max_id"] - ctx["min_id"] + 1, "partitions": ctx["partitions"], "cases": results}
+    finally:
+        db.close()
+
+
+def _report(current, baseline=None):
+    print(f"artworks: ~{current['rows']} строк, секций: {current['partitions']}"
+          + (f" (база: {baseline['partitions']})" if baseline else ""))
+    columns = ("planning_ms", "execution_ms", "relations", "buffers")
+    print(f"{'case':<32}" + "".join(f"{c:>22}" for c in columns))
+    for name, values in current["cases"].items():
+        before = (baseline or {}).get("cases", {}).get(name)
+        cells = []
+        for column in columns:
+            cells.append(f"{before[column]} -> {values[column]}" if before else str(values[column]))
+        print(f"{name:<32}" + "".join(f"{cell:>22}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--cases", help="Через запятую (по умолчанию все): " + ", ".join(CASES))
+    parser.add_argument("--out", help="Сохранить результат в JSON")
+    parser.add_argument("--compare", help="JSON прошлого прогона (например, до секционирования)")
+    args = parser.parse_args()
+
+    cases = args.cases.split(",") if args.cases else list(CASES)
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        sys.exit(f"Неизвестные случаи: {', '.join(unknown)}")
+
+    current = run(args.iterations, args.seed, cases)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    _report(current, baseline)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/seed.py
+"""
+Детерминированное заполнение базы для бенчмарков: один и тот же --scale
+всегда даёт одни и те же строки, поэтому прогоны на разных машинах
+и коммитах сравнимы.
+
+    python benchmarks/seed.py --scale 10k
+    python benchmarks/seed.py --scale 1m --force
+    python benchmarks/seed.py --scale 10m --force
+
+Данные простые (id по модулю), зато заполнение - несколько INSERT ... SELECT.
+Реалистичное распределение (Zipf, разные формы metadata_json) даёт
+scripts/generate_data.py.
+
+Таблицы artworks, artists, genres, museums очищаются (TRUNCATE) - запускать
+на отдельной базе. Без --force откажется, если в artworks уже есть строки.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.partitions import create_partitions
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Пачка artworks в одной транзакции: 10M строк одним INSERT держат
+# transition table триггера статистики целиком в памяти
+SEED_CHUNK = 500_000
+
+WORDS = "ARRAY['Night', 'Garden', 'Portrait', 'River', 'Storm', 'Harbor', 'Madonna', 'Still Life', 'Ночь', 'Сад']"
+STYLES = "ARRAY['oil', 'watercolor', 'charcoal', 'fresco', 'tempera', 'acrylic']"
+COUNTRIES = "ARRAY['France', 'Italy', 'Spain', 'Netherlands', 'USA', 'Russia', 'Germany', 'Japan']"
+
+REFERENCE_SQL = [
+    text("""
+        INSERT INTO genres (name, description)
+        SELECT 'Genre ' || g, 'Synthetic genre ' || g FROM generate_series(1, :genres) AS g
+    """),
+    text(f"""
+        INSERT INTO museums (name, city, country)
+        SELECT 'Museum ' || g, 'City ' || (g % 100), ({COUNTRIES})[1 + g % 8]
+        FROM generate_series(1, :museums) AS g
+    """),
+    text(f"""
+        INSERT INTO artists (name, country, birth_year, death_year)
+        SELECT 'Artist ' || g, ({COUNTRIES})[1 + (g * 3) % 8], 1380 + g % 600,
+               CASE WHEN g % 10 = 0 THEN NULL ELSE 1420 + g % 600 END
+        FROM generate_series(1, :artists) AS g
+    """),
+]
+
+# Каждая 97-я строка без музея и каждая 50-я без года - чтобы LEFT JOIN
+# и NULLS LAST в сортировке работали на реальных данных; g - bigint:
+# g * 7919 на миллионах строк не помещается в integer
+ARTWORKS_SQL = text(f"""
+    INSERT INTO artworks (title, artist_id, genre_id, museum_id, year_created, description, metadata_json, created_at)
+    SELECT ({WORDS})[1 + g % 10] || ' #' || g,
+           1 + (g * 7919) % :artists,
+           1 + (g * 31) % :genres,
+           CASE WHEN g % 97 = 0 THEN NULL ELSE 1 + (g * 131) % :museums END,
+           CASE WHEN g % 50 = 0 THEN NULL ELSE 1400 + (g * 37) % 620 END,
+           'Synthetic artwork ' || g || ': ' || ({WORDS})[1 + (g / 10) % 10] || ' and ' || ({WORDS})[1 + (g / 100) % 10],
+           jsonb_build_object(
+               'style', ({STYLES})[1 + g % 6],
+               'size_cm', (30 + g % 170) || 'x' || (30 + g % 90),
+               'is_famous', g % 7 = 0,
+               'estimated_value_usd', 10000 + (g * 7919) % 100000000
+           ),
+           timestamp '2020-01-01' + g * interval '1 minute'
+    FROM generate_series(CAST(:start AS bigint), CAST(:stop AS bigint)) AS g
+""")
+
+
+def parse_scale(value: str) -> int:
+    return SCALES.get(value.lower()) or int(value)
+
+
+def reference_counts(rows: int):
+    return {
+        "artists": max(100, rows // 100),
+        "genres": 50,
+        "museums": max(50, rows // 2000),
+    }
+
+
+def seed(rows: int, force: bool = False, log=print):
+    counts = reference_counts(rows)
+    with engine.connect() as conn:
+        existing = conn.execute(text("SELECT count(*) FROM (SELECT 1 FROM artworks LIMIT 1) AS t")).scalar()
+    if existing and not force:
+        raise SystemExit("В artworks уже есть строки - запустите с --force (таблицы будут очищены)")
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE artworks, artists, genres, museums RESTART IDENTITY CASCADE"))
+        for stmt in REFERENCE_SQL:
+            conn.execute(stmt, counts)
+        # диапазоны ключа из ARTWORKS_SQL - строки не должны копиться в artworks_default
+        create_partitions(
+            conn,
+            created_range=(datetime(2020, 1, 1), datetime(2020, 1, 1) + timedelta(minutes=rows)),
+            year_range=(1400, 2019),
+        )
+
+    for start in range(1, rows + 1, SEED_CHUNK):
+        stop = min(start + SEED_CHUNK - 1, rows)
+        with engine.begin() as conn:
+            # миллионы строк дольше DB_STATEMENT_TIMEOUT_MS
+            conn.execute(text("SET LOCAL statement_timeout = 0"))
+            conn.execute(ARTWORKS_SQL, {**counts, "start": start, "stop": stop})
+        log(f"  artworks {stop}/{rows}, {time.perf_counter() - started:.0f} с")
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.execute(text("VACUUM ANALYZE artworks, artists, genres, museums, artwork_stats"))
+    log(f"Готово: {rows} произведений за {time.perf_counter() - started:.0f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="10k", help="Число произведений: 10k, 100k, 1m, 10m или целое")
+    parser.add_argument("--force", action="store_true", help="Очистить таблицы, даже если в них есть данные")
+    args = parser.parse_args()
+    seed(parse_scale(args.scale), force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/serialization.py
+"""
+CPU на строку в списках произведений: прежний путь (ORM-объекты models.Artwork
++ валидация и сериализация через schemas.Artwork, как делает FastAPI для
+response_model) против колоночного (crud.artwork_rows + app/fastjson.py).
+
+    python benchmarks/serialization.py --rows 100 --iterations 200
+    python benchmarks/serialization.py --rows 1000 --iterations 20
+
+Меряется process_time (CPU этого процесса, без ожидания PostgreSQL),
+отдельно чтение строк и кодирование в JSON. Нужно хотя бы --rows строк в artworks.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+
+from app import crud, models, schemas
+from app.database import SessionLocal
+from app.fastjson import FastJSONResponse, artwork_dicts
+
+ARTWORKS = TypeAdapter(List[schemas.Artwork])
+
+
+def orm_fetch(db, rows):
+    return db.query(models.Artwork).order_by(models.Artwork.id).limit(rows).all()
+
+
+def orm_encode(artworks):
+    # FastAPI: валидация по response_model, dump в json-режиме, json.dumps в JSONResponse
+    data = ARTWORKS.dump_python(ARTWORKS.validate_python(artworks, from_attributes=True), mode="json")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def core_fetch(db, rows):
+    return crud.artwork_rows(db).order_by(models.Artwork.id).limit(rows).all()
+
+
+def core_encode(rows):
+    return FastJSONResponse(artwork_dicts(rows)).body
+
+
+def _cpu_us_per_row(fn, iterations, rows, after=None):
+    total = 0.0
+    for _ in range(iterations):
+        started = time.process_time()
+        result = fn()
+        total += time.process_time() - started
+        if after is not None:
+            after()
+    return total / iterations / rows * 1e6, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        results = {}
+        for name, fetch, encode in (("orm", orm_fetch, orm_encode), ("core", core_fetch, core_encode)):
+            fetch_us, rows = _cpu_us_per_row(lambda: fetch(db, args.rows), args.iterations, args.rows, db.expunge_all)
+            if len(rows) < args.rows:
+                sys.exit(f"В artworks только {len(rows)} строк, нужно {args.rows}")
+            encode_us, body = _cpu_us_per_row(lambda: encode(rows), args.iterations, args.rows)
+            results[name] = (fetch_us, encode_us, body)
+            db.rollback()
+    finally:
+        db.close()
+
+    if json.loads(results["orm"][2]) != json.loads(results["core"][2]):
+        sys.exit("Ответы отличаются - колоночный путь сломал формат")
+
+    print(f"rows={args.rows} iterations={args.iterations}, мкс CPU на строку")
+    print(f"{'path':<6} {'fetch':>9} {'encode':>9} {'total':>9}")
+    for name, (fetch_us, encode_us, _) in results.items():
+        print(f"{name:<6} {fetch_us:>9.1f} {encode_us:>9.1f} {fetch_us + encode_us:>9.1f}")
+    orm_total = sum(results["orm"][:2])
+    core_total = sum(results["core"][:2])
+    print(f"\norm / core: {orm_total / core_total:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
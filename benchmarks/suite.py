@@ -0,0 +1,381 @@
+# benchmarks/suite.py
+"""
+Набор бенчмарков горячих путей API с базовой линией и порогами регрессии.
+
+Приложение запускается в этом же процессе (httpx.ASGITransport, с lifespan),
+поэтому кроме задержек считаются SQL-выражения на запрос - лишний запрос
+в crud.py виден сразу, даже когда задержка ещё в пределах шума.
+
+    python benchmarks/seed.py --scale 1m --force        # отдельная база!
+    python benchmarks/suite.py run --out baseline.json
+    python benchmarks/suite.py run --compare baseline.json --out current.json
+    python benchmarks/suite.py compare baseline.json current.json --max-p95-increase 0.1
+    DB_MODE=async python benchmarks/suite.py run --scenarios list_deep_offset,regex
+
+Параметры запросов генерируются детерминированно (--seed), одинаковые
+для базовой линии и сравнения. compare завершается с кодом 1, если хоть
+один сценарий вышел за пороги.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import event, text
+
+from app import config, pagination, startup
+from app.database import async_engine, engine, replicas
+from app.main import app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SORT_ORDERS = [(s, o) for s in pagination.SORT_FIELDS for o in ("asc", "desc")]
+REGEX_PATTERNS = ['"style": "oil"', "watercolor|acrylic", '"is_famous": true', r'"size_cm": "1[0-9]{2}x']
+FULLTEXT_QUERIES = ["night", "garden river", '"still life"', "storm -harbor", "ночь"]
+STRUCTURED = [
+    {"eq": "style:oil"},
+    {"eq": ["style:fresco", "is_famous:true"]},
+    {"range": "estimated_value_usd:90000000.."},
+    {"range": "size_cm.width:..60", "eq": "style:tempera"},
+]
+
+
+def _url(path, **params):
+    params = {k: v for k, v in params.items() if v is not None}
+    return path + ("?" + urlencode(params, doseq=True) if params else "")
+
+
+def _deep_page(rng, ctx, size):
+    return rng.randint(1, max(1, ctx.rows // size))
+
+
+def _cursor(rng, ctx, sort_by, sort_order):
+    """Курсор в случайное место выборки - keyset-страница на глубине"""
+    artwork = SimpleNamespace(
+        id=rng.randint(1, ctx.rows),
+        year_created=rng.randint(1400, 2020),
+        title=rng.choice(["Garden", "Night", "Portrait", "Storm"]) + f" #{rng.randint(1, ctx.rows)}",
+        created_at=datetime(2020, 1, 1) + timedelta(minutes=rng.randint(1, ctx.rows)),
+    )
+    return pagination.encode_cursor(artwork, sort_by, sort_order)
+
+
+def _filter(rng, ctx):
+    params = {"limit": 50}
+    if rng.random() < 0.7:
+        low = rng.randint(1400, 1950)
+        params.update(min_year=low, max_year=low + rng.choice([10, 50, 200]))
+    for key, upper in (("artist_id", ctx.artists), ("genre_id", ctx.genres), ("museum_id", ctx.museums)):
+        if rng.random() < 0.3:
+            params[key] = rng.randint(1, upper)
+    return _url("/artworks/filter/", **params)
+
+
+def _created_range(rng, ctx):
+    """Месяц по created_at (seed.py: 2020-01-01 + id минут) - отсечение секций по дате"""
+    start = datetime(2020, 1, 1) + timedelta(minutes=rng.randint(1, ctx.rows))
+    return _url(
+        "/artworks/filter/", limit=50,
+        created_from=start.isoformat(), created_to=(start + timedelta(days=30)).isoformat()
+    )
+
+
+def _year_range(rng, ctx):
+    low = rng.randint(1400, 1990)
+    return _url("/artworks/filter/", limit=50, min_year=low, max_year=low + rng.choice([5, 20]))
+
+
+# имя -> функция (rng, ctx) -> путь с параметрами
+SCENARIOS = {
+    "list_first_page": lambda rng, ctx: _url("/artworks/", size=20),
+    "list_deep_offset": lambda rng, ctx: _url("/artworks/", size=20, page=_deep_page(rng, ctx, 20)),
+    "list_count_none": lambda rng, ctx: _url("/artworks/", size=20, page=rng.randint(1, 50), count="none"),
+    "list_count_estimated": lambda rng, ctx: _url("/artworks/", size=20, count="estimated", sort_by="year"),
+    "paginated": lambda rng, ctx: _url("/artworks/paginated/", size=20, page=rng.randint(1, 100), count="cached"),
+    **{
+        f"sort_{s}_{o}": (lambda s, o: lambda rng, ctx: _url(
+            "/artworks/", size=20, sort_by=s, sort_order=o, page=rng.randint(1, 20)
+        ))(s, o)
+        for s, o in SORT_ORDERS
+    },
+    **{
+        f"cursor_{s}_{o}": (lambda s, o: lambda rng, ctx: _url(
+            "/artworks/", size=20, sort_by=s, sort_order=o, count="none", cursor=_cursor(rng, ctx, s, o)
+        ))(s, o)
+        for s, o in SORT_ORDERS
+    },
+    "sparse_fields": lambda rng, ctx: _url("/artworks/", size=100, fields="id,title,year_created", count="none"),
+    "expand_included": lambda rng, ctx: _url(
+        "/artworks/", size=50, page=rng.randint(1, 100), expand="artist,genre,museum", included="true"
+    ),
+    "filter": _filter,
+    "filter_artist": lambda rng, ctx: _url("/artworks/filter/", limit=50, artist_id=rng.randint(1, ctx.artists)),
+    "filter_museum_genre": lambda rng, ctx: _url(
+        "/artworks/filter/", limit=50, museum_id=rng.randint(1, ctx.museums), genre_id=rng.randint(1, ctx.genres)
+    ),
+    "filter_facets": lambda rng, ctx: _url(
+        "/artworks/filter/", limit=50, genre_id=rng.randint(1, ctx.genres), facets="museum,artist,decade"
+    ),
+    "filter_created_range": _created_range,
+    "filter_year_range": _year_range,
+    "regex": lambda rng, ctx: _url("/artworks/search/metadata/", pattern=rng.choice(REGEX_PATTERNS), size=20),
+    "structured": lambda rng, ctx: _url("/artworks/search/metadata/structured/", size=20, **rng.choice(STRUCTURED)),
+    "fulltext": lambda rng, ctx: _url("/artworks/search/", q=rng.choice(FULLTEXT_QUERIES), size=20),
+    "fulltext_facets": lambda rng, ctx: _url(
+        "/artworks/search/", q=rng.choice(FULLTEXT_QUERIES), size=20, facets="genre,museum,artist,decade"
+    ),
+    "with_details": lambda rng, ctx: _url(
+        "/artworks/with-details/", limit=50, skip=rng.randint(0, max(0, min(ctx.rows, 100_000) - 50))
+    ),
+    "stats_country": lambda rng, ctx: "/stats/by-country/",
+    "stats_genre": lambda rng, ctx: "/stats/by-genre/",
+    "stats_artist": lambda rng, ctx: _url("/stats/by-artist/", limit=50),
+    "stats_decade": lambda rng, ctx: "/stats/by-decade/",
+    "stats_genre_fresh": lambda rng, ctx: _url("/stats/by-genre/", fresh="true"),
+}
+
+
+class StatementCounter:
+    """SQL-выражения через все движки приложения (primary, async, реплики)"""
+
+    def __init__(self):
+        self.count = 0
+        engines = [engine] + [r.engine for r in replicas.replicas]
+        if async_engine is not None:
+            engines += [async_engine.sync_engine] + [r.async_engine.sync_engine for r in replicas.replicas]
+        for e in engines:
+            event.listen(e, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def _percentile(samples, q):
+    return samples[math.ceil(len(samples) * q) - 1]
+
+
+def _context():
+    with engine.connect() as conn:
+        rows, artists, genres, museums = conn.execute(text("""
+            SELECT (SELECT coalesce(max(id), 0) FROM artworks), (SELECT coalesce(max(id), 1) FROM artists),
+                   (SELECT coalesce(max(id), 1) FROM genres), (SELECT coalesce(max(id), 1) FROM museums)
+        """)).one()
+    if not rows:
+        raise SystemExit("artworks пуста - сначала python benchmarks/seed.py")
+    return SimpleNamespace(rows=rows, artists=artists, genres=genres, museums=museums)
+
+
+async def _run_scenario(client, counter, paths, concurrency):
+    queue = list(reversed(paths))
+    latencies, errors = [], []
+
+    async def worker():
+        while queue:
+            path = queue.pop()
+            started = time.perf_counter()
+            response = await client.get(path)
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code == 200:
+                latencies.append(elapsed)
+            else:
+                errors.append(f"{response.status_code} {path}")
+
+    statements_before = counter.count
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    statements = counter.count - statements_before
+
+    latencies.sort()
+    result = {
+        "requests": len(paths),
+        "errors": len(errors),
+        "rps": round(len(paths) / elapsed, 1),
+        "statements_per_request": round(statements / len(paths), 2),
+    }
+    if latencies:
+        result.update({
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p95_ms": round(_percentile(latencies, 0.95), 2),
+            "p99_ms": round(_percentile(latencies, 0.99), 2),
+        })
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+async def run_suite(names, requests, concurrency, warmup, seed, log=print):
+    ctx = _context()
+    counter = StatementCounter()
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        while not startup.readiness.ready:
+            if startup.readiness.error:
+                raise SystemExit(f"Приложение не готово: {startup.readiness.error}")
+            await asyncio.sleep(0.05)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name in names:
+                # свой генератор на сценарий: набор запросов не зависит от --scenarios
+                rng = random.Random(seed * 1_000_003 + zlib.crc32(name.encode()))
+                paths = [SCENARIOS[name](rng, ctx) for _ in range(warmup + requests)]
+                await _run_scenario(client, counter, paths[:warmup] or paths[:1], concurrency)
+                results[name] = await _run_scenario(client, counter, paths[warmup:], concurrency)
+                r = results[name]
+                log(f"{name:<28} p50 {r.get('p50_ms', '-'):>8} p95 {r.get('p95_ms', '-'):>8} "
+                    f"p99 {r.get('p99_ms', '-'):>8} ms  {r['rps']:>8} req/s  "
+                    f"{r['statements_per_request']:>5} SQL/req  errors {r['errors']}")
+    return ctx, results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# (метрика, направление): +1 - рост плохо, -1 - падение плохо
+METRICS = [("p50_ms", 1), ("p95_ms", 1), ("p99_ms", 1), ("rps", -1), ("statements_per_request", 1)]
+
+
+def compare(baseline, current, thresholds, min_ms):
+    """Список регрессий: (сценарий, метрика, было, стало, изменение)"""
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        if now["errors"] > before["errors"]:
+            regressions.append((name, "errors", before["errors"], now["errors"], None))
+        for metric, direction in METRICS:
+            if metric not in before or metric not in now:
+                continue
+            old, new = before[metric], now[metric]
+            if metric == "statements_per_request":
+                if new - old > thresholds[metric]:
+                    regressions.append((name, metric, old, new, new - old))
+                continue
+            # миллисекундный шум на быстрых запросах не считается регрессией
+            if metric.endswith("_ms") and new - old < min_ms:
+                continue
+            change = (new - old) / old if old else 0.0
+            if change * direction > thresholds[metric]:
+                regressions.append((name, metric, old, new, change))
+    return regressions
+
+
+def _print_regressions(regressions):
+    if not regressions:
+        print("\nРегрессий нет")
+        return
+    print(f"\nРегрессии ({len(regressions)}):")
+    for name, metric, old, new, change in regressions:
+        delta = "" if change is None else (f" ({change:+.2f})" if metric == "statements_per_request" else f" ({change:+.0%})")
+        print(f"  {name:<28} {metric:<24} {old} -> {new}{delta}")
+
+
+def _add_threshold_args(parser):
+    parser.add_argument("--max-p50-increase", type=float, default=0.25, help="Доля роста p50 (0.25 = +25%%)")
+    parser.add_argument("--max-p95-increase", type=float, default=0.25)
+    parser.add_argument("--max-p99-increase", type=float, default=0.5)
+    parser.add_argument("--max-rps-decrease", type=float, default=0.2)
+    parser.add_argument("--max-statements-increase", type=float, default=0.0, help="SQL-выражений на запрос, абсолютно")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="Рост задержки меньше этого (мс) не считается")
+
+
+def _thresholds(args):
+    return {
+        "p50_ms": args.max_p50_increase,
+        "p95_ms": args.max_p95_increase,
+        "p99_ms": args.max_p99_increase,
+        "rps": args.max_rps_decrease,
+        "statements_per_request": args.max_statements_increase,
+    }
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Прогнать сценарии и записать результат")
+    run.add_argument("--scenarios", help="Через запятую (по умолчанию все): " + ", ".join(SCENARIOS))
+    run.add_argument("--requests", type=int, default=200, help="Запросов на сценарий")
+    run.add_argument("--concurrency", type=int, default=8)
+    run.add_argument("--warmup", type=int, default=20, help="Запросов прогрева на сценарий")
+    run.add_argument("--seed", type=int, default=1, help="Зерно генератора параметров")
+    run.add_argument("--out", help="Куда записать JSON (иначе stdout)")
+    run.add_argument("--compare", metavar="BASELINE", help="Сравнить с базовой линией и выйти с кодом 1 при регрессии")
+    _add_threshold_args(run)
+
+    cmp = commands.add_parser("compare", help="Сравнить два сохранённых прогона")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    _add_threshold_args(cmp)
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        baseline, current = _load(args.baseline), _load(args.current)
+    else:
+        names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+        unknown = [n for n in names if n not in SCENARIOS]
+        if unknown:
+            parser.error(f"Неизвестные сценарии: {', '.join(unknown)}")
+        ctx, results = asyncio.run(run_suite(names, args.requests, args.concurrency, args.warmup, args.seed))
+        current = {
+            "meta": {
+                "revision": _git_revision(),
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "db_mode": config.DB_MODE,
+                "artworks": ctx.rows,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+            },
+            "scenarios": results,
+        }
+        output = json.dumps(current, indent=2, ensure_ascii=False)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(output + "\n")
+        else:
+            print(output)
+        if not args.compare:
+            return
+        baseline = _load(args.compare)
+
+    for key in ("artworks", "db_mode", "concurrency"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"Внимание: {key} отличается: {baseline['meta'].get(key)} -> {current['meta'].get(key)}")
+    regressions = compare(baseline, current, _thresholds(args), args.min_ms)
+    _print_regressions(regressions)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
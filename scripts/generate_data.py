@@ -0,0 +1,467 @@
+# scripts/generate_data.py
+"""
+Генератор синтетических данных для нагрузочных тестов: миллионы произведений,
+тысячи художников, сотни музеев. Загрузка через COPY FROM STDIN из нескольких
+процессов, без HTTP и без ORM.
+
+    python scripts/generate_data.py --artworks 1000000 --truncate
+    python scripts/generate_data.py --artworks 10000000 --artists 50000 --museums 800 \\
+        --workers 8 --drop-indexes --defer-stats --truncate
+
+Распределения приближены к реальным коллекциям:
+- популярность художников и музеев - Zipf (--zipf): у немногих художников
+  тысячи работ, у большинства единицы; у каждого художника есть «свой» музей,
+  где лежит большая часть его работ, и основной жанр;
+- годы рождения смещены к XIX-XX векам, год работы - внутри жизни художника;
+- metadata_json разной формы и размера: обязательные style/estimated_value_usd,
+  необязательные provenance, exhibitions, tags, вложенные объекты, длинные notes,
+  изредка значения не того типа (строка вместо числа, объект вместо "ШxВ").
+
+Результат зависит только от --seed и размеров: каждые RNG_BLOCK id получают
+свой генератор случайных чисел, поэтому ни число процессов, ни --chunk
+на данные не влияют. Таблицы должны быть пустыми (или --truncate).
+
+--drop-indexes удаляет индексы artworks (кроме первичного ключа) на время
+загрузки и строит их заново параллельно. --defer-stats отключает триггер
+artwork_stats на время загрузки и пересчитывает агрегаты одним запросом.
+"""
+import argparse
+import bisect
+import csv
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+from sqlalchemy.engine import make_url
+
+from app import config
+
+# Строк на один генератор случайных чисел; --chunk округляется до кратного
+RNG_BLOCK = 1000
+
+ARTWORK_COLUMNS = (
+    "id", "title", "artist_id", "genre_id", "museum_id",
+    "year_created", "description", "metadata_json", "created_at",
+)
+
+# (страна, вес, города)
+COUNTRIES = [
+    ("France", 18, ["Paris", "Lyon", "Nice", "Marseille"]),
+    ("Italy", 16, ["Florence", "Rome", "Venice", "Milan"]),
+    ("USA", 15, ["New York", "Chicago", "Los Angeles", "Boston"]),
+    ("Netherlands", 9, ["Amsterdam", "The Hague", "Rotterdam"]),
+    ("Spain", 9, ["Madrid", "Barcelona", "Seville"]),
+    ("Germany", 9, ["Berlin", "Munich", "Dresden"]),
+    ("United Kingdom", 9, ["London", "Edinburgh", "Oxford"]),
+    ("Russia", 8, ["Moscow", "Saint Petersburg", "Kazan"]),
+    ("Japan", 4, ["Tokyo", "Kyoto", "Osaka"]),
+    ("Mexico", 3, ["Mexico City", "Guadalajara"]),
+]
+FIRST_NAMES = [
+    "Leonardo", "Vincent", "Pablo", "Claude", "Rembrandt", "Frida", "Johannes", "Edgar",
+    "Gustav", "Henri", "Salvador", "Georgia", "Wassily", "Ilya", "Katsushika", "Mary",
+    "Diego", "Paul", "Egon", "Artemisia", "Ivan", "Marc", "Berthe", "Francisco",
+]
+LAST_NAMES = [
+    "Rossi", "Dubois", "Müller", "Smith", "Ivanov", "García", "de Vries", "Tanaka",
+    "Bianchi", "Laurent", "Schmidt", "Johnson", "Petrov", "López", "Jansen", "Sato",
+    "Moreau", "Weber", "Brown", "Sokolov", "Fernández", "Bakker", "Suzuki", "Romano",
+]
+MUSEUM_KINDS = ["Museum of Fine Arts", "National Gallery", "Art Institute", "Modern Art Museum",
+                "City Museum", "Kunsthalle", "Collection", "Foundation"]
+GENRE_NAMES = [
+    "Renaissance", "Baroque", "Rococo", "Neoclassicism", "Romanticism", "Realism",
+    "Impressionism", "Post-Impressionism", "Symbolism", "Art Nouveau", "Expressionism",
+    "Cubism", "Futurism", "Surrealism", "Abstract Expressionism", "Pop Art", "Minimalism",
+    "Ukiyo-e", "Portrait", "Landscape", "Still Life", "Religious", "Genre Painting", "Marine",
+    "Icon Painting", "Suprematism", "Constructivism", "Photorealism", "Street Art", "Conceptual Art",
+]
+# (век рождения, вес)
+BIRTH_CENTURIES = [(1300, 2), (1400, 6), (1500, 9), (1600, 11), (1700, 10), (1800, 27), (1900, 32), (2000, 3)]
+STYLES = [("oil", 40), ("watercolor", 15), ("tempera", 8), ("acrylic", 12), ("charcoal", 6),
+          ("fresco", 3), ("pastel", 6), ("ink", 7), ("mixed media", 3)]
+TITLE_PREFIXES = ["Portrait of", "Still Life with", "Landscape with", "View of", "Study of",
+                  "The", "Night over", "Garden of", "Storm near", "Madonna with", "Composition with",
+                  "Портрет", "Вид на", "Натюрморт с"]
+TITLE_SUBJECTS = ["a Woman", "Sunflowers", "the River", "the Harbor", "Mountains", "a Horse",
+                  "the Old Town", "Water Lilies", "the Sea", "Child", "Lemons", "the Cathedral",
+                  "Red and Blue", "Night", "the Garden", "реку", "город", "яблоками"]
+DESCRIPTION_WORDS = (
+    "light shadow canvas color composition figure landscape river evening morning brush "
+    "texture portrait movement silence storm harbor garden night gold blue red green "
+    "свет тень холст цвет композиция фигура пейзаж река вечер утро мазок фактура тишина буря"
+).split()
+TAGS = ["masterpiece", "restored", "on loan", "early work", "late work", "sketch", "series",
+        "commission", "self-portrait", "triptych", "unfinished", "signed"]
+
+
+def zipf_cum_weights(n: int, s: float):
+    """Накопленные веса Zipf для рангов 1..n (для bisect)"""
+    total = 0.0
+    cumulative = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** s
+        cumulative.append(total)
+    return cumulative
+
+
+def zipf_pick(rng, cumulative):
+    """Индекс 0..n-1 с вероятностью ~ 1/(индекс+1)^s"""
+    return bisect.bisect(cumulative, rng.random() * cumulative[-1])
+
+
+def weighted(items):
+    """[(значение, вес)] -> (значения, накопленные веса) для rng.choices"""
+    values = [v for v, _ in items]
+    cumulative = []
+    total = 0
+    for _, weight in items:
+        total += weight
+        cumulative.append(total)
+    return values, cumulative
+
+
+class World:
+    """
+    Справочники и «характер» художников. Строится детерминированно из seed
+    в главном процессе и заново в каждом воркере - передавать его не нужно.
+    """
+
+    def __init__(self, seed, artists, genres, museums, zipf_s):
+        rng = random.Random(f"{seed}:world")
+        country_names, country_weights = weighted([(c[0], c[1]) for c in COUNTRIES])
+        cities = {c[0]: c[2] for c in COUNTRIES}
+
+        self.genres = []
+        for i in range(1, genres + 1):
+            base = GENRE_NAMES[(i - 1) % len(GENRE_NAMES)]
+            name = base if i <= len(GENRE_NAMES) else f"{base} {i // len(GENRE_NAMES) + 1}"
+            self.genres.append((i, name, f"{name}: synthetic genre"))
+
+        self.museums = []
+        for i in range(1, museums + 1):
+            country = rng.choices(country_names, cum_weights=country_weights)[0]
+            city = rng.choice(cities[country])
+            self.museums.append((i, f"{city} {rng.choice(MUSEUM_KINDS)} {i}", city, country))
+
+        centuries, century_weights = weighted(BIRTH_CENTURIES)
+        self.artists = []
+        self.lifespan = {}
+        for i in range(1, artists + 1):
+            birth = rng.choices(centuries, cum_weights=century_weights)[0] + rng.randrange(100)
+            birth = min(birth, 2003)
+            death = None if birth > 1935 and rng.random() < 0.6 else birth + rng.randint(25, 95)
+            if death is not None and death > 2024:
+                death = None
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+            country = rng.choices(country_names, cum_weights=country_weights)[0]
+            self.artists.append((i, name, country, birth, death))
+            # годы работы: с 16 лет до смерти (живые - до 2024)
+            self.lifespan[i] = (birth + 16, max(birth + 17, min(death or 2024, 2024)))
+
+        # Ранг популярности -> id: популярные не обязательно с маленькими id
+        self.artist_by_rank = list(range(1, artists + 1))
+        rng.shuffle(self.artist_by_rank)
+        self.artist_cum = zipf_cum_weights(artists, zipf_s)
+        self.museum_by_rank = list(range(1, museums + 1))
+        rng.shuffle(self.museum_by_rank)
+        self.museum_cum = zipf_cum_weights(museums, zipf_s)
+
+        # У каждого художника «свой» музей (крупные музеи собирают больше
+        # художников) и основной жанр
+        self.home_museum = {a: self.museum_by_rank[zipf_pick(rng, self.museum_cum)] for a in self.artist_by_rank}
+        self.main_genre = {a: rng.randint(1, genres) for a in self.artist_by_rank}
+
+        self.styles, self.style_weights = weighted(STYLES)
+
+
+def _metadata(rng, world):
+    """metadata_json разной формы; ключи поиска (style, is_famous, ...) чаще всего есть"""
+    value = int(math.exp(rng.gauss(11.5, 1.8)))
+    metadata = {
+        "style": rng.choices(world.styles, cum_weights=world.style_weights)[0],
+        "is_famous": rng.random() < 0.02,
+        # изредка значение не числом - поиск по диапазону должен это пропускать
+        "estimated_value_usd": value if rng.random() > 0.01 else "on request",
+    }
+    shape = rng.random()
+    if shape < 0.85:
+        metadata["size_cm"] = f"{rng.randint(10, 400)}x{rng.randint(10, 300)}"
+    elif shape < 0.95:
+        metadata["size_cm"] = {"width": rng.randint(10, 400), "height": rng.randint(10, 300)}
+    if rng.random() < 0.4:
+        metadata["provenance"] = [
+            {"owner": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", "from": rng.randint(1500, 2020)}
+            for _ in range(rng.randint(1, 6))
+        ]
+    if rng.random() < 0.25:
+        metadata["exhibitions"] = [f"{rng.choice(COUNTRIES)[2][0]} {rng.randint(1900, 2024)}"
+                                   for _ in range(rng.randint(1, 8))]
+    if rng.random() < 0.5:
+        metadata["tags"] = rng.sample(TAGS, rng.randint(1, 4))
+    if rng.random() < 0.2:
+        metadata["inventory"] = {"number": f"INV-{rng.randint(1, 10 ** 7):07d}", "room": rng.randint(1, 120)}
+    if rng.random() < 0.1:
+        metadata["condition"] = rng.choice(["excellent", "good", "fair", "restored"])
+    if rng.random() < 0.01:
+        # редкие большие документы - несколько КБ
+        metadata["notes"] = " ".join(rng.choices(DESCRIPTION_WORDS, k=rng.randint(200, 800)))
+    return metadata
+
+
+def generate_artworks(seed, start_id, stop_id, world, created_from, step):
+    """
+    Строки artworks [start_id, stop_id) для COPY; start_id - начало блока RNG_BLOCK.
+    Строка зависит только от seed и своего id
+    """
+    genres = len(world.genres)
+    for artwork_id in range(start_id, stop_id):
+        if (artwork_id - 1) % RNG_BLOCK == 0:
+            rng = random.Random(f"{seed}:artworks:{(artwork_id - 1) // RNG_BLOCK}")
+        artist = world.artist_by_rank[zipf_pick(rng, world.artist_cum)]
+
+        roll = rng.random()
+        if roll < 0.03:
+            museum = None
+        elif roll < 0.73:
+            museum = world.home_museum[artist]
+        else:
+            museum = world.museum_by_rank[zipf_pick(rng, world.museum_cum)]
+
+        genre = world.main_genre[artist] if rng.random() < 0.6 else rng.randint(1, genres)
+
+        if rng.random() < 0.03:
+            year = None
+        else:
+            year = rng.randint(*world.lifespan[artist])
+
+        title = f"{rng.choice(TITLE_PREFIXES)} {rng.choice(TITLE_SUBJECTS)}"
+        if rng.random() < 0.3:
+            title += f" No. {rng.randint(1, 40)}"
+
+        if rng.random() < 0.05:
+            description = None
+        else:
+            words = max(3, int(math.exp(rng.gauss(3.0, 0.7))))
+            description = " ".join(rng.choices(DESCRIPTION_WORDS, k=words)).capitalize() + "."
+
+        created_at = created_from + timedelta(seconds=artwork_id * step + rng.random() * step)
+        yield (
+            artwork_id, title, artist, genre, museum, year, description,
+            json.dumps(_metadata(rng, world), ensure_ascii=False, separators=(",", ":")),
+            created_at.isoformat(sep=" "),
+        )
+
+
+def copy_rows(cursor, table, columns, rows):
+    """COPY table (columns) FROM STDIN в формате CSV; None -> NULL"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def psycopg2_dsn(url: str) -> str:
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+#  ВОРКЕРЫ ----------------
+_worker = {}
+
+
+def _init_worker(dsn, options):
+    _worker["conn"] = psycopg2.connect(dsn)
+    _worker["options"] = options
+    _worker["world"] = World(options["seed"], options["artists"], options["genres"],
+                             options["museums"], options["zipf"])
+    with _worker["conn"].cursor() as cur:
+        cur.execute("SET statement_timeout = 0")
+    _worker["conn"].commit()
+
+
+def _load_chunk(chunk_index):
+    options = _worker["options"]
+    start_id = chunk_index * options["chunk"] + 1
+    stop_id = min(start_id + options["chunk"], options["artworks"] + 1)
+    started = time.perf_counter()
+    rows = generate_artworks(
+        options["seed"], start_id, stop_id, _worker["world"],
+        options["created_from"], options["step"]
+    )
+    conn = _worker["conn"]
+    with conn.cursor() as cur:
+        copy_rows(cur, "artworks", ARTWORK_COLUMNS, rows)
+    conn.commit()
+    return stop_id - start_id, time.perf_counter() - started
+
+
+def create_partitions(conn, created_range, world):
+    """
+    Секции artworks под загружаемый диапазон ключа (миграция d5a7c3e9f812),
+    чтобы строки не легли в artworks_default. Без секционирования - 0
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('artworks_partitioning') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            return 0
+        cur.execute("SELECT key FROM artworks_partitioning")
+        if cur.fetchone()[0] == "created_at":
+            low, high = created_range
+        else:
+            low = min(first for first, _ in world.lifespan.values())
+            high = max(last for _, last in world.lifespan.values())
+        cur.execute("SELECT artworks_create_partitions(%s, %s)", (str(low), str(high)))
+        created = cur.fetchone()[0]
+    conn.commit()
+    return created
+
+
+#  ИНДЕКСЫ ----------------
+INDEXES_SQL = """
+    SELECT i.indexname, i.indexdef
+    FROM pg_indexes i
+    WHERE i.schemaname = current_schema() AND i.tablename = 'artworks'
+      AND NOT EXISTS (
+          SELECT 1 FROM pg_constraint c
+          WHERE c.conindid = (quote_ident(i.schemaname) || '.' || quote_ident(i.indexname))::regclass
+      )
+    ORDER BY i.indexname
+"""
+
+
+def drop_indexes(conn):
+    """Удалить индексы artworks, кроме тех, что держат ограничения; вернуть их определения"""
+    with conn.cursor() as cur:
+        cur.execute(INDEXES_SQL)
+        indexes = cur.fetchall()
+        for name, _ in indexes:
+            cur.execute(f'DROP INDEX "{name}"')
+    conn.commit()
+    # у секционированной artworks определение - ON ONLY: так индекс встал бы
+    # только на родителя; без ONLY он строится и на всех секциях
+    return [(name, definition.replace(" ON ONLY ", " ON ", 1)) for name, definition in indexes]
+
+
+def _create_index(dsn, definition):
+    conn = psycopg2.connect(dsn)
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SET statement_timeout = 0")
+            cur.execute("SET maintenance_work_mem = '512MB'")
+            started = time.perf_counter()
+            cur.execute(definition)
+            return time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def rebuild_indexes(dsn, indexes, workers, log):
+    """Построить индексы параллельно - каждый в своём соединении"""
+    with ThreadPoolExecutor(max(1, workers)) as executor:
+        futures = {name: executor.submit(_create_index, dsn, definition) for name, definition in indexes}
+        for name, future in futures.items():
+            log(f"  индекс {name}: {future.result():.1f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--artworks", type=int, default=1_000_000)
+    parser.add_argument("--artists", type=int, default=5000)
+    parser.add_argument("--museums", type=int, default=300)
+    parser.add_argument("--genres", type=int, default=30)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Показатель Zipf популярности художников и музеев")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Процессов загрузки")
+    parser.add_argument("--chunk", type=int, default=20000, help="Строк в одном COPY (и одной транзакции)")
+    parser.add_argument("--drop-indexes", action="store_true", help="Снять индексы artworks на время загрузки")
+    parser.add_argument("--defer-stats", action="store_true", help="Пересчитать artwork_stats один раз в конце")
+    parser.add_argument("--truncate", action="store_true", help="Очистить artworks, artists, genres, museums")
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    args = parser.parse_args()
+
+    dsn = psycopg2_dsn(args.database_url)
+    started = time.perf_counter()
+
+    def log(message):
+        print(f"[{time.perf_counter() - started:7.1f} с] {message}", flush=True)
+
+    conn = psycopg2.connect(dsn)
+    with conn.cursor() as cur:
+        cur.execute("SET statement_timeout = 0")
+        if args.truncate:
+            cur.execute("TRUNCATE artworks, artists, genres, museums RESTART IDENTITY CASCADE")
+        else:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM artworks) OR EXISTS (SELECT 1 FROM artists)")
+            if cur.fetchone()[0]:
+                sys.exit("Таблицы не пустые - запустите с --truncate (данные будут удалены)")
+
+        world = World(args.seed, args.artists, args.genres, args.museums, args.zipf)
+        copy_rows(cur, "genres", ("id", "name", "description"), world.genres)
+        copy_rows(cur, "museums", ("id", "name", "city", "country"), world.museums)
+        copy_rows(cur, "artists", ("id", "name", "country", "birth_year", "death_year"), world.artists)
+    conn.commit()
+    log(f"Справочники: {args.artists} художников, {args.museums} музеев, {args.genres} жанров")
+
+    indexes = drop_indexes(conn) if args.drop_indexes else []
+    if indexes:
+        log(f"Сняты индексы: {', '.join(name for name, _ in indexes)}")
+    if args.defer_stats:
+        with conn.cursor() as cur:
+            cur.execute("ALTER TABLE artworks DISABLE TRIGGER artworks_stats_insert")
+        conn.commit()
+
+    # created_at равномерно за последние 5 лет (в порядке id, с разбросом внутри шага)
+    created_from = datetime(2021, 1, 1)
+    chunk = math.ceil(args.chunk / RNG_BLOCK) * RNG_BLOCK
+    options = {
+        "seed": args.seed, "artworks": args.artworks, "artists": args.artists, "genres": args.genres,
+        "museums": args.museums, "zipf": args.zipf, "chunk": chunk, "created_from": created_from,
+        "step": 5 * 365 * 86400 / max(args.artworks, 1),
+    }
+    chunks = range(math.ceil(args.artworks / chunk))
+    created_to = created_from + timedelta(seconds=(args.artworks + 1) * options["step"])
+    partitions = create_partitions(conn, (created_from, created_to), world)
+    if partitions:
+        log(f"Секции artworks: {partitions} новых")
+    try:
+        loaded = 0
+        with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(dsn, options)) as pool:
+            for rows, _ in pool.imap_unordered(_load_chunk, chunks):
+                loaded += rows
+                log(f"artworks {loaded}/{args.artworks} ({loaded / (time.perf_counter() - started):.0f} строк/с)")
+    finally:
+        # индексы и триггер возвращаем даже после ошибки загрузки
+        if args.defer_stats:
+            with conn.cursor() as cur:
+                cur.execute("ALTER TABLE artworks ENABLE TRIGGER artworks_stats_insert")
+                cur.execute("SELECT artwork_stats_rebuild()")
+            conn.commit()
+            log("artwork_stats пересчитана")
+        if indexes:
+            rebuild_indexes(dsn, indexes, args.workers, log)
+            log("Индексы построены")
+
+    with conn.cursor() as cur:
+        for table in ("artworks", "artists", "genres", "museums"):
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))")
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE artworks, artists, genres, museums, artwork_stats")
+    conn.close()
+    log(f"Готово: {args.artworks} произведений")
+
+
+if __name__ == "__main__":
+    main()
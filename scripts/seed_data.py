@@ -19,14 +19,13 @@ def main():
     ]
 
     artist_ids = []
-    for a in artists:
-        r = requests.post(f"{BASE_URL}/artists/", json=a)
-        if r.status_code == 200:
-            artist_id = r.json()["id"]  # <-- ВОТ САМАЯ ВАЖНАЯ СТРОКА: сохраняем ID
-            artist_ids.append(artist_id)
-            print(f"Художник создан: {a['name']} (ID: {artist_id})")
-        else:
-            print(f"Ошибка с {a['name']}: {r.status_code}")
+    r = requests.post(f"{BASE_URL}/artists/bulk/", json=artists)
+    if r.status_code == 200:
+        for a in r.json()["data"]:
+            artist_ids.append(a["id"])  # <-- ВОТ САМАЯ ВАЖНАЯ СТРОКА: сохраняем ID
+            print(f"Художник создан: {a['name']} (ID: {a['id']})")
+    else:
+        print(f"Ошибка при создании художников: {r.status_code} {r.text}")
 
     #СОЗДАЕМ ЖАНРЫ
     genres = [
@@ -37,14 +36,13 @@ def main():
     ]
 
     genre_ids = []
-    for g in genres:
-        r = requests.post(f"{BASE_URL}/genres/", json=g)
-        if r.status_code == 200:
-            genre_id = r.json()["id"]  # <-- Сохраняем ID жанра
-            genre_ids.append(genre_id)
+    r = requests.post(f"{BASE_URL}/genres/bulk/", json=genres)
+    if r.status_code == 200:
+        for g in r.json()["data"]:
+            genre_ids.append(g["id"])  # <-- Сохраняем ID жанра
             print(f" Жанр создан: {g['name']}")
-        else:
-            print(f"Ошибка с {g['name']}: {r.status_code}")
+    else:
+        print(f"Ошибка при создании жанров: {r.status_code} {r.text}")
 
     # 3. СОЗДАЕМ МУЗЕИ
     museums = [
@@ -54,18 +52,16 @@ def main():
     ]
 
     museum_ids = []
-    for m in museums:
-        r = requests.post(f"{BASE_URL}/museums/", json=m)
-        if r.status_code == 200:
-            museum_id = r.json()["id"]  # <-- Сохраняем ID музея
-            museum_ids.append(museum_id)
+    r = requests.post(f"{BASE_URL}/museums/bulk/", json=museums)
+    if r.status_code == 200:
+        for m in r.json()["data"]:
+            museum_ids.append(m["id"])  # <-- Сохраняем ID музея
             print(f"Музей создан: {m['name']}")
-        else:
-            print(f"Ошибка с {m['name']}: {r.status_code}")
+    else:
+        print(f"Ошибка при создании музеев: {r.status_code} {r.text}")
 
     # СОЗДАЕМ ПРОИЗВЕДЕНИЯ
     artwork_titles = ["Mona Lisa", "Starry Night", "Guernica", "The Persistence of Memory", "The Scream", "Water Lilies"]
-    created_count = 0
 
     # Проверяем, что у нас есть хотя бы по одному ID в каждом списке
     if not artist_ids or not genre_ids or not museum_ids:
@@ -73,34 +69,37 @@ def main():
         return
 
     print("Начинаем создавать произведения искусства...")
+    artworks = []
     for i in range(80):  # Создадим 80 произведений для "большого количества данных"
-        try:
-            # ВАЖНО: Используем правильные имена полей, как в схеме ArtworkCreate
-            artwork_data = {
-                "title": f"{random.choice(artwork_titles)} #{i+1}",
-                "year_created": random.randint(1400, 1950),  # <-- Исправлено: было "year"
-                "description": f"Описание для шедевра #{i+1}",
-                "artist_id": random.choice(artist_ids),  # Теперь список НЕ пустой
-                "genre_id": random.choice(genre_ids),    # Теперь список НЕ пустой
-                "museum_id": random.choice(museum_ids),  # Теперь список НЕ пустой
-                "metadata_json": {  # <-- Исправлено: было "extra_data"
-                    "style": random.choice(["oil", "watercolor", "charcoal", "fresco"]),
-                    "size_cm": f"{random.randint(30, 200)}x{random.randint(30, 200)}",
-                    "is_famous": random.choice([True, False]),
-                    "estimated_value_usd": random.randint(10000, 100000000)
-                }
+        # ВАЖНО: Используем правильные имена полей, как в схеме ArtworkCreate
+        artworks.append({
+            "title": f"{random.choice(artwork_titles)} #{i+1}",
+            "year_created": random.randint(1400, 1950),  # <-- Исправлено: было "year"
+            "description": f"Описание для шедевра #{i+1}",
+            "artist_id": random.choice(artist_ids),  # Теперь список НЕ пустой
+            "genre_id": random.choice(genre_ids),    # Теперь список НЕ пустой
+            "museum_id": random.choice(museum_ids),  # Теперь список НЕ пустой
+            "metadata_json": {  # <-- Исправлено: было "extra_data"
+                "style": random.choice(["oil", "watercolor", "charcoal", "fresco"]),
+                "size_cm": f"{random.randint(30, 200)}x{random.randint(30, 200)}",
+                "is_famous": random.choice([True, False]),
+                "estimated_value_usd": random.randint(10000, 100000000)
             }
+        })
 
-            r = requests.post(f"{BASE_URL}/artworks/", json=artwork_data)
-            if r.status_code == 200:
-                created_count += 1
-                if created_count % 20 == 0:  # Выводим прогресс каждые 20 записей
-                    print(f"   ... создано произведений: {created_count}")
-            else:
-                print(f" Не удалось создать произведение #{i+1}: {r.status_code}")
-
-        except Exception as e:
-            print(f" Исключение при создании произведения: {e}")
+    # Одним запросом, без atomic: неудачные элементы вернутся в errors
+    created_count = 0
+    try:
+        r = requests.post(f"{BASE_URL}/artworks/bulk/", params={"atomic": "false"}, json=artworks)
+        if r.status_code == 200:
+            result = r.json()
+            created_count = result["created"]
+            for err in result["errors"]:
+                print(f" Не удалось создать произведение #{err['index']+1}: {err['error']}")
+        else:
+            print(f" Не удалось создать произведения: {r.status_code} {r.text}")
+    except Exception as e:
+        print(f" Исключение при создании произведений: {e}")
 
     # itog
     print(f"\n{'='*50}")
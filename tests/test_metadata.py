@@ -0,0 +1,71 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import and_, func, select, text
+
+from app import crud, models
+from app.database import SessionLocal, engine
+from app.main import app
+
+TITLE = "test-metadata-mixed-types"
+
+
+@pytest.fixture
+def mixed_rows():
+    """Строка с ценой-строкой (как 1% строк scripts/generate_data.py) и строка с числом"""
+    with engine.begin() as conn:
+        ids = conn.execute(text("""
+            INSERT INTO artworks (title, created_at, metadata_json) VALUES
+                (:title, now(), '{"estimated_value_usd": "on request"}'),
+                (:title, now(), '{"estimated_value_usd": 987654321987}')
+            RETURNING id
+        """), {"title": TITLE}).scalars().all()
+    yield ids
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM artworks WHERE title = :title"), {"title": TITLE})
+
+
+def test_range_expression_is_safe_without_guard(mixed_rows):
+    # Выражение диапазона само не приводит строку к numeric - порядок,
+    # в котором PostgreSQL вычислит условия (и перепроверка битмапа), не важен
+    number, _ = crud._metadata_number("estimated_value_usd")
+    with engine.connect() as conn:
+        total = conn.execute(
+            select(func.count()).select_from(models.Artwork).where(models.Artwork.id.in_(mixed_rows), number >= 0)
+        ).scalar()
+    assert total == 1
+
+
+@pytest.mark.parametrize("plan", ["enable_seqscan", "enable_bitmapscan"])
+def test_range_conditions_in_any_order(mixed_rows, plan):
+    conditions = crud.metadata_conditions(ranges=["estimated_value_usd:987654321000.."])
+    with engine.connect() as conn:
+        conn.execute(text(f"SET LOCAL {plan} = off"))
+        for ordered in (conditions, conditions[::-1]):
+            ids = conn.execute(select(models.Artwork.id).where(and_(*ordered))).scalars().all()
+            assert ids == [mixed_rows[1]]
+
+
+def test_range_search_endpoint_with_string_value(mixed_rows):
+    with TestClient(app) as client:
+        response = client.get(
+            "/artworks/search/metadata/structured/", params={"range": "estimated_value_usd:987654321000.."}
+        )
+    assert response.status_code == 200, response.text
+    assert [row["id"] for row in response.json()["data"]] == [mixed_rows[1]]
+
+
+def test_discount_chunk_with_string_value(mixed_rows):
+    # Одна строка "on request" в пачке не должна ронять всё задание скидки
+    db = SessionLocal()
+    try:
+        updated = crud.update_expensive_artworks_discount(
+            db, 10, threshold=987654321000, start_id=min(mixed_rows), max_id=max(mixed_rows)
+        )
+    finally:
+        db.close()
+    assert updated == 1
+    with engine.connect() as conn:
+        values = dict(conn.execute(
+            text("SELECT id, metadata_json->'estimated_value_usd' FROM artworks WHERE id = ANY(:ids)"), {"ids": mixed_rows}
+        ).all())
+    assert values == {mixed_rows[0]: "on request", mixed_rows[1]: 888888889788.3}
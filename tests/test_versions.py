@@ -0,0 +1,48 @@
+from app.etag import make_etag
+from app.versions import TableVersions
+
+
+def _listening(tables=("artworks",)):
+    """Версии без соединения: как после подключения слушателя"""
+    versions = TableVersions("postgresql://localhost/test", tables=tables)
+    versions._epoch = "test"
+    versions._ready.set()
+    return versions
+
+
+def _etag(versions, tables=("artworks",)):
+    return make_etag("/artworks/", b"page=1", versions.snapshot(tables))
+
+
+def test_out_of_order_notification_changes_etag():
+    versions = _listening()
+    before = _etag(versions)
+    # T1 взяла номер 5, T2 - 6, но T2 закоммитилась первой
+    versions._notify("artworks:6")
+    after_t2 = _etag(versions)
+    versions._notify("artworks:5")
+    after_t1 = _etag(versions)
+    assert len({before, after_t2, after_t1}) == 3
+
+
+def test_notification_clears_own_pending_write():
+    versions = _listening()
+    versions.touch("artworks")
+    assert versions.snapshot(("artworks",)) is None
+    versions._notify("artworks:1")
+    assert versions.snapshot(("artworks",)) is not None
+
+
+def test_epochs_do_not_share_etags():
+    first, second = _listening(), _listening()
+    second._epoch = "other"
+    first._notify("artworks:1")
+    second._notify("artworks:2")
+    assert _etag(first) != _etag(second)
+
+
+def test_other_tables_keep_etag():
+    versions = _listening(tables=("artworks", "artists"))
+    before = _etag(versions, ("artists",))
+    versions._notify("artworks:7")
+    assert _etag(versions, ("artists",)) == before